@@ -0,0 +1,91 @@
+"""Mede a latência de saída do áudio para cada tamanho de buffer do mixer.
+
+Para cada buffer: reinicializa o mixer (pre_init + init, como o app faz), sobe um AudioWorker
+com os canais reservados e mede:
+  - latência de buffer teórica (buffer / frequência): o piso imposto pelo mixer
+  - disparo → play() retornado pela AudioThread (handoff da fila + Channel.play)
+  - duração da chamada Channel.play() direta
+
+Por padrão usa o driver de áudio dummy do SDL (a latência do dispositivo real não entra).
+Use --real-device na máquina alvo para medir com a placa de som de verdade.
+
+Uso: python benchmarks/bench_audio_latency.py [--buffers 128,256,512,1024,2048] [--plays N] [--real-device]
+"""
+import argparse
+import os
+import sys
+import time
+
+if "--real-device" not in sys.argv:
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame  # noqa: E402
+import main  # noqa: E402
+
+main.load_pygame() # main.py importa o pygame sob demanda; aqui ele é usado desde o início
+
+
+def percentile_ms(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000.0
+
+
+def measure(buffer_size, frequency, plays):
+    pygame.mixer.quit()
+    main.AUDIO_BUFFER_SIZE = buffer_size
+    main.AUDIO_FREQUENCY = frequency
+    main.configure_mixer_pre_init()
+    pygame.mixer.init()
+    actual_frequency, _, _ = pygame.mixer.get_init()
+    sound = pygame.mixer.Sound(main.SOUND_FILE_PATH)
+
+    main.pipeline_latency = main.LatencyTracker()
+    worker = main.AudioWorker()
+    worker.start()
+    for _ in range(plays):
+        worker.play(sound, fired_at=main.timer_scheduler.now())
+        time.sleep(0.01)
+    worker.stop()
+    handoff = main.pipeline_latency.snapshot()["playback"]
+
+    channel = pygame.mixer.Channel(0)
+    call_times = []
+    for _ in range(plays):
+        start = time.perf_counter()
+        channel.play(sound)
+        call_times.append(time.perf_counter() - start)
+        time.sleep(0.005)
+    channel.stop()
+    return {
+        "buffer": buffer_size,
+        "frequency": actual_frequency,
+        "buffer_latency_ms": buffer_size / actual_frequency * 1000.0,
+        "handoff_p50_ms": handoff["p50"] * 1000.0,
+        "handoff_p99_ms": handoff["p99"] * 1000.0,
+        "play_call_p50_ms": percentile_ms(call_times, 0.50),
+        "play_call_p99_ms": percentile_ms(call_times, 0.99),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buffers", default="128,256,512,1024,2048")
+    parser.add_argument("--frequency", type=int, default=main.AUDIO_FREQUENCY)
+    parser.add_argument("--plays", type=int, default=100)
+    parser.add_argument("--real-device", action="store_true", help="usa o dispositivo de áudio real")
+    args = parser.parse_args()
+
+    pygame.init()
+    print(f"driver de áudio: {os.environ.get('SDL_AUDIODRIVER', 'padrão do sistema')}")
+    print(f"{'buffer':>6} {'Hz':>6} {'piso buffer':>12} {'handoff p50/p99':>18} {'play() p50/p99':>18}")
+    for buffer_size in (int(b) for b in args.buffers.split(",")):
+        r = measure(buffer_size, args.frequency, args.plays)
+        print(f"{r['buffer']:>6} {r['frequency']:>6} {r['buffer_latency_ms']:>9.2f} ms "
+              f"{r['handoff_p50_ms']:>7.3f}/{r['handoff_p99_ms']:.3f} ms {r['play_call_p50_ms']:>7.3f}/{r['play_call_p99_ms']:.3f} ms")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,101 @@
+"""Latência de ida e volta da API de controle local (--control).
+
+Sobe o engine real (ver harness.py) com um ControlServer e mede, com um cliente que mantém
+a conexão aberta, o tempo entre enviar a linha e receber a resposta para cada comando:
+  - PING: só o protocolo (socket + loop asyncio + thread)
+  - STATE: leitura do estado em JSON
+  - DELAY: escrita no EngineState
+  - ARM: press entregue à thread do timer (arma/reseta o timer principal)
+  - conexão nova: connect + PING + close, como um --control-send por comando
+Roda no socket Unix e em TCP localhost (o transporte usado no Windows).
+
+Uso: python benchmarks/bench_control.py [--requests 2000] [--output control.json]
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+import time
+
+from harness import Engine, environment_info, main, percentiles_ms
+
+
+def connect(server):
+    if server.path is not None:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(server.path)
+    else:
+        client = socket.create_connection((main.CONTROL_HOST, server.port))
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return client
+
+
+def round_trips(server, command, requests):
+    samples = []
+    with connect(server) as client, client.makefile("rb") as responses:
+        payload = command.encode("utf-8") + b"\n"
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.sendall(payload)
+            response = responses.readline()
+            samples.append(time.perf_counter() - start)
+            if not response.startswith(b"OK"):
+                raise SystemExit(f"{command}: resposta inesperada {response!r}")
+    return percentiles_ms(samples)
+
+
+def fresh_connections(server, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        with connect(server) as client, client.makefile("rb") as responses:
+            client.sendall(b"PING\n")
+            responses.readline()
+        samples.append(time.perf_counter() - start)
+    return percentiles_ms(samples)
+
+
+def run_transport(label, server, requests):
+    server.start()
+    try:
+        results = {
+            "PING": round_trips(server, "PING", requests),
+            "STATE": round_trips(server, "STATE", requests),
+            "DELAY": round_trips(server, "DELAY 30", requests),
+            "ARM": round_trips(server, "ARM", requests),
+            "conexão nova": fresh_connections(server, max(1, requests // 10)),
+        }
+    finally:
+        server.stop()
+    print(f"{label} ({server.address}):")
+    for command, stats in results.items():
+        print(f"  {command:>13}: p50 {stats['p50'] * 1000:7.1f} µs | p99 {stats['p99'] * 1000:7.1f} µs | "
+              f"máx {stats['max'] * 1000:8.1f} µs")
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="requisições por comando")
+    parser.add_argument("--output", default=None, help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    engine = Engine(delay=30.0).start() # delay longo: os ARM só rearmam, nenhum disparo no meio
+    results = {"environment": environment_info(), "requests": args.requests, "transports": {}}
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            if hasattr(socket, "AF_UNIX"):
+                results["transports"]["unix"] = run_transport(
+                    "socket Unix", main.ControlServer(os.path.join(workdir, "control.sock")), args.requests)
+            results["transports"]["tcp"] = run_transport("TCP localhost", main.ControlServer(port=0), args.requests)
+    finally:
+        engine.stop()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    main.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main_cli()
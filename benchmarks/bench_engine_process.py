@@ -0,0 +1,149 @@
+"""Latência input → beep com o engine no processo da UI x num processo separado (--engine-process).
+
+A carga de UI sintética são --ui-threads threads Python ocupadas no processo da UI (como o
+Tk redesenhando a janela), que disputam o GIL com quem estiver no mesmo processo. Em cada
+modo, --presses presses são injetados no pygame_loop real (ver harness.py) com um delay
+curto; a latência é o instante em que a AudioThread volta de play() menos (post do evento
++ delay configurado).
+  - threads:  engine e carga de UI no mesmo processo (o modo padrão do app)
+  - processo: engine num processo spawn publicando o estado num EngineStatusBlock; a carga
+              roda no processo pai, que lê o bloco a cada ENGINE_PROCESS_POLL_MS como a UI
+
+Uso: python benchmarks/bench_engine_process.py [--presses 40] [--delay 0.05] [--ui-threads 1 2] [--output ep.json]
+"""
+import argparse
+import json
+import multiprocessing
+import queue
+import random
+import threading
+import time
+
+from harness import Engine, environment_info, main, percentiles_ms
+
+
+class BeepTracker(main.LatencyTracker):
+    """pipeline_latency que também anota quando cada beep saiu (play() retornado)."""
+    def __init__(self):
+        super().__init__()
+        self.beeps = queue.SimpleQueue()
+
+    def record(self, stage, seconds):
+        if stage == "end_to_end":
+            self.beeps.put(time.perf_counter())
+        super().record(stage, seconds)
+
+
+def run_presses(engine, presses, delay, seed=1):
+    """Um press por vez, esperando o beep dele; devolve as latências input → beep (s)."""
+    rng = random.Random(seed)
+    tracker = main.pipeline_latency = BeepTracker()
+    latencies = []
+    for _ in range(presses):
+        posted = time.perf_counter()
+        engine.press()
+        beeped = tracker.beeps.get(timeout=delay + 5.0)
+        latencies.append(beeped - posted - delay)
+        time.sleep(rng.uniform(0.01, 0.03)) # reação do jogador, fora da janela medida
+    return latencies
+
+
+def busy_load(stop):
+    """Trabalho Python puro (segura o GIL em fatias de sys.getswitchinterval())."""
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def start_load(threads):
+    stop = threading.Event()
+    workers = [threading.Thread(target=busy_load, args=(stop,), daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    return stop, workers
+
+
+def stop_load(stop, workers):
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+
+def run_threads(presses, delay, ui_threads):
+    engine = Engine(delay=delay).start()
+    stop, workers = start_load(ui_threads)
+    try:
+        return {"latency": percentiles_ms(run_presses(engine, presses, delay))}
+    finally:
+        stop_load(stop, workers)
+        engine.stop()
+
+
+def engine_child(results, block_name, presses, delay):
+    """Processo filho: o engine do harness publicando no bloco, como engine_process_main."""
+    main.engine_status_block = main.EngineStatusBlock.attach(block_name)
+    engine = Engine(delay=delay).start()
+    main.ui_root = None # Sem Tk aqui: status e timers só vão para o bloco compartilhado
+    main.FarmHelperApp.instance = None
+    try:
+        results.send(run_presses(engine, presses, delay))
+    finally:
+        engine.stop()
+        main.engine_status_block.close()
+        main.shutdown_logging()
+
+
+def run_process(presses, delay, ui_threads):
+    context = multiprocessing.get_context("spawn")
+    block = main.EngineStatusBlock.create()
+    receiver, sender = context.Pipe(duplex=False)
+    child = context.Process(target=engine_child, args=(sender, block.name, presses, delay), daemon=True)
+    child.start()
+    sender.close()
+    stop, workers = start_load(ui_threads)
+    reads, read_times, last_sequence = 0, [], 0
+    try:
+        while not receiver.poll(main.ENGINE_PROCESS_POLL_MS / 1000.0): # O tick de EngineProcess.poll
+            started = time.perf_counter()
+            sequence = block.sequence()
+            if sequence != last_sequence and block.read() is not None:
+                read_times.append(time.perf_counter() - started)
+                last_sequence = sequence
+                reads += 1
+        latencies = receiver.recv()
+    finally:
+        stop_load(stop, workers)
+        child.join(timeout=5.0)
+        block.close()
+    return {"latency": percentiles_ms(latencies), "status_reads": reads, "status_read": percentiles_ms(read_times)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--presses", type=int, default=40, help="presses por cenário")
+    parser.add_argument("--delay", type=float, default=0.05, help="delay do timer (s)")
+    parser.add_argument("--ui-threads", type=int, nargs="*", default=[1, 2],
+                        help="threads de carga de UI nos cenários com carga (sempre roda também sem carga)")
+    parser.add_argument("--output", default=None, help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    results = {"environment": environment_info(), "presses": args.presses, "delay": args.delay, "scenarios": []}
+    print(f"{args.presses} presses por cenário, delay {args.delay * 1000:.0f} ms; latência input → beep em ms")
+    print(f"{'modo':>9} {'carga':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'máx':>7}")
+    for ui_threads in [0] + [n for n in args.ui_threads if n > 0]:
+        for mode, run in (("threads", run_threads), ("processo", run_process)):
+            scenario = {"mode": mode, "ui_threads": ui_threads, **run(args.presses, args.delay, ui_threads)}
+            results["scenarios"].append(scenario)
+            stats = scenario["latency"]
+            extra = ""
+            if "status_reads" in scenario and scenario["status_read"]:
+                extra = f"  ({scenario['status_reads']} leituras do bloco, p50 {scenario['status_read']['p50'] * 1000:.1f} µs)"
+            print(f"{mode:>9} {ui_threads:>6} {stats['p50']:7.3f} {stats['p95']:7.3f} {stats['p99']:7.3f} "
+                  f"{stats['max']:7.3f}{extra}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    main.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main_cli()
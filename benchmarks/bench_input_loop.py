@@ -0,0 +1,50 @@
+"""Compara o loop de entrada padrão (poll + sleep de 20 ms) com o modo event-driven (--input-mode event).
+
+Injeta JOYBUTTONDOWN sintéticos no engine headless (ver harness.py) e mede:
+  - latência do evento postado até timer_scheduler.signal_press()
+  - tempo de CPU do processo com o loop ocioso
+
+Uso: python benchmarks/bench_input_loop.py [--presses N] [--idle-seconds S]
+"""
+import argparse
+import time
+
+from harness import Engine, percentiles_ms
+
+
+def run_mode(mode, presses, idle_seconds):
+    engine = Engine(input_mode=mode, with_timer=False).start()
+    for _ in range(presses):
+        engine.scheduler.pressed.clear()
+        engine.press()
+        engine.scheduler.pressed.wait(timeout=1.0)
+        time.sleep(0.007)  # desalinha os posts do período de poll
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    time.sleep(idle_seconds)
+    idle_cpu_ms = (time.process_time() - cpu_start) * 1000.0
+    idle_wall = time.perf_counter() - wall_start
+    engine.stop()
+    return {
+        "mode": mode,
+        "latency_ms": percentiles_ms(engine.scheduler.press_latencies),
+        "idle_cpu_ms_per_s": idle_cpu_ms / idle_wall,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--presses", type=int, default=200)
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for mode in ("poll", "event"):
+        r = run_mode(mode, args.presses, args.idle_seconds)
+        lat = r["latency_ms"]
+        print(f"{r['mode']:>5}: latência média {lat['mean']:.3f} ms | p50 {lat['p50']:.3f} ms | "
+              f"máx {lat['max']:.3f} ms ({lat['count']} presses) | CPU ociosa {r['idle_cpu_ms_per_s']:.2f} ms/s")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,129 @@
+"""Análise de logs longos (--analyze-log): vazão da varredura e conferência das contagens.
+
+Gera um log sintético no LOG_FORMAT com --megabytes MB: sessões com presses, inícios,
+resets e disparos do timer principal, pausas e muitas linhas DEBUG de ruído (status, pacer,
+som) entre eles, como um log de farm com --log-level DEBUG. Depois roda analyze_log sobre ele
+(opcionalmente gravando o CSV) e confere presses, inícios, resets, disparos, sessões, pausas,
+tempo pausado e duração das sessões com o que foi gerado.
+
+Uso: python benchmarks/bench_log_analysis.py [--megabytes 300] [--csv] [--keep ARQUIVO] [--output la.json]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from harness import environment_info, main
+
+NOISE = (
+    "DEBUG - PygameThread - main - next_pygame_events - 1520 - Evento pygame ignorado: JOYAXISMOTION eixo 1 valor -0.0039",
+    "DEBUG - MainThread - main - update_main_status_ui - 980 - Status atualizado: Timer em andamento (restam 3.2s)",
+    "DEBUG - TimerSoundThread - main - wait - 1210 - TimerScheduler: despertar sem disparo (mensagem na fila)",
+    "DEBUG - AudioThread - main - play - 1402 - Som tocado em 0.412 ms",
+)
+PREFIX = {"press": "INFO - PygameThread - main - pygame_loop - 1610 - ",
+          "timer": "INFO - TimerSoundThread - main - handle_timer_press - 1288 - ",
+          "fire": "INFO - TimerSoundThread - main - timer_sound_loop - 1320 - ",
+          "session": "INFO - MainThread - main - <module> - 4500 - "}
+
+
+class LogWriter:
+    def __init__(self, stream, start):
+        self.stream = stream
+        self.now = start
+        self._second, self._prefix = None, ""
+        self.last = start # Instante da última linha escrita
+
+    def line(self, text):
+        second = int(self.now)
+        if second != self._second: # strftime só uma vez por segundo de log
+            self._second, self._prefix = second, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(second))
+        self.stream.write(f"{self._prefix},{int((self.now - second) * 1000):03d} - {text}\n")
+        self.last = self.now
+
+
+def generate(path, megabytes, seed=7, delay=5.0, noise_per_cycle=12, reset_probability=0.1, pause_probability=0.01):
+    """Escreve o log sintético e devolve as contagens esperadas."""
+    rng = random.Random(seed)
+    truth = {"sessions": 0, "presses": 0, "starts": 0, "resets": 0, "fires": 0, "pauses": 0, "paused_seconds": 0.0,
+             "span_seconds": 0.0}
+    target = megabytes * 1024 * 1024
+    with open(path, "w", encoding="utf-8") as stream:
+        log = LogWriter(stream, 1_790_000_000.0)
+        while stream.tell() < target:
+            truth["sessions"] += 1
+            log.line(PREFIX["session"] + main.LOG_SESSION_SEPARATOR)
+            log.line(PREFIX["session"] + main.LOG_MSG_SESSION_START)
+            session_started = log.now
+            cycle = 0
+            running_until = None
+            for _ in range(rng.randint(200, 2000)):
+                cycle += 1
+                truth["presses"] += 1
+                log.line(PREFIX["press"] + main.LOG_MSG_PRESS % (0, "principal", "no controle 0"))
+                if running_until is not None and log.now < running_until:
+                    truth["resets"] += 1
+                    log.line(PREFIX["timer"] + main.LOG_MSG_TIMER_RESET % ("principal", delay, cycle))
+                else:
+                    truth["starts"] += 1
+                    log.line(PREFIX["timer"] + main.LOG_MSG_TIMER_STARTED % ("principal", delay, cycle))
+                running_until = log.now + delay
+                for _ in range(noise_per_cycle):
+                    log.now += rng.uniform(0.0, delay / (noise_per_cycle + 1))
+                    log.line(rng.choice(NOISE))
+                if rng.random() < reset_probability: # Press antes do disparo: o próximo ciclo é um reset
+                    log.now = max(log.now, running_until - delay * rng.uniform(0.1, 0.6))
+                    continue
+                log.now = running_until
+                truth["fires"] += 1
+                log.line(PREFIX["fire"] + main.LOG_MSG_TIMER_FIRED % ("principal", cycle, rng.gauss(0.4, 0.15)))
+                log.now += rng.uniform(0.3, 1.5) # Reação do jogador
+                if rng.random() < pause_probability:
+                    paused = rng.uniform(10.0, 600.0)
+                    log.line(PREFIX["press"] + main.LOG_MSG_INPUT_PAUSED)
+                    log.now += paused
+                    log.line(PREFIX["press"] + main.LOG_MSG_INPUT_RESUMED)
+                    truth["pauses"] += 1
+                    truth["paused_seconds"] += paused
+                    running_until = None
+            truth["span_seconds"] += log.last - session_started
+            log.now += rng.uniform(3600.0, 36000.0) # Intervalo entre sessões
+    return truth
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=int, default=300, help="tamanho do log sintético")
+    parser.add_argument("--csv", action="store_true", help="grava também o CSV (--analyze-csv)")
+    parser.add_argument("--keep", metavar="ARQUIVO", default=None, help="gera o log neste caminho e não apaga")
+    parser.add_argument("--output", default=None, help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        log_path = args.keep or os.path.join(workdir, main.LOG_FILENAME)
+        started = time.perf_counter()
+        truth = generate(log_path, args.megabytes)
+        print(f"log sintético: {os.path.getsize(log_path) / (1024 * 1024):.0f} MB em {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        report = main.analyze_log([log_path], os.path.join(workdir, "analise.csv") if args.csv else None)
+        elapsed = time.perf_counter() - started
+    print(main.format_log_analysis(report))
+    timer = report["timers"].get("principal", {})
+    found = {"sessions": report["sessions"], "presses": timer.get("presses"), "starts": timer.get("starts"),
+             "resets": timer.get("resets"), "fires": timer.get("fires"), "pauses": report["pauses"],
+             "paused_seconds": report["paused_seconds"], "span_seconds": report["span_seconds"]}
+    tolerance = {"paused_seconds": 0.001 * truth["pauses"], "span_seconds": 0.001 * truth["sessions"]} # ms do asctime
+    mismatched = [key for key in truth if abs(found[key] - truth[key]) > tolerance.get(key, 0) + 1e-6]
+    print(f"total: {elapsed:.2f}s ({report['bytes'] / (1024 * 1024) / elapsed:.0f} MB/s); "
+          + ("contagens conferem com o log gerado" if not mismatched else f"DIVERGE: {', '.join(mismatched)}"))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "megabytes": args.megabytes, "seconds": elapsed,
+                       "truth": truth, "report": report, "mismatched": mismatched}, f, indent=2)
+    main.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main_cli()
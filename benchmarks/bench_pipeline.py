@@ -0,0 +1,148 @@
+"""Suite headless do pipeline entrada → timer → som.
+
+Roda pygame_loop e timer_and_sound_task reais com drivers dummy do SDL e UI simulada
+(ver harness.py), injeta JOYBUTTONDOWN sintéticos e gera um JSON com:
+  - steady: um press por ciclo -> latência do press, jitter do disparo, disparos perdidos/duplicados
+  - reset_storm: rajada de presses mais rápida que o delay -> deve disparar exatamente uma vez
+  - idle: engine parado -> tempo de CPU por thread
+  - paused: engine pausado, com o watchdog ligado como na aplicação -> input, timer, WatchdogThread
+    e o batimento do Tk devem ficar bloqueados (zero despertares, zero ui_root.after)
+Cada cenário também registra o tempo de CPU por thread (time.thread_time), a CPU do processo por
+segundo de medição, os despertares por segundo de cada thread e as chamadas ui_root.after.
+
+Uso: python benchmarks/bench_pipeline.py [--output bench.json] [--rate HZ] [--presses N] ...
+Compare dois JSONs (ex: antes/depois de uma mudança) para detectar regressões.
+"""
+import argparse
+import json
+import time
+
+from harness import Engine, environment_info, main, percentiles_ms
+
+
+def fire_count(engine):
+    return sum(1 for _, kind, _ in engine.app.timer_events if kind == "fired")
+
+
+def wait_fires(engine, expected, timeout):
+    deadline = time.perf_counter() + timeout
+    while fire_count(engine) < expected and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+
+def scenario_result(engine, expected_fires, wall_seconds):
+    fires = fire_count(engine)
+    errors_s = [err for _, _, err in engine.scheduler.firing_errors]
+    return {
+        "wall_seconds": wall_seconds,
+        "presses_posted": engine.press_count,
+        "presses_handled": len(engine.scheduler.press_latencies),
+        "expected_fires": expected_fires,
+        "fires": fires,
+        "missed_fires": max(0, expected_fires - fires),
+        "duplicate_fires": max(0, fires - expected_fires),
+        "press_latency_ms": percentiles_ms(engine.scheduler.press_latencies),
+        "firing_error_ms": percentiles_ms(errors_s),
+        "pipeline_stages": engine.latency_snapshot,
+        "engine_metrics": engine.engine_metrics,
+        "thread_cpu_ms": {name: cpu * 1000.0 for name, cpu in sorted(engine.cpu_seconds.items())},
+        "process_cpu_ms_per_second": engine.process_cpu_ms_per_second,
+        "wakeups_per_second": engine.wakeups_per_second,
+        "ui_after_calls": engine.root.after_calls,
+    }
+
+
+def run_steady(args):
+    engine = Engine(delay=args.delay).start()
+    interval = 1.0 / args.rate
+    if interval <= args.delay:
+        raise SystemExit("--rate precisa deixar cada ciclo terminar (1/rate > delay) no cenário steady")
+    start = time.perf_counter()
+    for i in range(args.presses):
+        engine.press()
+        next_at = start + (i + 1) * interval
+        time.sleep(max(0.0, next_at - time.perf_counter()))
+    wait_fires(engine, args.presses, timeout=args.delay + 2.0)
+    wall = time.perf_counter() - start
+    engine.stop()
+    return scenario_result(engine, args.presses, wall)
+
+
+def run_reset_storm(args):
+    engine = Engine(delay=args.delay).start()
+    interval = 1.0 / args.storm_rate
+    start = time.perf_counter()
+    for i in range(args.storm_presses):
+        engine.press()
+        next_at = start + (i + 1) * interval
+        time.sleep(max(0.0, next_at - time.perf_counter()))
+    wait_fires(engine, 1, timeout=args.delay + 2.0)
+    time.sleep(args.delay) # janela para flagrar um disparo duplicado
+    wall = time.perf_counter() - start
+    engine.stop()
+    return scenario_result(engine, 1, wall)
+
+
+def run_idle(args):
+    engine = Engine(delay=args.delay).start()
+    start = time.perf_counter()
+    time.sleep(args.idle_seconds)
+    wall = time.perf_counter() - start
+    engine.stop()
+    return scenario_result(engine, 0, wall)
+
+
+def run_paused(args):
+    engine = Engine(delay=args.delay).start()
+    if args.stall_threshold_ms > 0:
+        main.stall_watchdog = main.StallWatchdog().start(args.stall_threshold_ms)
+        engine.root.after(0, main.stall_watchdog.tk_beat)
+    main.engine_state.update(paused=True)
+    main.timer_scheduler.pause()
+    main.wake_pygame_loop()
+    # o loop de input sai do event.wait, o watchdog termina o intervalo em curso e o Tk estaciona o batimento
+    time.sleep(0.1 + (main.stall_watchdog.interval or 0.0))
+    engine.begin_measurement()
+    after_calls = engine.root.after_calls
+    start = time.perf_counter()
+    time.sleep(args.idle_seconds)
+    wall = time.perf_counter() - start
+    after_calls = engine.root.after_calls - after_calls
+    main.stall_watchdog.stop()
+    engine.stop()
+    result = scenario_result(engine, 0, wall)
+    result["ui_after_calls_paused"] = after_calls
+    return result
+
+
+SCENARIOS = {"steady": run_steady, "reset_storm": run_reset_storm, "idle": run_idle, "paused": run_paused}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="lista separada por vírgula")
+    parser.add_argument("--delay", type=float, default=0.2, help="delay do timer em segundos")
+    parser.add_argument("--rate", type=float, default=4.0, help="presses por segundo no cenário steady")
+    parser.add_argument("--presses", type=int, default=40, help="presses no cenário steady")
+    parser.add_argument("--storm-rate", type=float, default=200.0, help="presses por segundo na rajada")
+    parser.add_argument("--storm-presses", type=int, default=200, help="presses na rajada")
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--stall-threshold-ms", type=float, default=main.STALL_THRESHOLD_MS_DEFAULT,
+                        help="limiar do watchdog no cenário paused (0 = desligado)")
+    parser.add_argument("--output", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    report = {"environment": environment_info(), "parameters": vars(args), "scenarios": {}}
+    for name in args.scenarios.split(","):
+        report["scenarios"][name] = SCENARIOS[name](args)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main_cli()
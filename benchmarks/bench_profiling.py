@@ -0,0 +1,101 @@
+"""Custo da instrumentação de diagnóstico (--profile / card de estatísticas / comando PROFILE).
+
+Mede:
+  - Instrumentation.sample_thread_cpu (CPU de todas as threads, lida por quem mostra o relatório)
+  - ui_root.after puro x via schedule_ui (contado por thread)
+  - o engine real (ver harness.py) num ciclo steady, com a instrumentação desligada e ligada
+    (uma janela do SamplingProfiler aberta durante todo o cenário):
+    latência do press, erro de disparo, CPU do processo por segundo e CPU da ProfilerThread
+
+Uso: python benchmarks/bench_profiling.py [--cycles 40] [--delay 0.1] [--calls 200000] [--output prof.json]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import timeit
+
+from harness import Engine, environment_info, main, percentiles_ms
+
+
+class NullRoot:
+    def after(self, ms, func=None, *args):
+        return None
+
+
+def per_call_ns(func, calls):
+    return min(timeit.repeat(func, number=calls, repeat=5)) / calls * 1e9
+
+
+def micro(calls):
+    results = {"sample_cpu_us": per_call_ns(main.instrumentation.sample_thread_cpu, max(1, calls // 100)) / 1000.0}
+    root = main.ui_root = NullRoot()
+    results["after_raw_ns"] = per_call_ns(lambda: root.after(0), calls)
+    results["after_counted_ns"] = per_call_ns(lambda: main.schedule_ui(0, None), calls)
+    main.ui_root = None
+    return results
+
+
+def run_engine(cycles, delay, profile_path=None):
+    engine = Engine(delay=delay).start()
+    profiler = None
+    if profile_path:
+        main.instrumentation.enabled = True
+        profiler = main.instrumentation.profiler = main.SamplingProfiler(profile_path, cycles * delay * 10).start()
+    try:
+        for _ in range(cycles):
+            engine.press()
+            time.sleep(delay * 1.5)
+    finally:
+        if profiler is not None:
+            main.instrumentation.sample_thread_cpu() # Antes do stop(): as threads do engine ainda estão vivas
+        engine.stop()
+        if profiler is not None:
+            main.instrumentation.set_enabled(False)
+    result = {
+        "press_latency_ms": percentiles_ms(engine.scheduler.press_latencies),
+        "firing_error_ms": percentiles_ms([err for _, _, err in engine.scheduler.firing_errors]),
+        "process_cpu_ms_per_second": engine.process_cpu_ms_per_second,
+    }
+    if profiler is not None:
+        elapsed = profiler.elapsed()
+        result.update(profiler_samples=profiler.samples, profiler_cpu_ms_per_second=profiler.cpu_seconds * 1000.0 / elapsed,
+                      thread_cpu_seconds=dict(main.instrumentation.thread_cpu),
+                      after_calls=main.instrumentation.after_calls.snapshot())
+    return result
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=40, help="ciclos do engine por cenário")
+    parser.add_argument("--delay", type=float, default=0.1, help="delay do timer (s)")
+    parser.add_argument("--calls", type=int, default=200000, help="chamadas por medição das microbenchmarks")
+    parser.add_argument("--output", default=None, help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    results = {"environment": environment_info(), "cycles": args.cycles, "delay": args.delay,
+               "sample_interval_ms": main.PROFILE_SAMPLE_INTERVAL_MS, "micro": micro(args.calls)}
+    m = results["micro"]
+    print(f"CPU de todas as threads: {m['sample_cpu_us']:.1f} µs por amostragem")
+    print(f"after(): {m['after_raw_ns']:.0f} ns puro, {m['after_counted_ns']:.0f} ns contado")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results["off"] = run_engine(args.cycles, args.delay)
+        results["on"] = run_engine(args.cycles, args.delay, os.path.join(workdir, "bench.folded"))
+    print(f"{'instrumentação':>14} {'press p50':>10} {'press p99':>10} {'disparo p99':>12} {'CPU proc/s':>11}")
+    for label in ("off", "on"):
+        scenario = results[label]
+        print(f"{label:>14} {scenario['press_latency_ms']['p50']:10.3f} {scenario['press_latency_ms']['p99']:10.3f} "
+              f"{scenario['firing_error_ms']['p99']:12.3f} {scenario['process_cpu_ms_per_second']:8.2f} ms")
+    on = results["on"]
+    print(f"profiler: {on['profiler_samples']} amostras a {1000 / main.PROFILE_SAMPLE_INTERVAL_MS:.0f} Hz, "
+          f"{on['profiler_cpu_ms_per_second']:.2f} ms de CPU por segundo")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    main.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,103 @@
+"""Gravação e replay do fluxo de input (--record-input / --replay-input).
+
+Cenários:
+  - sessão gravada: roda o engine real (ver harness.py) com o InputRecorder ligado, com
+    presses, resets no meio da contagem e uma pausa; depois reproduz a gravação acelerada e em
+    tempo real e confere os disparos contra os gravados
+  - sessão sintética longa: gera uma gravação de --hours horas de farm (ciclos com tempo de
+    reação variável, resets e pausas entre ciclos) e mede quanto o replay acelerado leva
+
+Uso: python benchmarks/bench_replay.py [--hours 1] [--presses 12] [--delay 0.3] [--skip-realtime]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from harness import Engine, main
+
+
+def record_session(path, presses, delay):
+    engine = Engine(delay=delay).start()
+    main.input_recorder = main.InputRecorder.open(path, main.timer_scheduler.now())
+    for i in range(presses):
+        engine.press()
+        if i % 4 == 3: # reset no meio da contagem
+            time.sleep(delay / 2)
+            engine.press()
+        if i == presses // 2: # pausa com o timer contando
+            time.sleep(delay / 3)
+            main.pause_engine()
+            time.sleep(delay)
+            main.resume_engine()
+        time.sleep(delay * 1.5)
+    time.sleep(delay)
+    recorder, main.input_recorder = main.input_recorder, None
+    recorder.close()
+    engine.stop()
+    return recorder.events
+
+
+def synthesize_session(path, hours, delay, seed=1):
+    """Gravação sintética: o disparo "gravado" é o deadline mais um erro de disparo típico (< 1 ms)."""
+    rng = random.Random(seed)
+    with open(path, "wb") as stream:
+        recorder = main.InputRecorder(stream, 0.0, main.EngineSettings(delay, main.ACTION_BUTTON_INDEX_DEFAULT,
+                                                                       False, True, 0.7, False), timers={})
+        at = 1.0
+        while at < hours * 3600:
+            press = main.PressMessage(at, at, main.MAIN_TIMER_NAME, main.ACTION_BUTTON_INDEX_DEFAULT)
+            recorder.record_press(press, delay)
+            if rng.random() < 0.1: # reset antes de o timer terminar
+                at += rng.uniform(0.2, delay * 0.8)
+                recorder.record_press(press._replace(signalled_at=at, pressed_at=at), delay)
+            at += delay
+            error = abs(rng.gauss(0.0003, 0.0002))
+            recorder.record_fire(main.MAIN_TIMER_NAME, at + error, error)
+            at += abs(rng.gauss(0.35, 0.1)) # tempo de reação do jogador
+            if rng.random() < 0.01: # pausa entre ciclos
+                recorder.record_event(main.InputRecorder.PAUSE, at)
+                at += rng.uniform(5, 60)
+                recorder.record_event(main.InputRecorder.RESUME, at)
+                at += 0.5
+        recorder.close()
+        return recorder.events
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=1.0, help="duração da sessão sintética")
+    parser.add_argument("--presses", type=int, default=12, help="presses da sessão gravada")
+    parser.add_argument("--delay", type=float, default=0.3, help="delay da sessão gravada (s)")
+    parser.add_argument("--skip-realtime", action="store_true", help="não reproduz a sessão gravada em tempo real")
+    parser.add_argument("--output", default=None, help="grava os relatórios em JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        recorded_path = os.path.join(workdir, "recorded.fhrec")
+        events = record_session(recorded_path, args.presses, args.delay)
+        print(f"sessão gravada: {events} eventos, {os.path.getsize(recorded_path)} bytes")
+        results["recorded_accelerated"] = main.replay_recording(recorded_path)
+        print(main.format_replay_report(results["recorded_accelerated"]))
+        if not args.skip_realtime:
+            results["recorded_realtime"] = main.replay_recording(recorded_path, realtime=True)
+            print(main.format_replay_report(results["recorded_realtime"]))
+
+        synthetic_path = os.path.join(workdir, "synthetic.fhrec")
+        events = synthesize_session(synthetic_path, args.hours, main.INITIAL_DELAY_SECONDS)
+        print(f"sessão sintética de {args.hours:g} h: {events} eventos, {os.path.getsize(synthetic_path)} bytes")
+        main.logging.getLogger().setLevel("INFO") # um log DEBUG por evento mediria o logging, não o replay
+        results["synthetic_accelerated"] = main.replay_recording(synthetic_path)
+        print(main.format_replay_report(results["synthetic_accelerated"]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    main.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main_cli()
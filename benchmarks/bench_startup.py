@@ -0,0 +1,79 @@
+"""Mede o tempo de inicialização a frio (processo novo a cada rodada).
+
+Cenários:
+  - import main.py: quanto custa importar o módulo (pygame e numpy ficam fora do caminho crítico)
+  - import pygame + numpy: o que o import antigo pagava antes da janela, para comparação
+  - app completo: roda `main.py --exit-after-startup` e coleta a linha do tempo
+    (processo iniciado → import → janela visível → controles prontos → som pronto).
+    Precisa de display (Tk); sem display esse cenário é pulado.
+
+Uso: python benchmarks/bench_startup.py [--runs 5] [--skip-app]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHILD_ENV = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+
+
+def run_snippet(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=CHILD_ENV, check=True,
+                   stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def run_app():
+    """Roda o app uma vez; devolve {marco: ms desde o processo iniciado} ou None se não houver display."""
+    launched_epoch = time.time()
+    process = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "main.py"), "--exit-after-startup",
+                              "--no-history", "--log-backups", "0", "--log-level", "INFO"],
+                             cwd=REPO_ROOT, env=CHILD_ENV, capture_output=True, text=True, timeout=60)
+    for line in process.stdout.splitlines():
+        if line.startswith("{"):
+            report = json.loads(line)
+            interpreter_ms = (report["module_started_epoch"] - launched_epoch) * 1000.0
+            timeline = {"interpretador": interpreter_ms}
+            timeline.update({name: interpreter_ms + elapsed for name, elapsed in report["startup_ms"].items()})
+            return timeline
+    return None
+
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-app", action="store_true", help="mede só os imports (sem abrir a janela)")
+    args = parser.parse_args()
+
+    baseline = median([run_snippet("pass") for _ in range(args.runs)])
+    print(f"interpretador vazio: {baseline:.0f} ms (descontado abaixo)")
+    for label, code in (("import main.py", "import main"),
+                        ("import pygame + numpy", "import pygame, numpy")):
+        elapsed = median([run_snippet(code) for _ in range(args.runs)])
+        print(f"{label:>22}: {elapsed - baseline:7.0f} ms")
+
+    if args.skip_app:
+        return
+    runs = []
+    for _ in range(args.runs):
+        timeline = run_app()
+        if timeline is None:
+            print("app completo: sem display disponível (Tk não abriu), cenário pulado")
+            return
+        runs.append(timeline)
+    print(f"app completo (mediana de {len(runs)} rodadas, ms desde o processo iniciado):")
+    for name in sorted(runs[0], key=runs[0].get):
+        print(f"{name:>22}: {median([timeline[name] for timeline in runs]):7.0f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,108 @@
+"""Mede o erro de disparo do TimerScheduler (instante real - deadline) ao longo de vários ciclos.
+
+Compara o modo normal (só sleep) com o modo de precisão (sleep + espera ativa nos últimos
+--spin-threshold-ms, com o intervalo de troca do GIL que enable_precision_timer usa), com e
+sem carga: --load-threads threads Python ocupadas disputando o GIL, como a thread do Tk
+redesenhando a UI. Para cada modo imprime a distribuição do erro
+(jitter) e o tempo de CPU da thread do timer por ciclo.
+
+Uso: python benchmarks/bench_timer_scheduler.py [--cycles N] [--delay S] [--spin-threshold-ms 1 2]
+     [--load-threads 1] [--output jitter.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def run(cycles, delay, spin_threshold=0.0):
+    scheduler = main.TimerScheduler(spin_threshold=spin_threshold)
+    wakeups = 0
+    cpu_seconds = 0.0
+
+    def worker():
+        nonlocal wakeups, cpu_seconds
+        started_cpu = time.thread_time()
+        fired = 0
+        while fired < cycles:
+            outcome = scheduler.wait()
+            wakeups += 1
+            if outcome == main.TimerScheduler.FIRE:
+                fired += 1
+                if fired < cycles:
+                    scheduler.arm(delay)
+        cpu_seconds = time.thread_time() - started_cpu
+
+    thread = threading.Thread(target=worker, name="TimerSoundThread")
+    scheduler.arm(delay)
+    thread.start()
+    thread.join()
+    errors_ms = sorted(err * 1000.0 for _, _, err in scheduler.firing_errors)
+    return errors_ms, wakeups, cpu_seconds * 1000.0 / cycles
+
+
+def busy_load(stop):
+    """Trabalho Python puro (segura o GIL em fatias de sys.getswitchinterval())."""
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def distribution(errors_ms):
+    n = len(errors_ms)
+    pick = lambda q: errors_ms[min(n - 1, int(q * n))]  # noqa: E731
+    return {"count": n, "mean": statistics.fmean(errors_ms), "stdev": statistics.pstdev(errors_ms),
+            "p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": errors_ms[-1]}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--spin-threshold-ms", type=float, nargs="*", default=[main.TIMER_SPIN_THRESHOLD_MS_DEFAULT],
+                        help="limiares do modo de precisão a comparar com o modo normal")
+    parser.add_argument("--load-threads", type=int, default=1, help="threads ocupadas no cenário com carga (0 = só sem carga)")
+    parser.add_argument("--output", default=None, help="grava as distribuições em JSON")
+    args = parser.parse_args()
+
+    modes = [("normal", 0.0)] + [(f"precisão {threshold:g} ms", threshold / 1000.0) for threshold in args.spin_threshold_ms]
+    loads = [0] + ([args.load_threads] if args.load_threads > 0 else [])
+    results = []
+    print(f"{args.cycles} ciclos de {args.delay * 1000:.0f} ms por modo; erro de disparo em ms")
+    print(f"{'modo':>16} {'carga':>6} {'p50':>7} {'p90':>7} {'p99':>7} {'máx':>7} {'desvio':>7} {'CPU/ciclo':>10}")
+    for load in loads:
+        stop = threading.Event()
+        load_threads = [threading.Thread(target=busy_load, args=(stop,), daemon=True) for _ in range(load)]
+        for thread in load_threads:
+            thread.start()
+        try:
+            for label, spin_threshold in modes:
+                default_switch_interval = sys.getswitchinterval()
+                if spin_threshold:
+                    sys.setswitchinterval(main.precision_switch_interval(spin_threshold))
+                try:
+                    errors_ms, wakeups, cpu_ms_per_cycle = run(args.cycles, args.delay, spin_threshold)
+                finally:
+                    sys.setswitchinterval(default_switch_interval)
+                stats = distribution(errors_ms)
+                results.append({"mode": label, "spin_threshold_ms": spin_threshold * 1000.0, "load_threads": load,
+                                "wakeups": wakeups, "cpu_ms_per_cycle": cpu_ms_per_cycle, "firing_error_ms": stats})
+                print(f"{label:>16} {load:>6} {stats['p50']:7.3f} {stats['p90']:7.3f} {stats['p99']:7.3f} "
+                      f"{stats['max']:7.3f} {stats['stdev']:7.3f} {cpu_ms_per_cycle:8.3f} ms")
+        finally:
+            stop.set()
+            for thread in load_threads:
+                thread.join()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"cycles": args.cycles, "delay": args.delay, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,89 @@
+"""Compara a geração do beep antiga (loop por amostra) com o motor de síntese vetorizado.
+
+Cenários, todos gerando o mesmo beep senoidal de 440 Hz:
+  - legado:       cópia de referência do loop por amostra que existia em generate_simple_beep
+  - vetorizado:   synthesize_cue (NumPy) + make_sound, sem cache
+  - cache (RAM):  ToneCache.get_sound após o primeiro acesso
+  - cache (disco): ToneCache novo lendo o WAV persistido por uma execução anterior
+Também confere que o buffer vetorizado bate com o legado (diferença máxima em amostras int16).
+
+Uso: python benchmarks/bench_tone_synthesis.py [--duration-ms 200] [--repeats 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pygame  # noqa: E402
+import main  # noqa: E402
+
+main.load_pygame() # main.py importa o pygame sob demanda; aqui ele é usado desde o início
+
+
+def legacy_beep_buffer(frequency, duration_ms, sample_rate):
+    n_samples = int(sample_rate * duration_ms / 1000.0)
+    buf = np.zeros((n_samples, 2), dtype=np.int16)
+    max_sample = 2**(15) - 1
+    for s_idx in range(n_samples):
+        t_sample = float(s_idx) / sample_rate
+        value = int(max_sample * np.sin(2 * np.pi * frequency * t_sample))
+        buf[s_idx][0] = value
+        buf[s_idx][1] = value
+    return buf
+
+
+def time_ms(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return samples[len(samples) // 2], samples[-1]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration-ms", type=int, default=200)
+    parser.add_argument("--frequency", type=int, default=440)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    pygame.mixer.init(frequency=main.AUDIO_FREQUENCY, channels=2)
+    sample_rate = pygame.mixer.get_init()[0]
+    cue = (main.Tone(args.frequency, args.duration_ms),)
+
+    legacy = legacy_beep_buffer(args.frequency, args.duration_ms, sample_rate)
+    vectorized = main.synthesize_cue(cue, sample_rate, 2)
+    max_diff = int(np.max(np.abs(legacy.astype(np.int32) - vectorized.astype(np.int32))))
+
+    results = {
+        "legado": time_ms(lambda: pygame.sndarray.make_sound(
+            legacy_beep_buffer(args.frequency, args.duration_ms, sample_rate)), max(3, args.repeats // 4)),
+        "vetorizado": time_ms(lambda: pygame.sndarray.make_sound(
+            main.synthesize_cue(cue, sample_rate, 2)), args.repeats),
+    }
+    with tempfile.TemporaryDirectory() as persist_dir:
+        warm_cache = main.ToneCache(persist_dir=persist_dir)
+        warm_cache.get_sound(cue)
+        results["cache (RAM)"] = time_ms(lambda: warm_cache.get_sound(cue), args.repeats)
+        results["cache (disco)"] = time_ms(
+            lambda: main.ToneCache(persist_dir=persist_dir).get_sound(cue), args.repeats)
+
+    print(f"beep {args.frequency} Hz, {args.duration_ms} ms @ {sample_rate} Hz "
+          f"(diferença máxima legado x vetorizado: {max_diff} LSB)")
+    print(f"{'cenário':>14} {'mediana ms':>11} {'máx ms':>9} {'ganho':>8}")
+    legacy_median = results["legado"][0]
+    for name, (median, worst) in results.items():
+        print(f"{name:>14} {median:11.3f} {worst:9.3f} {legacy_median / median:7.0f}x")
+    pygame.mixer.quit()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,112 @@
+"""Watchdog de travamentos (--stall-threshold-ms): custo dos batimentos e tempo até detectar.
+
+Mede:
+  - StallWatchdog.busy/idle (o que input e timer pagam por despertar) e uma check() completa
+  - o engine real (ver harness.py) num ciclo steady com o watchdog ligado: não pode haver
+    travamento falso, e o lag visto por loop fica registrado
+  - travamentos induzidos: --stall-seconds de trabalho dentro do loop do Tk simulado e dentro
+    da thread do timer (handle_timer_press lento); para cada um, quanto tempo depois do início
+    o travamento foi registrado e o maior atraso visto
+
+Uso: python benchmarks/bench_watchdog.py [--threshold-ms 200] [--stall-seconds 0.6] [--cycles 20] [--output wd.json]
+"""
+import argparse
+import json
+import time
+import timeit
+
+from harness import Engine, environment_info, main
+
+
+def per_call_ns(func, calls):
+    return min(timeit.repeat(func, number=calls, repeat=5)) / calls * 1e9
+
+
+def micro(calls):
+    watchdog = main.StallWatchdog()
+    watchdog.threshold = watchdog.interval = 1.0
+    results = {"busy_ns": per_call_ns(lambda: watchdog.busy("bench"), calls),
+               "idle_ns": per_call_ns(lambda: watchdog.idle("bench", 1.0), calls)}
+    watchdog.busy("input"); watchdog.idle("timer", 1.0)
+    results["check_us"] = per_call_ns(watchdog.check, max(1, calls // 100)) / 1000.0
+    return results
+
+
+def wait_stall(loop, started, timeout):
+    """Segundos entre o início do travamento induzido e o registro dele pelo watchdog."""
+    while time.perf_counter() - started < timeout:
+        if main.stall_watchdog.stall_counts.get(loop, 0):
+            return time.perf_counter() - started
+        time.sleep(0.005)
+    return None
+
+
+def run(threshold_ms, stall_seconds, cycles, delay):
+    main.stall_watchdog = main.StallWatchdog().start(threshold_ms)
+    engine = Engine(delay=delay).start()
+    engine.root.after(0, main.stall_watchdog.tk_beat)
+    results = {}
+    try:
+        for _ in range(cycles):
+            engine.press()
+            time.sleep(delay * 1.5)
+        results["steady"] = {"stalls": dict(main.stall_watchdog.stall_counts),
+                             "max_lag_ms": {loop: lag * 1000 for loop, lag in main.stall_watchdog.max_lag.items()}}
+
+        started = time.perf_counter()
+        engine.root.after(0, time.sleep, stall_seconds) # Callback do Tk que segura o mainloop
+        detected = wait_stall("tk", started, stall_seconds + 2.0)
+        time.sleep(stall_seconds + 0.5)
+        results["tk"] = {"detected_after_ms": detected and detected * 1000}
+
+        handle_timer_press = main.handle_timer_press
+        def slow_press(*args):
+            time.sleep(stall_seconds)
+            handle_timer_press(*args)
+        main.handle_timer_press = slow_press
+        started = time.perf_counter()
+        engine.press()
+        detected = wait_stall("timer", started, stall_seconds + 2.0)
+        time.sleep(stall_seconds + 0.5)
+        main.handle_timer_press = handle_timer_press
+        results["timer"] = {"detected_after_ms": detected and detected * 1000}
+    finally:
+        main.stall_watchdog.stop()
+        engine.stop()
+    for loop in ("tk", "timer"):
+        results[loop]["max_lag_ms"] = main.stall_watchdog.max_lag.get(loop, 0.0) * 1000
+        results[loop]["stalls"] = main.stall_watchdog.stall_counts.get(loop, 0)
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold-ms", type=float, default=200.0, help="limiar de travamento do watchdog")
+    parser.add_argument("--stall-seconds", type=float, default=0.6, help="duração de cada travamento induzido")
+    parser.add_argument("--cycles", type=int, default=20, help="ciclos do cenário steady")
+    parser.add_argument("--delay", type=float, default=0.1, help="delay do timer (s)")
+    parser.add_argument("--calls", type=int, default=200000, help="chamadas por medição das microbenchmarks")
+    parser.add_argument("--output", default=None, help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    results = {"environment": environment_info(), "threshold_ms": args.threshold_ms,
+               "stall_seconds": args.stall_seconds, "micro": micro(args.calls)}
+    m = results["micro"]
+    print(f"batimento: busy {m['busy_ns']:.0f} ns, idle {m['idle_ns']:.0f} ns; check() {m['check_us']:.1f} µs")
+    results.update(run(args.threshold_ms, args.stall_seconds, args.cycles, args.delay))
+    steady = results["steady"]
+    print(f"steady ({args.cycles} ciclos): travamentos {sum(steady['stalls'].values())}, lag máx "
+          + ", ".join(f"{loop} {lag:.1f} ms" for loop, lag in sorted(steady["max_lag_ms"].items())))
+    for loop in ("tk", "timer"):
+        scenario = results[loop]
+        detected = f"{scenario['detected_after_ms']:.0f} ms" if scenario["detected_after_ms"] is not None else "não detectado"
+        print(f"travamento de {args.stall_seconds * 1000:.0f} ms no {loop}: registrado após {detected}, "
+              f"{scenario['stalls']} evento(s), maior atraso visto {scenario['max_lag_ms']:.0f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    main.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main_cli()
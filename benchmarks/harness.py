@@ -0,0 +1,220 @@
+"""Infraestrutura comum dos benchmarks: roda o engine real (pygame_loop + timer_and_sound_task)
+sem controle, vídeo, áudio ou janela Tk.
+
+- SDL com drivers dummy de vídeo e áudio
+- BenchJoystick no lugar do controle físico (aceita os JOYBUTTONDOWN injetados)
+- logging configurado como em produção, gravando num arquivo temporário
+- StubTkRoot/StubVar/StubApp no lugar da UI: ui_root.after() vira uma fila drenada por uma
+  thread "TkThread", então o custo das chamadas cruzadas continua sendo exercitado
+"""
+import collections
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # mantém o stdout limpo para o JSON
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import pygame  # noqa: E402
+import main  # noqa: E402
+
+main.load_pygame() # main.py importa o pygame sob demanda; aqui ele é usado desde o início
+
+BENCH_INSTANCE_ID = 0
+
+# Logging como em produção (DEBUG, fila + thread escritora), mas num arquivo temporário
+main.log_file_path = os.path.join(tempfile.gettempdir(), "farm_helper_bench.log")
+main.configure_logging(backup_count=0)
+
+
+class BenchJoystick:
+    """Substitui o pygame.joystick.Joystick para que pygame_loop aceite os eventos injetados."""
+    def get_instance_id(self): return BENCH_INSTANCE_ID
+    def get_init(self): return True
+    def get_name(self): return "Bench Joystick"
+    def get_guid(self): return "bench"
+    def quit(self): pass
+
+
+class StubVar:
+    def __init__(self, value=None):
+        self._value = value
+    def get(self): return self._value
+    def set(self, value): self._value = value
+
+
+class StubTkRoot:
+    """Imita o pedaço do Tk usado pelas threads do engine (after, winfo_exists, event_generate)."""
+    def __init__(self):
+        self._calls = queue.SimpleQueue()
+        self.after_calls = 0
+        self._thread = None
+
+    def after(self, ms, func=None, *args):
+        self.after_calls += 1
+        self._calls.put((func, args))
+        return self.after_calls
+
+    def after_cancel(self, job_id): pass
+    def winfo_exists(self): return True
+    def event_generate(self, sequence): pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self._mainloop, name="TkThread", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._calls.put(None)
+        self._thread.join(timeout=2.0)
+
+    def _mainloop(self):
+        while True:
+            item = self._calls.get()
+            if item is None:
+                return
+            func, args = item
+            if func is not None:
+                func(*args)
+
+
+class StubApp:
+    """FarmHelperApp mínimo: registra os eventos do timer publicados pelo engine."""
+    def __init__(self):
+        self.timer_events = []
+
+    def on_timer_event(self, kind, deadline=None, duration=None, remaining=None, name=None):
+        self.timer_events.append((time.perf_counter(), kind, name))
+
+
+class PressRecorder(main.TimerScheduler):
+    """timer_scheduler que casa cada press sinalizado com o instante em que o evento foi postado."""
+    def __init__(self):
+        super().__init__()
+        self.posted = collections.deque()
+        self.press_latencies = []
+        self.pressed = threading.Event()
+
+    def signal_press(self, signalled_at=None, timer_name=main.MAIN_TIMER_NAME, pressed_at=None, button=None):
+        now = time.perf_counter()
+        if self.posted:
+            self.press_latencies.append(now - self.posted.popleft())
+        super().signal_press(signalled_at, timer_name, pressed_at, button)
+        self.pressed.set()
+
+
+class Engine:
+    """Sobe o engine com a UI simulada e mede o tempo de CPU de cada thread (time.thread_time)."""
+    def __init__(self, delay=0.2, input_mode=None, with_timer=True):
+        self.delay = delay
+        self.input_mode = input_mode
+        self.with_timer = with_timer
+        self.cpu_seconds = {}
+        self.threads = []
+        self.root = StubTkRoot()
+        self.app = StubApp()
+        self.press_count = 0
+        self.latency_snapshot = None
+        self.engine_metrics = None
+        self.wakeups_per_second = None
+        self.process_cpu_ms_per_second = None
+
+    def _accounted(self, target, name):
+        def run():
+            start = time.thread_time()
+            try:
+                target()
+            finally:
+                self.cpu_seconds[name] = time.thread_time() - start
+        return threading.Thread(target=run, name=name, daemon=True)
+
+    def start(self):
+        if self.input_mode:
+            main.INPUT_MODE = self.input_mode
+        main.pygame_running = True
+        main.app_running = True
+        main.device_registry = main.DeviceRegistry()
+        main.sound_to_play = None
+        main.action_press_count = 0
+        main.engine_state = main.EngineState(delay=self.delay, action_button=main.ACTION_BUTTON_INDEX_DEFAULT,
+                                             paused=False, sound_enabled=True, volume=0.7)
+        main.device_registry.add_joystick(BenchJoystick(), main.default_action_buttons())
+        main.timer_scheduler = PressRecorder()
+        main.pipeline_latency = main.LatencyTracker()
+        main.ui_root = self.root
+        for name in ("ui_status_var", "ui_controller_status_var", "ui_action_press_count_var",
+                     "ui_action_button_display_var"):
+            setattr(main, name, StubVar(""))
+        main.FarmHelperApp.instance = self.app
+        self.root.start()
+
+        self.threads = [self._accounted(main.pygame_loop, "PygameThread")]
+        if self.with_timer:
+            self.threads.append(self._accounted(main.timer_and_sound_task, "TimerSoundThread"))
+        for thread in self.threads:
+            thread.start()
+        while not pygame.get_init() or main.sound_to_play is None:
+            time.sleep(0.01)
+        time.sleep(0.2) # deixa o loop entrar no estado estável
+        self.begin_measurement()
+        return self
+
+    def begin_measurement(self):
+        """Zera a janela de medição de CPU do processo e despertares (start() já chama)."""
+        self._wakeups_at_start = main.wakeup_counter.snapshot()
+        self._measured_from = time.perf_counter()
+        self._process_cpu_at_start = time.process_time()
+
+    @property
+    def scheduler(self):
+        return main.timer_scheduler
+
+    def press(self):
+        self.press_count += 1
+        self.scheduler.posted.append(time.perf_counter())
+        pygame.event.post(pygame.event.Event(pygame.JOYBUTTONDOWN, button=main.engine_state.snapshot().action_button,
+                                             instance_id=BENCH_INSTANCE_ID, joy=BENCH_INSTANCE_ID))
+
+    def stop(self):
+        measured = time.perf_counter() - self._measured_from
+        self.process_cpu_ms_per_second = (time.process_time() - self._process_cpu_at_start) * 1000.0 / measured
+        self.wakeups_per_second = main.wakeup_counter.rates(self._wakeups_at_start, self._measured_from)
+        main.app_running = False
+        main.pygame_running = False
+        main.timer_scheduler.stop()
+        main.engine_state.wake_waiters()
+        main.wake_pygame_loop()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        self.root.stop()
+        self.latency_snapshot = main.pipeline_latency.snapshot()
+        self.engine_metrics = main.engine_metrics()
+        main.ui_root = None
+        main.FarmHelperApp.instance = None
+
+
+def percentiles_ms(values_s):
+    """p50/p95/p99/máx exatos (em ms) de uma lista de durações em segundos."""
+    if not values_s:
+        return None
+    ordered = sorted(values_s)
+    n = len(ordered)
+    pick = lambda q: ordered[min(n - 1, int(q * n))] * 1000.0  # noqa: E731
+    return {"count": n, "mean": sum(ordered) / n * 1000.0, "p50": pick(0.50), "p95": pick(0.95),
+            "p99": pick(0.99), "max": ordered[-1] * 1000.0}
+
+
+def environment_info():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                  capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        revision = None
+    return {"revision": revision, "python": sys.version.split()[0], "pygame": pygame.version.ver,
+            "sdl": ".".join(map(str, pygame.get_sdl_version())), "platform": sys.platform}
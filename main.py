@@ -1,13 +1,28 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import pygame
 import time
+MODULE_IMPORT_STARTED_AT = time.perf_counter() # Origem da linha do tempo de inicialização
 import threading
-import numpy as np
+import collections
+import heapq
+import bisect
 import os
 import sys
 import logging
+import logging.handlers
+import queue
+import atexit
+import argparse
+import json
+import hashlib
+import wave
+import sqlite3
+import math
 import traceback
+import struct
+import re
+import array
+import io
+import socket
+import stat
 
 # --- Configuração do Logging ---
 LOG_FILENAME = "farm_helper_gui.log"
@@ -19,12 +34,132 @@ try:
 except Exception:
     log_file_path = LOG_FILENAME
 
-logging.basicConfig(
-    filename=log_file_path,
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(threadName)s - %(module)s - %(funcName)s - %(lineno)d - %(message)s',
-    filemode='w'
-)
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(threadName)s - %(module)s - %(funcName)s - %(lineno)d - %(message)s'
+LOG_LEVEL_DEFAULT = "DEBUG"
+LOG_MAX_BYTES_DEFAULT = 10 * 1024 * 1024 # Tamanho máximo do arquivo de log antes de rotacionar
+LOG_BACKUP_COUNT_DEFAULT = 3             # Quantos arquivos de sessões anteriores manter (.1, .2, ...)
+
+# Mensagens que o --analyze-log (LogScanner) reconhece: os emissores logam estes formatos e as
+# regexes do scanner são montadas a partir deles (log_message_regex), então os dois lados mudam juntos.
+LOG_SESSION_SEPARATOR = "-" * 53 # Logado logo antes de LOG_MSG_SESSION_START
+LOG_MSG_SESSION_START = "Aplicação FarmHelper GUI: Início do script."
+LOG_MSG_ENGINE_STARTED = "Processo do engine iniciado (pid %d)."
+LOG_MSG_PRESS = "Botão de Ação (%s, timer '%s') Pressionado %s!"
+LOG_MSG_TIMER_PREFIX = "Timer '%s' " # Início comum de LOG_MSG_TIMER_*: o scanner busca os três com uma regex só
+LOG_MSG_TIMER_STARTED = LOG_MSG_TIMER_PREFIX + "iniciado com delay: %ss (ciclo %d)"
+LOG_MSG_TIMER_RESET = LOG_MSG_TIMER_PREFIX + "resetado com novo delay: %ss (ciclo %d)"
+LOG_MSG_TIMER_FIRED = LOG_MSG_TIMER_PREFIX + "finalizado (ciclo %d, erro de disparo %.3f ms)."
+LOG_MSG_INPUT_PREFIX = "pygame_loop: " # Idem para pausa e retomada
+LOG_MSG_INPUT_PAUSED = LOG_MSG_INPUT_PREFIX + "pausado, aguardando retomada."
+LOG_MSG_INPUT_RESUMED = LOG_MSG_INPUT_PREFIX + "retomado."
+
+log_queue = None
+log_listener = None
+
+
+class SessionFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler que move o log da sessão anterior para .1 no primeiro emit.
+
+    Assim o rollover (renomear arquivos) acontece na LogWriterThread, e não antes da janela abrir.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session_rollover_pending = True
+
+    def emit(self, record):
+        if self._session_rollover_pending:
+            self._session_rollover_pending = False
+            if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                self.doRollover()
+        super().emit(record)
+
+
+class TimedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que apenas enfileira o record e mede quanto tempo cada thread passa nele.
+
+    A formatação da mensagem e a escrita em disco ficam com a thread do QueueListener,
+    então as threads de input/timer nunca esperam pelo arquivo de log.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._timings_lock = threading.Lock()
+        self.timings = {} # thread_name -> [chamadas, tempo_total_s, tempo_max_s]
+
+    def prepare(self, record):
+        # Não formata aqui (o QueueHandler padrão formata na thread chamadora).
+        return record
+
+    def handle(self, record):
+        start = time.perf_counter()
+        try:
+            return super().handle(record)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._timings_lock:
+                entry = self.timings.setdefault(record.threadName, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+                if elapsed > entry[2]: entry[2] = elapsed
+
+    def timing_snapshot(self):
+        with self._timings_lock:
+            return {name: tuple(entry) for name, entry in self.timings.items()}
+
+
+def configure_logging(level=LOG_LEVEL_DEFAULT, max_bytes=LOG_MAX_BYTES_DEFAULT, backup_count=LOG_BACKUP_COUNT_DEFAULT):
+    """Configura o logging assíncrono: as threads só enfileiram, uma thread de fundo escreve no arquivo.
+
+    Cada execução começa um arquivo novo; o da sessão anterior vira .1 (se backup_count > 0).
+    """
+    global log_queue, log_listener
+    shutdown_logging()
+    if backup_count > 0:
+        file_handler = SessionFileHandler(log_file_path, mode='a', maxBytes=max_bytes,
+                                          backupCount=backup_count, encoding='utf-8', delay=True)
+    else:
+        file_handler = logging.FileHandler(log_file_path, mode='w', encoding='utf-8', delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = TimedQueueHandler(log_queue)
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+        handler.close()
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(level)
+
+    log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+    log_listener.start()
+    log_listener._thread.name = "LogWriterThread"
+
+def get_queue_handler():
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, TimedQueueHandler):
+            return handler
+    return None
+
+def logging_overhead_report():
+    """Resumo do tempo que cada thread passou dentro de chamadas de logging (handler)."""
+    handler = get_queue_handler()
+    if handler is None:
+        return "logging assíncrono não configurado"
+    parts = []
+    for name, (calls, total, peak) in sorted(handler.timing_snapshot().items()):
+        parts.append(f"{name}: {calls} chamadas, total {total * 1000:.2f} ms, "
+                     f"média {total / calls * 1e6:.1f} µs, máx {peak * 1e6:.1f} µs")
+    return "; ".join(parts)
+
+def shutdown_logging():
+    """Esvazia a fila e encerra a thread escritora (seguro chamar mais de uma vez)."""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        for handler in log_listener.handlers:
+            handler.close()
+        log_listener = None
+
+atexit.register(shutdown_logging)
 
 class StreamToLogger:
     def __init__(self, logger, log_level=logging.INFO):
@@ -35,257 +170,2903 @@ class StreamToLogger:
             self.logger.log(self.log_level, line.rstrip())
     def flush(self): pass
 
-logging.info("-----------------------------------------------------")
-logging.info("Aplicação FarmHelper GUI: Início do script.")
+# pygame (e numpy, usado só na síntese de tons) são importados sob demanda, fora da thread da UI,
+# para a janela aparecer antes. `pygame` fica None até load_pygame() rodar ou se não estiver instalado.
+# O tkinter também: só load_tkinter() o importa, e o modo --headless nunca chama.
+tk = ttk = messagebox = None
+pygame = None
+_pygame_import_lock = threading.Lock()
+_pygame_import_attempted = False
+
+def load_pygame():
+    """Importa o pygame na primeira chamada e publica o módulo no global `pygame`."""
+    global pygame, _pygame_import_attempted
+    with _pygame_import_lock:
+        if not _pygame_import_attempted:
+            _pygame_import_attempted = True
+            try:
+                import pygame as pygame_module
+                pygame = pygame_module
+            except ImportError:
+                print("AVISO DE MÓDULO: O módulo 'pygame' não foi encontrado. O som personalizado e a detecção de controle não funcionarão. Instale com: pip install pygame")
+    return pygame
+
+
+def load_tkinter():
+    """Importa o tkinter (modo com janela) e publica os módulos nos globais `tk`, `ttk` e `messagebox`."""
+    global tk, ttk, messagebox
+    import tkinter
+    from tkinter import ttk as tkinter_ttk, messagebox as tkinter_messagebox
+    tk, ttk, messagebox = tkinter, tkinter_ttk, tkinter_messagebox
+    return tk
+
+
+class StartupTimeline:
+    """Marcos da inicialização, em segundos desde o início do import do main.py.
+
+    Quando todos os `milestones` chegam (MILESTONES por padrão; sem "window_shown" no modo headless), a linha do tempo é logada numa linha só e
+    `on_complete` (se definido) é chamado com o dicionário de marcos.
+    """
+    MILESTONES = ("import", "window_shown", "controller_ready", "sound_ready")
+    LABELS = {"import": "import", "window_shown": "janela visível",
+              "controller_ready": "controles prontos", "sound_ready": "som pronto"}
+
+    def __init__(self, started_at):
+        self.started_at = started_at
+        self.marks = {}
+        self.milestones = self.MILESTONES
+        self.on_complete = None
+        self._lock = threading.Lock()
+        self._reported = False
+
+    def mark(self, milestone):
+        with self._lock:
+            if milestone in self.marks:
+                return
+            self.marks[milestone] = time.perf_counter() - self.started_at
+            complete = not self._reported and all(name in self.marks for name in self.milestones)
+            if complete:
+                self._reported = True
+        if complete:
+            logging.info("Linha do tempo de inicialização: %s", self.format())
+            if self.on_complete:
+                self.on_complete(dict(self.marks))
+
+    def is_complete(self):
+        return self._reported
+
+    def format(self):
+        with self._lock:
+            marks = sorted(self.marks.items(), key=lambda item: item[1])
+        return " → ".join(f"{self.LABELS.get(name, name)} {elapsed * 1000:.0f} ms" for name, elapsed in marks)
+
+startup_timeline = StartupTimeline(MODULE_IMPORT_STARTED_AT)
+
+class ContendedLock:
+    """threading.Lock que conta quantas aquisições tiveram de esperar outra thread, e por quanto tempo.
+
+    Os contadores só mudam com o lock adquirido, então não precisam de proteção extra.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            self.acquisitions += 1
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        if not self._lock.acquire(True, timeout):
+            return False
+        waited = time.perf_counter() - start
+        self.acquisitions += 1
+        self.contended += 1
+        self.wait_total += waited
+        if waited > self.wait_max: self.wait_max = waited
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+    def stats(self):
+        return {"acquisitions": self.acquisitions, "contended": self.contended,
+                "wait_total": self.wait_total, "wait_max": self.wait_max}
+
+
+class WakeupCounter:
+    """Conta os despertares (iterações dos loops de espera) de cada thread, para medir o custo ocioso.
+
+    Cada chave só é incrementada pela própria thread, então não precisa de lock.
+    """
+    def __init__(self):
+        self.counts = {}
+        self.started_at = time.perf_counter()
+
+    def tick(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self):
+        return dict(self.counts)
+
+    def rates(self, since=None, since_at=None):
+        """Despertares por segundo de cada thread desde `since` (snapshot anterior) ou desde o início."""
+        elapsed = time.perf_counter() - (since_at if since_at is not None else self.started_at)
+        since = since or {}
+        return {name: (count - since.get(name, 0)) / elapsed for name, count in self.snapshot().items()} if elapsed > 0 else {}
+
+    def format_rates(self):
+        return ", ".join(f"{name} {rate:.2f}/s" for name, rate in sorted(self.rates().items())) or "nenhum"
+
+wakeup_counter = WakeupCounter()
+
+
+class SamplingProfiler:
+    """Profiler por amostragem numa thread própria (ProfilerThread), por uma janela de `seconds`.
+
+    A cada `interval` lê a pilha de todas as threads (sys._current_frames) e, ao fim da janela
+    ou em stop(), grava as contagens em `path` como pilhas colapsadas: uma linha
+    "thread;função (arquivo:linha);... amostras" por pilha, a entrada do flamegraph.pl e do
+    speedscope. Mede tempo de parede: uma thread bloqueada aparece no wait/get em que dorme.
+    """
+    def __init__(self, path, seconds, interval=None):
+        self.path = path
+        self.seconds = seconds
+        self.interval = interval or PROFILE_SAMPLE_INTERVAL_MS / 1000.0
+        self.samples = 0
+        self.started_at = None
+        self.cpu_seconds = 0.0 # CPU da própria ProfilerThread (o custo da amostragem)
+        self._stop = threading.Event()
+        self._thread = None
+        self._labels = {} # code object -> "função (arquivo:linha)"
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._loop, name="ProfilerThread", daemon=True)
+        self._thread.start()
+        logging.info("Profiler por amostragem: %.0fs, uma amostra a cada %.0f ms -> %s",
+                     self.seconds, self.interval * 1000, self.path)
+        return self
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def elapsed(self):
+        return min(self.seconds, time.perf_counter() - self.started_at) if self.started_at is not None else 0.0
+
+    def stop(self, timeout=2.0):
+        """Encerra a janela antes do fim (em até um intervalo); o arquivo é gravado com as amostras até aqui."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _loop(self):
+        # A amostra só guarda a tupla de ids dos code objects da pilha (o hash de um code object
+        # percorre bytecode e constantes); o texto é montado uma vez, no fim
+        samples = collections.Counter() # (thread, (id do code do topo, ..., da base)) -> amostras
+        codes = {} # id -> code object, mantido vivo para o id não ser reaproveitado
+        names = {}
+        own_ident = threading.get_ident()
+        started_cpu = time.thread_time()
+        deadline = self.started_at + self.seconds
+        next_sample = self.started_at
+        try:
+            while not self._stop.is_set() and time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident:
+                        continue
+                    if ident not in names:
+                        names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        if id(code) not in codes:
+                            codes[id(code)] = code
+                        stack.append(id(code))
+                        frame = frame.f_back
+                    samples[names.get(ident, f"thread-{ident}"), tuple(stack)] += 1
+                self.samples += 1
+                next_sample = max(next_sample + self.interval, time.perf_counter()) # Atrasou: não recupera em rajada
+                time.sleep(max(0.0, next_sample - time.perf_counter())) # Event.wait com timeout custa ~2x a CPU de um sleep
+        finally:
+            self.cpu_seconds = time.thread_time() - started_cpu
+            stacks = collections.Counter()
+            for (thread_name, stack), count in samples.items():
+                stacks[";".join([thread_name] + [self._label(codes[code_id]) for code_id in reversed(stack)])] += count
+            self._write(stacks)
+
+    def _write(self, stacks):
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e_profile:
+            logging.error("Não foi possível gravar o perfil em %s: %s", self.path, e_profile)
+            return
+        logging.info("Perfil gravado em %s: %d amostras em %.1fs, %d pilhas distintas, CPU do profiler %.1f ms.",
+                     self.path, self.samples, self.elapsed(), len(stacks), self.cpu_seconds * 1000)
+        logging.info("CPU por thread (total): %s", instrumentation.format_cpu_totals())
+
+
+def thread_cpu_seconds(thread):
+    """CPU (s) gasta por `thread`, lida de fora dela; None se a plataforma não expõe (ou a thread terminou).
+
+    Unix: relógio de CPU da pthread (time.pthread_getcpuclockid). Windows: GetThreadTimes.
+    """
+    if hasattr(time, "pthread_getcpuclockid"):
+        try:
+            return time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+        except (OSError, OverflowError, TypeError):
+            return None
+    if sys.platform != "win32" or thread.native_id is None:
+        return None
+    import ctypes
+    from ctypes import wintypes
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenThread(0x0800, False, thread.native_id) # THREAD_QUERY_LIMITED_INFORMATION
+    if not handle:
+        return None
+    try:
+        times = [wintypes.FILETIME() for _ in range(4)] # criação, fim, kernel, usuário
+        if not kernel32.GetThreadTimes(handle, *(ctypes.byref(filetime) for filetime in times)):
+            return None
+        return sum((filetime.dwHighDateTime << 32 | filetime.dwLowDateTime) for filetime in times[2:]) / 1e7 # 100 ns
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+class Instrumentation:
+    """Superfície de diagnóstico ligável em execução (--profile, card de estatísticas, comando PROFILE).
+
+    - CPU por thread: quem lê (card, relatório, métricas, ProfilerThread ao gravar) amostra todas as
+      threads de uma vez com thread_cpu_seconds; as threads do engine não pagam nada por despertar
+    - ui_root.after agendados, por thread que agenda (schedule_ui)
+    - uma janela do SamplingProfiler gravando pilhas colapsadas ao lado do log
+    report() não guarda estado: cada leitor passa o `mark` do relatório anterior dele, então o card
+    e o console headless não dividem a mesma janela de taxa.
+    """
+    THREAD_LABELS = {"MainThread": "Tk", "PygameThread": "Pygame", "TimerSoundThread": "Timer"}
+
+    def __init__(self):
+        self.enabled = False
+        self.thread_cpu = {} # thread -> CPU (s) na última amostragem; threads encerradas mantêm o último valor
+        self.after_calls = WakeupCounter()
+        self.profiler = None
+
+    def sample_thread_cpu(self):
+        """Lê a CPU de todas as threads vivas e devolve uma cópia de thread_cpu."""
+        for thread in threading.enumerate():
+            cpu = thread_cpu_seconds(thread)
+            if cpu is not None:
+                self.thread_cpu[thread.name] = cpu
+        return dict(self.thread_cpu)
+
+    def set_enabled(self, enabled, seconds=None):
+        """Liga (abrindo uma janela nova do profiler) ou desliga. Retorna o arquivo do perfil (None ao desligar)."""
+        if self.profiler is not None and self.profiler.is_running():
+            self.profiler.stop()
+        self.enabled = enabled
+        if not enabled:
+            logging.info("Instrumentação desligada.")
+            return None
+        path = user_data_path(f"{PROFILE_FILENAME_PREFIX}_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}.folded")
+        self.profiler = SamplingProfiler(path, seconds or PROFILE_WINDOW_SECONDS_DEFAULT).start()
+        return path
+
+    def _thread_label(self, name):
+        if name == "MainThread" and ui_root is None: # Headless / processo do engine: a MainThread não é o Tk
+            return name
+        return self.THREAD_LABELS.get(name, name)
+
+    def _ordered(self, names):
+        order = list(self.THREAD_LABELS) # Tk, Pygame e Timer primeiro, as outras por nome
+        return sorted(names, key=lambda name: (order.index(name) if name in order else len(order), name))
+
+    def report(self, since=None):
+        """CPU por thread (total em s, % de um núcleo) e after() por segundo desde `since` (o "mark" de um
+        report() anterior do mesmo leitor; None = % indisponível e after() desde o início da sessão)."""
+        now = time.perf_counter()
+        cpu = self.sample_thread_cpu()
+        after = self.after_calls.snapshot()
+        base_at, cpu_base, after_base = since or (self.after_calls.started_at, {}, {})
+        elapsed = max(now - base_at, 1e-9)
+        return {
+            "cpu": {name: (total, (total - cpu_base[name]) / elapsed * 100.0 if name in cpu_base else None)
+                    for name, total in cpu.items()},
+            "after_per_second": {name: (count - after_base.get(name, 0)) / elapsed for name, count in after.items()},
+            "mark": (now, cpu, after),
+        }
+
+    def format_report(self, report):
+        lines = []
+        for name in self._ordered(report["cpu"]):
+            total, percent = report["cpu"][name]
+            lines.append(f"{self._thread_label(name)[:16]:<16} {'--' if percent is None else f'{percent:.1f}%':>6} {total:8.2f} s")
+        after_rates = {name: rate for name, rate in report["after_per_second"].items() if rate > 0}
+        detail = ", ".join(f"{self._thread_label(name)} {rate:.1f}" for name, rate in sorted(after_rates.items()))
+        lines.append(f"after(): {sum(after_rates.values()):.1f}/s" + (f" ({detail})" if detail else ""))
+        profiler = self.profiler
+        if profiler is not None and profiler.is_running():
+            lines.append(f"Perfil: gravando {profiler.elapsed():.0f}/{profiler.seconds:.0f}s ({profiler.samples} amostras)")
+        elif profiler is not None:
+            lines.append(f"Perfil: {os.path.basename(profiler.path)} ({profiler.samples} amostras)")
+        return "\n".join(lines)
+
+    def format_cpu_totals(self):
+        cpu = self.sample_thread_cpu()
+        return ", ".join(f"{self._thread_label(name)} {cpu[name]:.2f}s" for name in self._ordered(cpu)) or "nenhuma anotação"
+
+instrumentation = Instrumentation()
+
+def schedule_ui(ms, func, *args):
+    """ui_root.after contando o agendamento por thread que agenda (Instrumentation.after_calls)."""
+    instrumentation.after_calls.tick(threading.current_thread().name)
+    return ui_root.after(ms, func, *args)
+
+
+# Batimento de um loop: despertares até aqui, desde quando está acordado (None = esperando) e até
+# quando pode esperar sem dar sinal de vida (None = só acorda por evento, sem limite).
+LoopBeat = collections.namedtuple("LoopBeat", "count busy_since idle_until")
+
+
+class StallWatchdog:
+    """Detecta travamentos dos loops do Tk, do input (pygame_loop) e do timer (timer_and_sound_task).
+
+    Input e timer anotam um batimento ao acordar (busy) e ao voltar a esperar (idle, com o
+    timeout da espera). O atraso (lag) de um loop é quanto ele passou do ponto em que deveria
+    ter dado sinal de vida: acordado, o tempo desde que acordou; esperando, quanto passou do
+    timeout. O Tk bate num after() que se reagenda a cada intervalo (tk_beat); a WatchdogThread
+    nunca chama o Tk, porque com o Tcl em modo threaded a chamada esperaria o mainloop travado.
+    Um lag acima do limiar vira um travamento: log com as pilhas de todas as threads, evento
+    "stall" no histórico e o indicador do card de estatísticas. Cada loop só troca a própria
+    tupla em `beats`, sem lock; o resto só é escrito pela WatchdogThread.
+    Pausado, nada é vigiado: a WatchdogThread bloqueia em engine_state.wait_while_paused e o
+    batimento do Tk não se reagenda até resume_tk_beat(), mantendo zero despertares na pausa.
+    """
+    LOOP_LABELS = {"tk": "Tk", "input": "Input", "timer": "Timer", "engine": "Engine"}
+
+    def __init__(self):
+        self.threshold = None # Segundos; definido em start()
+        self.interval = None
+        self.beats = {}         # loop -> LoopBeat
+        self.lags = {}          # loop -> lag na última verificação
+        self.stall_counts = {}  # loop -> travamentos na sessão
+        self.max_lag = {}       # loop -> maior lag visto na sessão
+        self.events = collections.deque() # Travamentos recentes (dicts), o mais novo no fim; limitado em start()
+        self._stalled = {}      # loop -> evento do travamento em andamento
+        self._recent = collections.deque() # (instante, lags) das verificações dentro de STALL_INDICATOR_WINDOW_SECONDS
+        self._tk_late = 0.0    # Atraso com que o último batimento do Tk rodou (escrito pelo Tk)
+        self._stalls_shown = 0 # Travamentos já levados ao card (lido e escrito pelo Tk)
+        self._tk_job = None    # after() pendente do batimento do Tk (None = parado ou estacionado na pausa)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def busy(self, loop):
+        beat = self.beats.get(loop)
+        self.beats[loop] = LoopBeat(beat.count + 1 if beat else 1, time.perf_counter(), None)
+
+    def idle(self, loop, timeout=None):
+        """O loop vai esperar até `timeout` segundos (None = sem limite: não é vigiado enquanto espera)."""
+        beat = self.beats.get(loop)
+        self.beats[loop] = LoopBeat(beat.count if beat else 0, None, None if timeout is None else time.perf_counter() + timeout)
+
+    @property
+    def stall_total(self):
+        return sum(self.stall_counts.values())
+
+    def start(self, threshold_ms):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = min(max(self.threshold / 2, 0.05), 1.0)
+        self.events = collections.deque(self.events, maxlen=STALL_EVENTS_KEPT)
+        self._thread = threading.Thread(target=self._loop, name="WatchdogThread", daemon=True)
+        self._thread.start()
+        logging.info("Watchdog de travamentos: limiar %.0f ms, verificação a cada %.0f ms.", threshold_ms, self.interval * 1000)
+        return self
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        engine_state.wake_waiters() # Solta a WatchdogThread se estiver bloqueada na pausa
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if engine_state.snapshot().paused: # Input e timer também dormem: nada a vigiar até a retomada
+                engine_state.wait_while_paused(lambda: not self._stop.is_set())
+                continue
+            if self._stop.wait(self.interval):
+                break
+            wakeup_counter.tick("watchdog")
+            try:
+                self.check()
+            except Exception as e_check:
+                logging.error("Erro na verificação do watchdog: %s", e_check, exc_info=True)
+        for loop, event in list(self._stalled.items()): # Fechou travado: registra o que foi visto
+            self._end_stall(loop, event)
+
+    def tk_beat(self):
+        """Batimento do Tk (thread do Tk): anota o atraso com que rodou e se reagenda para daqui a um intervalo.
+
+        Pausado, estaciona: o Tk deixa de ser vigiado e o batimento só volta com resume_tk_beat().
+        """
+        self._tk_job = None
+        if not (self.is_running() and ui_root and ui_root.winfo_exists()):
+            return
+        now = time.perf_counter()
+        beat = self.beats.get("tk")
+        if engine_state.snapshot().paused:
+            self.beats["tk"] = LoopBeat(beat.count if beat else 0, None, None)
+            self._tk_late = 0.0
+            return
+        if beat is not None and beat.idle_until is not None:
+            self._tk_late = max(0.0, now - beat.idle_until)
+        self.beats["tk"] = LoopBeat(beat.count + 1 if beat else 1, None, now + self.interval)
+        if self.stall_total != self._stalls_shown: # Travamento novo: o card mostra já, sem esperar o tick ocioso
+            self._stalls_shown = self.stall_total
+            refresh_runtime_stats_now()
+        self._tk_job = schedule_ui(int(self.interval * 1000), self.tk_beat)
+
+    def resume_tk_beat(self):
+        """Na retomada (thread do Tk): religa o batimento estacionado durante a pausa."""
+        if self._tk_job is None:
+            self.tk_beat()
+
+    @staticmethod
+    def _lag(beat, now):
+        if beat.busy_since is not None:
+            return now - beat.busy_since
+        return max(0.0, now - beat.idle_until) if beat.idle_until is not None else 0.0
+
+    def check(self):
+        now = time.perf_counter()
+        lags = {loop: self._lag(beat, now) for loop, beat in list(self.beats.items())}
+        if "tk" in lags: # Em dia, o Tk ainda mostra o atraso do último batimento
+            lags["tk"] = max(lags["tk"], self._tk_late)
+        for loop, lag in lags.items():
+            if lag >= self.max_lag.get(loop, 0.0):
+                self.max_lag[loop] = lag
+            event = self._stalled.get(loop)
+            if lag >= self.threshold:
+                if event is None:
+                    self._begin_stall(loop, lag)
+                elif lag > event["lag"]:
+                    event["lag"] = lag
+            elif event is not None:
+                self._end_stall(loop, event)
+        self.lags = lags
+        self._recent.append((now, lags))
+        while self._recent and now - self._recent[0][0] > STALL_INDICATOR_WINDOW_SECONDS:
+            self._recent.popleft()
+        publish_engine_status() # No processo do engine a UI mostra o lag pelo bloco compartilhado
+
+    def _begin_stall(self, loop, lag):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own_ident = threading.get_ident()
+        stacks = {names.get(ident, f"thread-{ident}"): "".join(traceback.format_stack(frame))
+                  for ident, frame in sys._current_frames().items() if ident != own_ident}
+        event = {"loop": loop, "started_at": time.time() - lag, "lag": lag, "stacks": stacks, "ended": False}
+        self._stalled[loop] = event
+        self.events.append(event)
+        self.stall_counts[loop] = self.stall_counts.get(loop, 0) + 1
+        record_history("stall", loop)
+        logging.warning("Travamento: loop %s sem responder há %.0f ms (limiar %.0f ms). Pilhas das threads:\n%s",
+                        self.LOOP_LABELS.get(loop, loop), lag * 1000, self.threshold * 1000,
+                        "\n".join(f"--- {name} ---\n{stack}" for name, stack in sorted(stacks.items())))
+
+    def _end_stall(self, loop, event):
+        del self._stalled[loop]
+        event["ended"] = True
+        logging.warning("Travamento do loop %s terminou: maior atraso visto %.0f ms.",
+                        self.LOOP_LABELS.get(loop, loop), event["lag"] * 1000)
+
+    def recent_peaks(self):
+        """Maior lag de cada loop nas verificações dos últimos STALL_INDICATOR_WINDOW_SECONDS."""
+        peaks = {}
+        for _, lags in list(self._recent):
+            for loop, lag in lags.items():
+                if lag > peaks.get(loop, 0.0):
+                    peaks[loop] = lag
+        return peaks
+
+    def format_indicator(self, engine_lag=None, engine_stalls=0):
+        """Linha do card: 🟢/🟡/🔴 pelo pior lag recente, lag por loop e travamentos na sessão.
+
+        Com --engine-process a UI só vigia o Tk; `engine_lag`/`engine_stalls` vêm do bloco
+        publicado pelo processo do engine.
+        """
+        if not self.is_running():
+            return "Lag: watchdog desligado"
+        peaks = self.recent_peaks()
+        if engine_lag is not None:
+            peaks["engine"] = engine_lag
+        worst = max(peaks.values(), default=0.0)
+        icon = "🔴" if worst >= self.threshold else "🟡" if worst >= self.threshold / 2 else "🟢"
+        order = list(self.LOOP_LABELS)
+        parts = [f"{self.LOOP_LABELS.get(loop, loop)} {peaks[loop] * 1000:.0f} ms"
+                 for loop in sorted(peaks, key=lambda loop: order.index(loop) if loop in order else len(order))]
+        stalls = self.stall_total + engine_stalls
+        return f"{icon} Lag: {' · '.join(parts) or '--'}" + (f" | travamentos: {stalls}" if stalls else "")
+
+    def format_summary(self):
+        if not self.max_lag:
+            return "nenhuma verificação"
+        return ", ".join(f"{self.LOOP_LABELS.get(loop, loop)} máx {lag * 1000:.0f} ms ({self.stall_counts.get(loop, 0)} travamentos)"
+                         for loop, lag in sorted(self.max_lag.items()))
+
+stall_watchdog = StallWatchdog()
+
+
+class EngineCounters:
+    """Contadores monotônicos do engine, lidos pelo endpoint de métricas (--metrics-port).
+
+    Como no WakeupCounter, cada campo tem um único escritor (ignored_input: PygameThread; o resto:
+    TimerSoundThread), então um incremento de inteiro basta, sem lock. A exceção é `presses`, escrito
+    pelo input e pela API de controle: register_press incrementa sob press_lock.
+    """
+    def __init__(self):
+        self.presses = {}       # timer -> presses sinalizados (controle e API de controle)
+        self.starts = {}        # timer -> ciclos iniciados
+        self.resets = {}        # timer -> ciclos rearmados antes de disparar
+        self.fires = {}         # timer -> disparos
+        self.cues = 0           # avisos antes do fim
+        self.ignored_input = 0  # JOYBUTTONDOWN feitos durante a pausa, descartados pelo input na retomada
+        self.ignored_timer = 0  # presses que chegaram à thread do timer já pausada
+        self.control_commands = {} # comando -> execuções pela API de controle (ControlThread; EngineCommandThread com --engine-process)
+
+    @staticmethod
+    def add(counts, name):
+        counts[name] = counts.get(name, 0) + 1
+
+engine_counters = EngineCounters()
+
+
+EngineSettings = collections.namedtuple("EngineSettings", "delay action_button paused sound_enabled volume auto_delay prewarning",
+                                        defaults=(False, ()))
+
+
+class EngineState:
+    """Configuração do engine compartilhada entre as threads, publicada como snapshots imutáveis.
+
+    Leitores chamam snapshot() (uma leitura de referência, sem lock) e usam todos os campos da
+    mesma versão; escritores (UI, modo headless, captura de botão) trocam o snapshot inteiro
+    em update(). Nenhuma thread do engine toca em variáveis do Tk. Listeners (add_listener)
+    recebem o snapshot novo depois de cada update(), na thread que atualizou e fora do lock.
+    """
+    def __init__(self, **settings):
+        self._lock = ContendedLock()
+        self._changed = threading.Condition(self._lock)
+        self._snapshot = EngineSettings(**settings)
+        self._listeners = ()
+        self.version = 0
+
+    def snapshot(self):
+        return self._snapshot
+
+    def update(self, **changes):
+        with self._lock:
+            self._snapshot = snapshot = self._snapshot._replace(**changes)
+            self.version += 1
+            self._changed.notify_all()
+        for listener in self._listeners:
+            listener(snapshot)
+        return snapshot
+
+    def add_listener(self, callback):
+        self._listeners = self._listeners + (callback,)
+
+    def wait_while_paused(self, keep_waiting):
+        """Bloqueia, sem timeout, enquanto pausado e keep_waiting() for verdadeiro.
+
+        Só update() (retomada, fechamento) ou wake_waiters() acordam a thread: zero despertares
+        durante a pausa. Retorna o snapshot atual.
+        """
+        with self._changed:
+            while self._snapshot.paused and keep_waiting():
+                self._changed.wait()
+            return self._snapshot
+
+    def wake_waiters(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def lock_stats(self):
+        return self._lock.stats()
 
-try:
-    import pygame
-    logging.info(f"Pygame importado com sucesso. Versão: {pygame.version.ver}")
-except ImportError:
-    logging.error("FALHA AO IMPORTAR PYGAME. O módulo 'pygame' não foi encontrado.")
-    print("AVISO DE MÓDULO: O módulo 'pygame' não foi encontrado. O som personalizado e a detecção de controle não funcionarão. Instale com: pip install pygame")
-    pygame = None
 
 # --- Configurações Globais da Lógica Base ---
 ACTION_BUTTON_INDEX_DEFAULT = 5 # RB como padrão
 INITIAL_DELAY_SECONDS = 5.2
-current_delay_seconds = INITIAL_DELAY_SECONDS
 program_start_time = time.time()
 action_press_count = 0
+press_lock = threading.Lock() # register_press: PygameThread e ControlThread contam presses
+
+# --- Configurações do Loop de Entrada ---
+# "poll" (padrão): pygame.event.get() + sleep fixo de INPUT_POLL_INTERVAL_SECONDS.
+# "event" (--input-mode event): bloqueia em pygame.event.wait até chegar um evento. O fechamento acorda o
+# loop com wake_pygame_loop(); o timeout é só uma rede de segurança para checar app_running.
+# Obs: pygame.event.wait bombeia o SDL a cada ~1 ms em C, então a latência cai para ~1 ms mas a CPU ociosa
+# dobra (~8 -> ~17 ms/s no benchmarks/bench_input_loop.py). Por isso o modo "event" é opcional.
+INPUT_MODES = ("poll", "event")
+INPUT_MODE = "poll"
+INPUT_WAIT_TIMEOUT_MS = 5000
+INPUT_POLL_INTERVAL_SECONDS = 0.02
+
+# --- Configurações do Timer ---
+TIMER_UI_REFRESH_HZ = 30              # Taxa máxima de redesenho da contagem na UI
+CYCLE_EWMA_ALPHA = 0.1                # Peso de cada novo intervalo na média móvel do ritmo
+CYCLE_MAX_GAP_SECONDS = 180.0         # Intervalo entre presses maior que isso = pausa do jogador, não conta
+CYCLE_SUGGESTION_MIN_SAMPLES = 10     # Intervalos necessários antes de sugerir um delay
+CYCLE_AUTO_APPLY_MIN_CHANGE = 0.2     # Diferença mínima (s) para o ajuste automático trocar o delay
+UI_STATS_REFRESH_MS = 1000            # Intervalo do card de estatísticas enquanto algo muda
+UI_STATS_IDLE_REFRESH_MS = 5000       # Intervalo máximo quando nada muda (dobra a cada tick ocioso até aqui)
+UI_STATS_IDLE_AFTER_SECONDS = 30      # Sem presses/disparos/mudanças por esse tempo (ou pausado) = ocioso
+FIRING_ERROR_HISTORY = 1000           # Quantos erros de disparo recentes manter em memória
+TIMER_SPIN_THRESHOLD_MS_DEFAULT = 2.0 # Modo de precisão: últimos ms antes do deadline em espera ativa
+MAIN_TIMER_NAME = "Principal"         # Timer do botão de ação / delay configurado na UI
+TIMERS_CONFIG_FILENAME = "farm_helper_timers.json" # Timers extras (nome, botão, delay, som), ao lado do executável
+HISTOGRAM_BUCKETS_PER_DECADE = 40     # Resolução dos histogramas de latência (~6% por bucket)
+LATENCY_REPORT_FILENAME = "farm_helper_latency.json" # Exportado ao fechar, ao lado do log
+AUDIO_BUFFER_SIZE = 512               # Amostras por buffer do mixer (menor = menos latência, mais risco de estalos)
+AUDIO_LOW_LATENCY_BUFFER_SIZE = 256   # Buffer usado com --low-latency-audio
+AUDIO_FREQUENCY = 44100
+AUDIO_RESERVED_CHANNELS = 2           # Canais do mixer reservados para as deixas do timer
+AUDIO_WARM_UP_SECONDS = 0.2
+PREWARNING_OFFSETS_DEFAULT = (3.0, 2.0, 1.0) # Segundos antes do fim em que toca o tick de aviso
+TONE_CACHE_MAX_ENTRIES = 32           # Sons sintetizados mantidos em memória (LRU)
+TONE_CACHE_DIRNAME = "farm_helper_sounds" # Cache em disco dos sons sintetizados, ao lado do log (só com --persist-sounds)
+HISTORY_FILENAME = "farm_helper_history.sqlite3"      # Histórico de sessões, ao lado do log
+HISTORY_BATCH_MAX = 500               # Máximo de eventos por transação
+HEADLESS_STATS_INTERVAL_SECONDS = 60  # Intervalo do resumo impresso no terminal no modo --headless
+METRICS_HOST = "127.0.0.1"            # O endpoint de --metrics-port só escuta localmente
+METRICS_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+MONITORED_THREADS = ("PygameThread", "TimerSoundThread", "AudioThread", "HistoryWriterThread", "LogWriterThread")
+CONTROL_SOCKET_FILENAME = "farm_helper.sock" # Socket da API de controle (--control), ao lado do log
+CONTROL_HOST = "127.0.0.1"            # Sem AF_UNIX (Windows), a API de controle usa TCP só em localhost
+CONTROL_TCP_PORT_DEFAULT = 47815
+INPUT_RECORDING_MAGIC = b"FHREC"      # Cabeçalho dos arquivos de --record-input
+INPUT_RECORDING_VERSION = 2
+REPLAY_TOLERANCE_SECONDS = 0.0001     # Diferença máxima aceita entre deadline gravado e reproduzido (o delay é gravado em float32)
+LOG_ANALYSIS_BLOCK_BYTES = 8 * 1024 * 1024 # Bloco lido por vez pelo --analyze-log (memória constante por arquivo)
+ENGINE_LOG_FILENAME = "farm_helper_engine.log" # Log do processo do engine (--engine-process), ao lado do log da UI
+ENGINE_PROCESS_POLL_MS = 50           # Intervalo em que a UI lê o estado publicado pelo processo do engine
+ENGINE_PROCESS_STOP_TIMEOUT = 3.0     # Espera pelo processo do engine ao fechar antes de terminá-lo
+ENGINE_STATUS_TEXT_BYTES = 160        # Espaço (UTF-8) de cada texto de status no bloco compartilhado
+PROFILE_WINDOW_SECONDS_DEFAULT = 30.0 # Janela do profiler por amostragem (--profile, card de estatísticas)
+PROFILE_SAMPLE_INTERVAL_MS = 20       # Intervalo entre amostras de pilha do profiler (50 Hz)
+PROFILE_FILENAME_PREFIX = "farm_helper_profile" # Pilhas colapsadas: <prefixo>_<data>_<pid>.folded, ao lado do log
+STALL_THRESHOLD_MS_DEFAULT = 1000     # Loop (Tk, input, timer) atrasado mais que isso = travamento (0 desliga o watchdog)
+STALL_EVENTS_KEPT = 50                # Travamentos recentes mantidos em memória (pilhas completas vão para o log)
+STALL_INDICATOR_WINDOW_SECONDS = 10.0 # O indicador de lag do card mostra o pior lag dessa janela
+
+sound_to_play = None
+pygame_running = True # Controla o loop do pygame em si
+app_running = True    # Controla o estado geral da aplicação (rodando vs fechando)
+
+# Delay, botão de ação, pausa e som: escritos pela UI ou pela configuração headless, lidos pelo engine.
+engine_state = EngineState(delay=INITIAL_DELAY_SECONDS, action_button=ACTION_BUTTON_INDEX_DEFAULT,
+                           paused=False, sound_enabled=True, volume=0.7, prewarning=PREWARNING_OFFSETS_DEFAULT)
+
+# --- Variáveis de Controle de Captura de Botão ---
+capturing_button_mode = False
+
+# --- Variáveis Globais para a UI ---
+ui_root = None
+ui_status_var = None
+ui_delay_var = None
+ui_controller_status_var = None
+ui_time_remaining_var = None
+ui_progress_var = None
+ui_program_runtime_var = None
+ui_action_press_count_var = None
+ui_action_button_display_var = None
+ui_latency_stats_var = None
+ui_active_timers_var = None
+ui_history_stats_var = None
+ui_cycle_stats_var = None
+ui_instrumentation_var = None
+ui_lag_var = None
+headless_console = None # HeadlessConsole no modo --headless (sem Tk): status vão para o terminal
+input_recorder = None   # InputRecorder ativo com --record-input (None = sem gravação)
+engine_status_block = None # No processo do engine (--engine-process): EngineStatusBlock onde o estado é publicado
+engine_process = None      # Na UI com --engine-process: EngineProcess que roda o engine num processo filho
+
+def resource_path(relative_path):
+    # Roda no import, antes do logging existir: o caminho resolvido é logado no __main__.
+    base_path = getattr(sys, '_MEIPASS', None) or os.path.abspath(os.path.dirname(__file__))
+    return os.path.join(base_path, relative_path)
+
+SOUND_FILE_PATH = resource_path("beep.wav")
+
+
+class TimerDefinition:
+    """Timer extra configurado em TIMERS_CONFIG_FILENAME: roda junto com o timer principal."""
+    def __init__(self, name, button, delay, sound_path=None):
+        self.name = name
+        self.button = button
+        self.delay = delay
+        self.sound_path = sound_path
+        self.sound = None # Carregado pela PygameThread depois do mixer.init()
+
+extra_timers = {} # nome -> TimerDefinition
+
+def user_data_path(filename):
+    """Arquivo ao lado do executável (bundle) ou do script, como o log."""
+    return os.path.join(os.path.dirname(log_file_path), filename)
+
+def extra_timer_for_button(button):
+    """Nome do timer extra vinculado a `button`, ou None."""
+    for name, definition in extra_timers.items():
+        if definition.button == button:
+            return name
+    return None
+
+def load_extra_timers(path=None, main_button=None):
+    """Lê os timers extras do JSON: {"timers": [{"name": ..., "button": 4, "delay": 12.5, "sound": "x.wav"}]}.
+
+    Cada botão leva a um único timer: entradas com o botão de outro timer extra ou do botão de ação
+    principal (`main_button`, padrão: o atual do engine_state) são ignoradas com um aviso.
+    """
+    global extra_timers
+    path = path or user_data_path(TIMERS_CONFIG_FILENAME)
+    if not os.path.exists(path):
+        logging.info("Nenhum arquivo de timers extras em %s.", path)
+        return extra_timers
+    try:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f).get("timers", [])
+        loaded = {}
+        button_owners = {engine_state.snapshot().action_button if main_button is None else main_button: MAIN_TIMER_NAME}
+        for entry in entries:
+            name = str(entry["name"])
+            if name == MAIN_TIMER_NAME or name in loaded:
+                logging.warning("Timer extra '%s' ignorado: nome duplicado ou reservado.", name)
+                continue
+            delay = float(entry["delay"])
+            if delay <= 0:
+                logging.warning("Timer extra '%s' ignorado: delay deve ser positivo.", name)
+                continue
+            button = int(entry["button"])
+            if button in button_owners:
+                logging.warning("Timer extra '%s' ignorado: o botão %s já é do timer '%s'.", name, button, button_owners[button])
+                continue
+            button_owners[button] = name
+            sound_path = entry.get("sound")
+            if sound_path and not os.path.isabs(sound_path):
+                sound_path = os.path.join(os.path.dirname(path), sound_path)
+            loaded[name] = TimerDefinition(name, button, delay, sound_path)
+        extra_timers = loaded
+        logging.info("Timers extras carregados de %s: %s", path, ", ".join(extra_timers) or "nenhum")
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e_timers:
+        logging.error("Arquivo de timers extras inválido (%s): %s", path, e_timers)
+    return extra_timers
+
+
+class HeadlessConsole:
+    """Saída do modo --headless: cada status vira uma linha com horário no terminal."""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+        reconfigure = getattr(self.stream, "reconfigure", None)
+        if reconfigure: # Console do Windows (cp1252) não tem os emojis dos status: troca por '?'
+            reconfigure(errors="replace")
+
+    def line(self, text):
+        with self._lock:
+            self.stream.write(f"[{time.strftime('%H:%M:%S')}] {text}\n")
+            self.stream.flush()
+
+
+def update_main_status_ui(message):
+    if ui_root and ui_status_var and ui_root.winfo_exists():
+        schedule_ui(0, lambda: ui_status_var.set(message))
+    elif headless_console:
+        headless_console.line(message)
+    elif engine_status_block:
+        publish_engine_status(status=message)
+    logging.info("Status UI Principal: %s", message)
+
+def update_controller_status_ui(message):
+    if ui_root and ui_controller_status_var and ui_root.winfo_exists():
+        schedule_ui(0, lambda: ui_controller_status_var.set(message))
+    elif headless_console:
+        headless_console.line(f"Controle: {message}")
+    elif engine_status_block:
+        publish_engine_status(controller_status=message)
+    logging.info("Status Controle UI: %s", message)
+
+def update_action_button_display_ui():
+    action_button = engine_state.snapshot().action_button
+    if ui_root and ui_action_button_display_var and ui_root.winfo_exists():
+        display_text = f"Índice: {action_button}" if action_button is not None else "Nenhum (Defina abaixo)"
+        schedule_ui(0, lambda: ui_action_button_display_var.set(display_text))
+    publish_engine_status()
+    logging.info("Display do botão de ação atualizado para: %s", action_button)
+
+
+def publish_timer_event(kind, deadline=None, duration=None, remaining=None, name=MAIN_TIMER_NAME):
+    """Publica uma mudança de estado de um timer ("started", "reset", "paused", "fired") para a UI.
+
+    A animação da contagem é feita do lado do Tk (FarmHelperApp.on_timer_event), interpolando
+    a partir do deadline, então a thread do timer só envia um evento por mudança de estado.
+    """
+    app = FarmHelperApp.instance
+    if ui_root and app and ui_root.winfo_exists():
+        schedule_ui(0, app.on_timer_event, kind, deadline, duration, remaining, name)
+    publish_engine_status()
+
+def format_runtime():
+    return format_duration(time.time() - program_start_time)
+
+def format_duration(elapsed_seconds):
+    hours = int(elapsed_seconds // 3600)
+    minutes = int((elapsed_seconds % 3600) // 60)
+    seconds = int(elapsed_seconds % 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+ui_stats_job = None
+ui_stats_interval_ms = UI_STATS_REFRESH_MS
+ui_stats_signature = None
+ui_stats_changed_at = 0.0
+
+def update_runtime_stats_ui():
+    """Tick do card de estatísticas, com intervalo adaptativo.
+
+    Os textos de latência/histórico só são recalculados quando algum contador do engine muda.
+    Se nada muda por UI_STATS_IDLE_AFTER_SECONDS (ou a app está pausada), o intervalo dobra
+    até UI_STATS_IDLE_REFRESH_MS (o relógio de execução passa a andar em saltos maiores).
+    """
+    global ui_stats_job, ui_stats_interval_ms, ui_stats_signature, ui_stats_changed_at
+    ui_stats_job = None
+    # O tempo de execução continua contando mesmo se pausado, pois a app está "aberta"
+    if ui_root and ui_program_runtime_var and ui_root.winfo_exists(): # app_running não é mais a condição aqui
+        wakeup_counter.tick("ui_stats")
+        ui_program_runtime_var.set(format_runtime())
+        now = time.perf_counter()
+        engine_status = engine_process.last_status if engine_process is not None else None
+        signature = (action_press_count, timer_scheduler.cycle, timer_scheduler.fire_count, engine_state.version,
+                     history_store.written_events if history_store is not None else 0,
+                     stall_watchdog.stall_total + (engine_status.stalls if engine_status else 0))
+        if signature != ui_stats_signature:
+            ui_stats_signature = signature
+            ui_stats_changed_at = now
+            ui_stats_interval_ms = UI_STATS_REFRESH_MS
+            if ui_latency_stats_var and engine_process is None:
+                ui_latency_stats_var.set(f"{pipeline_latency.format_summary()}\n{format_engine_metrics()}")
+            if ui_history_stats_var and history_store is not None:
+                ui_history_stats_var.set(history_store.format_aggregates())
+            if ui_cycle_stats_var and engine_process is None:
+                ui_cycle_stats_var.set(cycle_analytics.format_summary())
+        elif instrumentation.enabled: # Com a instrumentação ligada o card não entra no modo ocioso
+            ui_stats_interval_ms = UI_STATS_REFRESH_MS
+        elif engine_state.snapshot().paused or now - ui_stats_changed_at >= UI_STATS_IDLE_AFTER_SECONDS:
+            ui_stats_interval_ms = min(ui_stats_interval_ms * 2, UI_STATS_IDLE_REFRESH_MS)
+        if ui_instrumentation_var and FarmHelperApp.instance:
+            FarmHelperApp.instance.refresh_instrumentation_ui()
+        if ui_lag_var:
+            ui_lag_var.set(stall_watchdog.format_indicator(*((engine_status.lag, engine_status.stalls) if engine_status else ())))
+        if ui_root.winfo_exists(): # Verifica se a root ainda existe antes de reagendar
+            ui_stats_job = schedule_ui(ui_stats_interval_ms, update_runtime_stats_ui)
+
+def refresh_runtime_stats_now():
+    """Sai do modo ocioso do card de estatísticas (ex: ao retomar) sem esperar o próximo tick."""
+    global ui_stats_job, ui_stats_interval_ms
+    if ui_stats_job is not None and ui_root and ui_root.winfo_exists():
+        ui_root.after_cancel(ui_stats_job)
+        ui_stats_job = None
+        ui_stats_interval_ms = UI_STATS_REFRESH_MS
+        update_runtime_stats_ui()
+
+
+def update_action_press_count_ui():
+    global action_press_count
+    if ui_root and ui_action_press_count_var and ui_root.winfo_exists():
+        ui_action_press_count_var.set(str(action_press_count))
+    publish_engine_status()
+
+def register_press(timer_name, source, button=None):
+    """Contabiliza um press já sinalizado ao timer_scheduler, venha do controle ou da API de controle.
+
+    Contador de métricas, histórico, a linha de log que o --analyze-log reconhece e o card de
+    "Ações Executadas" passam todos por aqui; o card (action_press_count) conta só o timer principal, os
+    timers extras aparecem por timer nas métricas. `source` completa a frase do log (ex: "no controle 0").
+    """
+    global action_press_count
+    with press_lock:
+        engine_counters.add(engine_counters.presses, timer_name)
+        if timer_name == MAIN_TIMER_NAME:
+            action_press_count += 1
+    record_history("press", timer_name)
+    logging.info(LOG_MSG_PRESS, "API" if button is None else button, timer_name, source)
+    update_action_press_count_ui()
+
+# --- Síntese de Tons ---
+# Um segmento de uma deixa sonora. frequency=0 é silêncio. adsr = (ataque_ms, decaimento_ms, sustain 0-1, release_ms).
+Tone = collections.namedtuple("Tone", "frequency duration_ms waveform end_frequency amplitude adsr",
+                              defaults=("sine", None, 1.0, None))
+
+def adsr_envelope(n_samples, sample_rate, attack_ms, decay_ms, sustain_level, release_ms):
+    """Envelope ADSR linear por partes, calculado com np.interp (sem loop por amostra)."""
+    import numpy as np
+    attack = min(n_samples, int(sample_rate * attack_ms / 1000.0))
+    decay = min(n_samples - attack, int(sample_rate * decay_ms / 1000.0))
+    release = min(n_samples - attack - decay, int(sample_rate * release_ms / 1000.0))
+    sustain_end = n_samples - release
+    points_x = [0, attack, attack + decay, sustain_end, n_samples]
+    points_y = [0.0, 1.0, sustain_level, sustain_level, 0.0]
+    return np.interp(np.arange(n_samples), points_x, points_y).astype(np.float32)
+
+def synthesize_tone(tone, sample_rate):
+    """Gera um segmento mono float32 em [-1, 1] com operações vetorizadas do NumPy."""
+    import numpy as np
+    n_samples = int(sample_rate * tone.duration_ms / 1000.0)
+    if tone.frequency <= 0 or n_samples == 0:
+        return np.zeros(n_samples, dtype=np.float32)
+    t = np.arange(n_samples, dtype=np.float64) / sample_rate
+    if tone.end_frequency is not None: # chirp linear: f(t) = f0 + (f1 - f0) * t / T
+        sweep_rate = (tone.end_frequency - tone.frequency) / (n_samples / sample_rate)
+        phase = 2 * np.pi * (tone.frequency * t + 0.5 * sweep_rate * t * t)
+    else:
+        phase = 2 * np.pi * tone.frequency * t
+    if tone.waveform == "square":
+        samples = np.sign(np.sin(phase))
+    elif tone.waveform == "sine":
+        samples = np.sin(phase)
+    else:
+        raise ValueError(f"Forma de onda desconhecida: {tone.waveform}")
+    samples = samples.astype(np.float32) * tone.amplitude
+    if tone.adsr is not None:
+        samples *= adsr_envelope(n_samples, sample_rate, *tone.adsr)
+    return samples
+
+def synthesize_cue(tones, sample_rate, channels=2):
+    """Concatena os segmentos e devolve o buffer int16 (n_amostras, canais) pronto para sndarray."""
+    import numpy as np
+    mono = np.concatenate([synthesize_tone(tone, sample_rate) for tone in tones]) if tones else np.zeros(0, np.float32)
+    pcm = (np.clip(mono, -1.0, 1.0) * (2**15 - 1)).astype(np.int16)
+    return np.repeat(pcm[:, np.newaxis], channels, axis=1) if channels > 1 else pcm
+
+
+class ToneCache:
+    """Cache LRU de Sounds sintetizados, indexado pelos parâmetros da deixa + formato do mixer.
+
+    Com `persist_dir`, cada deixa também é salva como WAV (nome = hash dos parâmetros), então
+    as próximas execuções carregam o arquivo e não sintetizam de novo.
+    """
+    def __init__(self, max_entries=None, persist_dir=None):
+        self.max_entries = max_entries or TONE_CACHE_MAX_ENTRIES
+        self.persist_dir = persist_dir
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = 0
+
+    @staticmethod
+    def cache_key(tones, sample_rate, channels):
+        return (tuple(Tone(*tone) for tone in tones), sample_rate, channels)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.persist_dir, f"cue_{digest}.wav")
+
+    def get_sound(self, tones, sample_rate=None, channels=None):
+        """Retorna um pygame.mixer.Sound da deixa, sintetizando só na primeira vez."""
+        mixer_format = pygame.mixer.get_init()
+        sample_rate = sample_rate or mixer_format[0]
+        channels = channels or mixer_format[2]
+        key = self.cache_key(tones, sample_rate, channels)
+        with self._lock:
+            sound = self._entries.get(key)
+            if sound is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return sound
+        sound = self._load_from_disk(key)
+        if sound is None:
+            with self._lock:
+                self.misses += 1
+            buffer = synthesize_cue(key[0], sample_rate, channels)
+            sound = pygame.sndarray.make_sound(buffer)
+            self._save_to_disk(key, buffer, sample_rate, channels)
+        with self._lock:
+            self._entries[key] = sound
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return sound
+
+    def _load_from_disk(self, key):
+        if not self.persist_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            sound = pygame.mixer.Sound(path)
+            with self._lock:
+                self.disk_hits += 1
+            return sound
+        except pygame.error as e_load:
+            logging.warning("Cache de som em disco inválido (%s): %s", path, e_load)
+            return None
+
+    def _save_to_disk(self, key, buffer, sample_rate, channels):
+        if not self.persist_dir:
+            return
+        try:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            path = self._disk_path(key)
+            with wave.open(path, "wb") as wav_file:
+                wav_file.setnchannels(channels)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(sample_rate)
+                wav_file.writeframes(buffer.tobytes())
+        except OSError as e_save:
+            logging.warning("Não foi possível salvar o som sintetizado em disco: %s", e_save)
+
+
+tone_cache = ToneCache()
+
+def generate_simple_beep(frequency=440, duration_ms=200, sample_rate=None):
+    if not (pygame and hasattr(pygame, 'sndarray')):
+        logging.warning("Pygame sndarray não disponível para gerar beep.")
+        return None
+    update_main_status_ui("Gerando beep padrão...")
+    try:
+        sound = tone_cache.get_sound((Tone(frequency, duration_ms),), sample_rate)
+        update_main_status_ui("Beep padrão gerado.")
+        return sound
+    except Exception as e_beep:
+        logging.error("Falha ao gerar som de beep: %s", e_beep, exc_info=True)
+        update_main_status_ui("Falha ao gerar beep.")
+        return None
+
+# Ticks de aviso antes do fim; o último (T-1) é mais agudo. O fim em si continua sendo sound_to_play.
+PREWARNING_CUES = {
+    "tick": (Tone(1000, 40, "square", amplitude=0.25, adsr=(2, 8, 0.6, 15)),),
+    "tick_last": (Tone(1500, 60, "square", amplitude=0.3, adsr=(2, 8, 0.6, 25)),),
+}
+
+class CueBank:
+    """Sons das deixas carregados uma vez na inicialização (pygame_loop, depois do mixer.init()).
+
+    Durante a contagem só há lookups num dict: nada é lido do disco nem sintetizado. Os Sounds
+    ficam em volume 1.0; o volume do usuário é aplicado nos canais do AudioWorker.
+    """
+    def __init__(self):
+        self._sounds = {}
+
+    def preload(self, final_sound, cues=None):
+        for name, tones in (cues or PREWARNING_CUES).items():
+            try:
+                self._sounds[name] = tone_cache.get_sound(tones)
+            except Exception as e_cue:
+                logging.error("Falha ao gerar a deixa '%s': %s", name, e_cue, exc_info=True)
+        self._sounds["final"] = final_sound
+        return self
+
+    def get(self, name):
+        return self._sounds.get(name)
+
+    def for_offset(self, offset):
+        return self.get("tick_last" if offset <= 1.0 else "tick")
+
+    def __len__(self):
+        return sum(1 for sound in self._sounds.values() if sound is not None)
+
+
+cue_bank = CueBank()
+
+def parse_prewarning_offsets(text):
+    """"3,2,1" -> (3.0, 2.0, 1.0); "" ou "0" -> () (sem avisos). Levanta ValueError se inválido."""
+    offsets = tuple(sorted({float(part) for part in str(text).replace(" ", "").split(",") if part}, reverse=True))
+    if any(offset < 0 for offset in offsets):
+        raise ValueError("as antecedências dos avisos devem ser positivas")
+    return tuple(offset for offset in offsets if offset > 0)
+
+def configure_pygame_event_filter():
+    """Restringe a fila do SDL aos eventos tratados por pygame_loop (o resto nem é enfileirado)."""
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed([pygame.QUIT, pygame.JOYBUTTONDOWN, pygame.JOYDEVICEADDED,
+                              pygame.JOYDEVICEREMOVED, pygame.USEREVENT])
+    logging.info("Filtro de eventos Pygame configurado (QUIT, JOYBUTTONDOWN, JOYDEVICEADDED/REMOVED, USEREVENT).")
+
+def wake_pygame_loop():
+    """Acorda pygame_loop se estiver bloqueado em pygame.event.wait (ex: ao fechar a aplicação)."""
+    if not (pygame and pygame.get_init()):
+        return
+    try:
+        pygame.event.post(pygame.event.Event(pygame.USEREVENT))
+    except pygame.error as e_wake:
+        logging.debug("Não foi possível acordar o loop Pygame: %s", e_wake)
+
+def next_pygame_events():
+    """Retorna os eventos pendentes. No modo "event" bloqueia até o primeiro chegar ou o timeout expirar."""
+    if INPUT_MODE == "poll":
+        return pygame.event.get()
+    first_event = pygame.event.wait(INPUT_WAIT_TIMEOUT_MS)
+    if first_event.type == pygame.NOEVENT:
+        return []
+    return [first_event] + pygame.event.get()
+
+class LatencyHistogram:
+    """Histograma streaming com buckets log-lineares (memória fixa) para latências em segundos.
+
+    Cobre de 1 µs a ~100 s com HISTOGRAM_BUCKETS_PER_DECADE buckets por década; os quantis
+    são aproximados pelo limite superior do bucket (erro relativo < 1/buckets_por_década).
+    """
+    MIN_VALUE = 1e-6
+    DECADES = 8
+
+    def __init__(self, buckets_per_decade=None):
+        self.buckets_per_decade = buckets_per_decade or HISTOGRAM_BUCKETS_PER_DECADE
+        self.counts = [0] * (self.DECADES * self.buckets_per_decade + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        if value <= self.MIN_VALUE:
+            return 0
+        index = int(math.log10(value / self.MIN_VALUE) * self.buckets_per_decade) + 1
+        return min(index, len(self.counts) - 1)
+
+    def _bucket_upper_bound(self, index):
+        return self.MIN_VALUE * 10 ** (index / self.buckets_per_decade)
+
+    def record(self, value):
+        value = max(0.0, value)
+        self.counts[self._bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank and bucket_count:
+                return min(self._bucket_upper_bound(index), self.max)
+        return self.max
+
+    def cumulative_counts(self, bounds):
+        """Contagens acumuladas até cada limite de `bounds` (crescente), como os buckets `le` do Prometheus.
+
+        Um bucket interno conta para o limite se o seu limite superior não passa dele (ou seja,
+        os valores são atribuídos com a mesma resolução do histograma, ~6%).
+        """
+        result = []
+        index = cumulative = 0
+        for bound in bounds:
+            while index < len(self.counts) and self._bucket_upper_bound(index) <= bound * (1 + 1e-9):
+                cumulative += self.counts[index]
+                index += 1
+            result.append(cumulative)
+        return result
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class LatencyTracker:
+    """Agrupa um LatencyHistogram por estágio do pipeline botão → timer → som."""
+    STAGES = (
+        ("input", "Evento → sinal"),         # evento retirado da fila do SDL → press sinalizado
+        ("dispatch", "Sinal → timer armado"), # press sinalizado → timer armado na thread do timer
+        ("firing", "Deadline → disparo"),     # deadline → thread do timer acordada (erro de disparo)
+        ("playback", "Disparo → play()"),     # thread acordada → play() retornou na AudioThread
+        ("end_to_end", "Atraso total do som"),# play() retornou - (evento retirado + delay configurado)
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {stage: LatencyHistogram() for stage, _ in self.STAGES}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.histograms[stage].record(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: self.histograms[stage].summary() for stage, _ in self.STAGES}
+
+    def buckets(self, bounds):
+        """{estágio: (contagens acumuladas em `bounds`, contagem, soma)}, consistente entre estágios."""
+        with self._lock:
+            return {stage: (histogram.cumulative_counts(bounds), histogram.count, histogram.total)
+                    for stage, histogram in self.histograms.items()}
+
+    def format_summary(self):
+        lines = []
+        snapshot = self.snapshot()
+        for stage, label in self.STAGES:
+            summary = snapshot[stage]
+            if not summary["count"]:
+                lines.append(f"{label}: --")
+                continue
+            lines.append(f"{label}: p50 {summary['p50'] * 1000:.2f} | p95 {summary['p95'] * 1000:.2f} | "
+                         f"p99 {summary['p99'] * 1000:.2f} ms")
+        return "\n".join(lines)
+
+    def export(self, path):
+        data = {"generated_at": time.strftime("%Y-%m-%d %H:%M:%S"), "unit": "seconds", "stages": self.snapshot()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+
+pipeline_latency = LatencyTracker()
+
+
+class P2Quantile:
+    """Estimador P² (Jain & Chlamtac, 1985) de um quantil: 5 marcadores, memória constante."""
+    def __init__(self, p):
+        self.p = p
+        self.count = 0
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        self.count += 1
+        heights, positions = self._heights, self._positions
+        if self.count <= 5:
+            bisect.insort(heights, x)
+            return
+        if x < heights[0]:
+            heights[0] = x
+            cell = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            cell = 3
+        else:
+            cell = bisect.bisect_right(heights, x) - 1
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+        for i in (1, 2, 3):
+            offset = self._desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not heights[i - 1] < candidate < heights[i + 1]:
+                    candidate = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = candidate
+                positions[i] += step
+
+    def _parabolic(self, i, step):
+        q, n = self._heights, self._positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self._heights[min(len(self._heights) - 1, int(round(self.p * (len(self._heights) - 1))))]
+        return self._heights[2]
+
+
+class CycleAnalytics:
+    """Estatísticas em fluxo do ritmo de farm (intervalo entre presses do timer principal), em memória constante.
+
+    Mantém EWMA e variância exponencial do intervalo (ritmo atual), média/variância da sessão
+    (Welford), quantis P² (p10/p50/p90) do intervalo e a mediana P² da reação (disparo → press
+    seguinte). A sugestão de delay é a mediana do intervalo menos a mediana da reação: o beep
+    passa a tocar quando o jogador costuma agir. Intervalos acima de CYCLE_MAX_GAP_SECONDS e os
+    que atravessam uma pausa são descartados.
+    """
+    def __init__(self, alpha=CYCLE_EWMA_ALPHA, max_gap=CYCLE_MAX_GAP_SECONDS, min_samples=CYCLE_SUGGESTION_MIN_SAMPLES):
+        self.alpha = alpha
+        self.max_gap = max_gap
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._last_press = None
+        self._last_fire = None
+        self.count = 0
+        self.active_seconds = 0.0
+        self.ewma = None
+        self.ewm_variance = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.quantiles = {p: P2Quantile(p) for p in (0.1, 0.5, 0.9)}
+        self.reaction_median = P2Quantile(0.5)
+
+    def record_press(self, pressed_at):
+        """Registra um press do timer principal; retorna o intervalo contabilizado (ou None)."""
+        with self._lock:
+            previous, self._last_press = self._last_press, pressed_at
+            if self._last_fire is not None and previous is not None and self._last_fire > previous:
+                self.reaction_median.add(pressed_at - self._last_fire)
+            if previous is None:
+                return None
+            interval = pressed_at - previous
+            if interval <= 0 or interval > self.max_gap:
+                return None
+            self.count += 1
+            self.active_seconds += interval
+            delta = interval - self._mean
+            self._mean += delta / self.count
+            self._m2 += delta * (interval - self._mean)
+            if self.ewma is None:
+                self.ewma = interval
+            else:
+                ewma_delta = interval - self.ewma
+                self.ewma += self.alpha * ewma_delta
+                self.ewm_variance = (1 - self.alpha) * (self.ewm_variance + self.alpha * ewma_delta * ewma_delta)
+            for estimator in self.quantiles.values():
+                estimator.add(interval)
+            return interval
+
+    def record_fire(self, fired_at):
+        with self._lock:
+            self._last_fire = fired_at
+
+    def break_sequence(self):
+        """Pausa da aplicação: o próximo press começa uma sequência nova (sem intervalo atravessando a pausa)."""
+        with self._lock:
+            self._last_press = None
+            self._last_fire = None
+
+    def suggested_delay(self):
+        with self._lock:
+            median = self.quantiles[0.5].value()
+            if self.count < self.min_samples or median is None:
+                return None
+            reaction = self.reaction_median.value() or 0.0
+            return round(max(0.1, median - reaction), 1)
+
+    def snapshot(self):
+        with self._lock:
+            session_variance = self._m2 / (self.count - 1) if self.count > 1 else 0.0
+            return {
+                "cycles": self.count,
+                "ewma": self.ewma,
+                "ewm_stddev": math.sqrt(self.ewm_variance),
+                "mean": self._mean if self.count else None,
+                "stddev": math.sqrt(session_variance),
+                "p10": self.quantiles[0.1].value(),
+                "p50": self.quantiles[0.5].value(),
+                "p90": self.quantiles[0.9].value(),
+                "reaction_p50": self.reaction_median.value(),
+                "cycles_per_hour": 3600.0 / self.ewma if self.ewma else None,
+                "session_cycles_per_hour": self.count * 3600.0 / self.active_seconds if self.active_seconds else None,
+            }
+
+    def format_summary(self):
+        stats = self.snapshot()
+        if not stats["cycles"]:
+            return "Ritmo: aguardando ciclos..."
+        suggestion = self.suggested_delay()
+        return (f"Ritmo: {stats['cycles_per_hour']:.0f} ciclos/h (sessão {stats['session_cycles_per_hour']:.0f}/h)\n"
+                f"Intervalo: p50 {stats['p50']:.2f}s | p90 {stats['p90']:.2f}s | ±{stats['ewm_stddev']:.2f}s\n"
+                f"Delay sugerido: {f'{suggestion:.1f}s' if suggestion is not None else f'após {self.min_samples} ciclos'}")
+
+
+cycle_analytics = CycleAnalytics()
+
+
+class HistoryStore:
+    """Histórico persistente das sessões (SQLite), gravado em lote por uma thread própria.
+
+    As threads de input/timer/UI só chamam record(), que enfileira numa SimpleQueue e
+    retorna na hora. A HistoryWriterThread agrupa os eventos, grava em uma transação e
+    mantém as tabelas de agregados (sessions, hourly_stats) atualizadas incrementalmente,
+    então as consultas da UI nunca varrem a tabela de eventos.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            started_at REAL NOT NULL,
+            ended_at REAL NOT NULL,
+            paused_seconds REAL NOT NULL DEFAULT 0,
+            presses INTEGER NOT NULL DEFAULT 0,
+            fires INTEGER NOT NULL DEFAULT 0,
+            cycle_time_sum REAL NOT NULL DEFAULT 0,
+            cycle_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            session_id INTEGER NOT NULL REFERENCES sessions(id),
+            ts REAL NOT NULL,
+            kind TEXT NOT NULL,
+            timer TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_session_kind ON events(session_id, kind);
+        CREATE INDEX IF NOT EXISTS idx_events_kind_ts ON events(kind, ts);
+        CREATE TABLE IF NOT EXISTS hourly_stats (
+            hour INTEGER NOT NULL,
+            session_id INTEGER NOT NULL REFERENCES sessions(id),
+            presses INTEGER NOT NULL DEFAULT 0,
+            fires INTEGER NOT NULL DEFAULT 0,
+            cycle_time_sum REAL NOT NULL DEFAULT 0,
+            cycle_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, session_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_hourly_stats_session ON hourly_stats(session_id);
+    """
+    EVENT_KINDS = ("press", "fire", "pause", "resume", "stall") # stall: `timer` guarda o loop que travou
+
+    def __init__(self, path, batch_max=None):
+        self.path = path
+        self.batch_max = batch_max or HISTORY_BATCH_MAX
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._closing = object()
+        self.session_id = None
+        self.latest_aggregates = None # Atualizado pela thread escritora após cada lote
+        self.written_events = 0
+        # Estado incremental da sessão (só a thread escritora mexe)
+        self._paused_since = None
+        self._last_main_press = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer_loop, name="HistoryWriterThread", daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, kind, timer_name=None):
+        """Enfileira um evento (não bloqueia; o instante é tirado aqui, em tempo de parede)."""
+        self._queue.put((kind, time.time(), timer_name))
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=3.0):
+        if self._thread and self._thread.is_alive():
+            self._queue.put(self._closing)
+            self._thread.join(timeout=timeout)
+
+    def _writer_loop(self):
+        try:
+            connection = sqlite3.connect(self.path)
+            connection.executescript(self.SCHEMA)
+            now = time.time()
+            self.session_id = connection.execute("INSERT INTO sessions (started_at, ended_at) VALUES (?, ?)",
+                                                 (now, now)).lastrowid
+            connection.commit()
+            self.latest_aggregates = self._query_aggregates(connection)
+            logging.info("Histórico aberto em %s (sessão %d).", self.path, self.session_id)
+        except sqlite3.Error as e_db:
+            logging.error("Não foi possível abrir o histórico %s: %s", self.path, e_db)
+            return
+
+        closing = False
+        while not closing:
+            batch = []
+            item = self._queue.get() # Bloqueia sem timeout: ocioso = nenhum despertar (close() envia _closing)
+            try:
+                while True:
+                    wakeup_counter.tick("history")
+                    if item is self._closing:
+                        closing = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_max:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._write_batch(connection, batch, closing)
+                self.latest_aggregates = self._query_aggregates(connection)
+            except sqlite3.Error as e_db:
+                logging.error("Erro ao gravar %d eventos no histórico: %s", len(batch), e_db)
+        connection.close()
+        logging.info("Histórico fechado (%d eventos gravados nesta sessão).", self.written_events)
+
+    def _write_batch(self, connection, batch, closing=False):
+        session_id = self.session_id
+        session = {"presses": 0, "fires": 0, "paused": 0.0, "cycle_sum": 0.0, "cycle_count": 0}
+        hourly = {} # hora -> [presses, fires, cycle_sum, cycle_count]
+        last_ts = time.time()
+        for kind, ts, timer_name in batch:
+            bucket = hourly.setdefault(int(ts // 3600), [0, 0, 0.0, 0])
+            if kind == "press" and timer_name in (None, MAIN_TIMER_NAME):
+                # Só o timer principal: "Ações/h" e "Ações nas últimas 24h" batem com o card de Ações Executadas
+                session["presses"] += 1
+                bucket[0] += 1
+                if self._last_main_press is not None:
+                    cycle = ts - self._last_main_press
+                    session["cycle_sum"] += cycle; session["cycle_count"] += 1
+                    bucket[2] += cycle; bucket[3] += 1
+                self._last_main_press = ts
+            elif kind == "fire":
+                session["fires"] += 1
+                bucket[1] += 1
+            elif kind == "pause":
+                self._paused_since = ts
+                self._last_main_press = None # Intervalo que atravessa uma pausa não é um ciclo
+            elif kind == "resume" and self._paused_since is not None:
+                session["paused"] += ts - self._paused_since
+                self._paused_since = None
+        if closing and self._paused_since is not None: # Fechou pausado: a pausa vai até o fim da sessão
+            session["paused"] += last_ts - self._paused_since
+            self._paused_since = None
+        with connection:
+            connection.executemany("INSERT INTO events (session_id, ts, kind, timer) VALUES (?, ?, ?, ?)",
+                                   [(session_id, ts, kind, timer_name) for kind, ts, timer_name in batch])
+            connection.execute(
+                "UPDATE sessions SET ended_at = ?, paused_seconds = paused_seconds + ?, presses = presses + ?, "
+                "fires = fires + ?, cycle_time_sum = cycle_time_sum + ?, cycle_count = cycle_count + ? WHERE id = ?",
+                (last_ts, session["paused"], session["presses"], session["fires"], session["cycle_sum"],
+                 session["cycle_count"], session_id))
+            connection.executemany(
+                "INSERT INTO hourly_stats (hour, session_id, presses, fires, cycle_time_sum, cycle_count) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (hour, session_id) DO UPDATE SET "
+                "presses = presses + excluded.presses, fires = fires + excluded.fires, "
+                "cycle_time_sum = cycle_time_sum + excluded.cycle_time_sum, cycle_count = cycle_count + excluded.cycle_count",
+                [(hour, session_id, *values) for hour, values in hourly.items()])
+        self.written_events += len(batch)
+
+    def _query_aggregates(self, connection):
+        """Agregados de todas as sessões, lidos só das tabelas sessions/hourly_stats."""
+        sessions, farmed, presses, fires, cycle_sum, cycle_count = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(MAX(0, ended_at - started_at - paused_seconds)), 0), "
+            "COALESCE(SUM(presses), 0), COALESCE(SUM(fires), 0), COALESCE(SUM(cycle_time_sum), 0), "
+            "COALESCE(SUM(cycle_count), 0) FROM sessions").fetchone()
+        last_day_presses, = connection.execute(
+            "SELECT COALESCE(SUM(presses), 0) FROM hourly_stats WHERE hour >= ?",
+            (int(time.time() // 3600) - 23,)).fetchone()
+        return {
+            "sessions": sessions,
+            "farmed_seconds": farmed,
+            "presses": presses,
+            "fires": fires,
+            "presses_per_hour": presses / (farmed / 3600.0) if farmed > 0 else None,
+            "average_cycle_seconds": cycle_sum / cycle_count if cycle_count else None,
+            "presses_last_24h": last_day_presses,
+        }
+
+    def format_aggregates(self):
+        aggregates = self.latest_aggregates
+        if not aggregates:
+            return "Carregando histórico..."
+        farmed = int(aggregates["farmed_seconds"])
+        per_hour = f"{aggregates['presses_per_hour']:.1f}" if aggregates["presses_per_hour"] is not None else "--"
+        cycle = f"{aggregates['average_cycle_seconds']:.1f}s" if aggregates["average_cycle_seconds"] is not None else "--"
+        return (f"Sessões: {aggregates['sessions']} | Farmado: {farmed // 3600:02d}:{farmed % 3600 // 60:02d}:{farmed % 60:02d}\n"
+                f"Ações/h: {per_hour} | Ciclo médio: {cycle}\n"
+                f"Ações nas últimas 24h: {aggregates['presses_last_24h']}")
+
+
+history_store = None # HistoryStore ativo (None se o histórico estiver desabilitado)
+
+def record_history(kind, timer_name=None):
+    if history_store is not None:
+        history_store.record(kind, timer_name)
+
+# Press entregue à thread do timer: instante do sinal, instante em que o evento saiu da fila do pygame
+# (âncora do deadline), o timer vinculado ao botão e o botão do controle (None pela API de controle).
+PressMessage = collections.namedtuple("PressMessage", "signalled_at pressed_at timer_name button", defaults=(None,))
+
+
+class _TimerSlot:
+    """Estado de um timer nomeado dentro do TimerScheduler."""
+    __slots__ = ("name", "deadline", "duration", "paused_remaining", "paused_at", "paused_time", "generation", "cues")
+
+    def __init__(self, name):
+        self.name = name
+        self.deadline = None          # Deadline absoluto (clock) do ciclo armado, None se ocioso/pausado
+        self.duration = 0.0
+        self.paused_remaining = None  # Tempo restante congelado durante a pausa
+        self.paused_at = None
+        self.paused_time = 0.0        # Quanto o deadline do ciclo atual foi adiado por pausas
+        self.generation = 0           # Ciclo que armou o slot; invalida entradas antigas do heap
+        self.cues = ()                # Segundos antes do deadline em que o ciclo atual emite CUE
+
+
+class TimerScheduler:
+    """Contagens regressivas nomeadas, baseadas em deadline absoluto num relógio monotônico.
+
+    O relógio padrão é time.perf_counter (monotônico e de alta resolução; no Windows o
+    time.monotonic do Python < 3.13 tem resolução de ~15,6 ms).
+
+    Todos os timers compartilham uma única thread: os deadlines ficam num heap
+    (instante, ciclo, nome, antecedência) e a thread dorme uma única vez até o mais próximo (ou até ser
+    acordada por um press, pausa/retomada ou parada). Rearmar um timer apenas empurra uma
+    nova entrada; as antigas são descartadas ao chegar ao topo. Cada disparo acontece
+    exatamente uma vez por armação e registra o erro de disparo (instante real - deadline).
+    Deixas de aviso (arm(..., cues=(3, 2, 1))) são entradas do mesmo heap com antecedência > 0:
+    saem como CUE, seguem a mesma contagem e somem junto com ela num reset ou pausa.
+
+    Os presses chegam como PressMessage numa queue.SimpleQueue (put sem lock do lado do input,
+    nenhum press é fundido ou perdido); a thread do timer dorme no get() dessa fila com timeout
+    até o próximo deadline. As outras operações a acordam com uma mensagem _WAKE.
+
+    Modo de precisão (spin_threshold > 0): o get() dorme só até `spin_threshold` antes do
+    deadline e o resto é uma espera ativa no relógio, que termina antes se chegar mensagem.
+    Troca até spin_threshold de CPU (e de GIL) por ciclo por um disparo sem a granularidade do
+    sleep do sistema nem a espera pelo GIL na volta do sono.
+    """
+    PRESS = "press"
+    FIRE = "fire"
+    CUE = "cue"
+    STOP = "stop"
+    _WAKE = object()
+
+    def __init__(self, clock=time.perf_counter, error_history=FIRING_ERROR_HISTORY, spin_threshold=0.0):
+        self._clock = clock
+        self.spin_threshold = spin_threshold # segundos; 0 = só sleep (modo normal)
+        self._lock = ContendedLock()
+        self._inbox = queue.SimpleQueue() # PressMessage ou _WAKE
+        self._timers = {}   # nome -> _TimerSlot
+        self._heap = []     # (instante, ciclo, nome, antecedência): antecedência 0 = o próprio deadline
+        self.last_press = None # PressMessage do último PRESS retornado por wait()
+        self.last_fired_timer = None
+        self.last_fired_cycle = None # Ciclo (geração do slot) do último FIRE
+        self.last_fired_deadline = None # Deadline do último FIRE
+        self.last_cue = None   # (nome, antecedência) do último CUE
+        self.presses_received = 0
+        self._queue_depth_sum = 0
+        self.queue_depth_max = 0
+        self._stopped = False
+        self.cycle = 0
+        self.fire_count = 0
+        self.last_firing_error = None
+        self.firing_errors = collections.deque(maxlen=error_history)  # (timer, ciclo do timer, erro_s) recentes
+        self._error_sum = 0.0
+        self._error_abs_max = 0.0
+
+    def now(self):
+        return self._clock()
+
+    def signal_press(self, signalled_at=None, timer_name=MAIN_TIMER_NAME, pressed_at=None, button=None):
+        if signalled_at is None:
+            signalled_at = self._clock()
+        self._inbox.put(PressMessage(signalled_at, pressed_at, timer_name, button))
+
+    def _wake(self):
+        self._inbox.put(self._WAKE)
+
+    def _slot(self, name):
+        slot = self._timers.get(name)
+        if slot is None:
+            slot = self._timers[name] = _TimerSlot(name)
+        return slot
+
+    def _push(self, slot, remaining):
+        heapq.heappush(self._heap, (slot.deadline, slot.generation, slot.name, 0.0))
+        for offset in slot.cues:
+            if offset < remaining:
+                heapq.heappush(self._heap, (slot.deadline - offset, slot.generation, slot.name, offset))
+
+    def arm(self, duration, armed_at=None, name=MAIN_TIMER_NAME, cues=()):
+        """(Re)arma a contagem do timer `name`. `armed_at` permite ancorar o deadline no instante do press.
+
+        `cues`: antecedências (s) em que wait() devolve CUE antes do FIRE; as maiores que a
+        duração são ignoradas.
+        """
+        with self._lock:
+            start = self._clock() if armed_at is None else armed_at
+            self.cycle += 1
+            slot = self._slot(name)
+            slot.deadline = start + duration
+            slot.duration = duration
+            slot.paused_remaining = None
+            slot.paused_at = None
+            slot.paused_time = 0.0
+            slot.generation = self.cycle
+            slot.cues = tuple(cues)
+            self._push(slot, duration)
+            self._wake()
+            return self.cycle
+
+    def pause(self, at=None):
+        """Congela todos os timers ativos no instante `at` (padrão: agora). Retorna {nome: tempo restante}."""
+        with self._lock:
+            now = self._clock() if at is None else at
+            frozen = {}
+            for slot in self._timers.values():
+                if slot.deadline is not None:
+                    slot.paused_at = now
+                    slot.paused_remaining = max(0.0, slot.deadline - now)
+                    slot.deadline = None
+                if slot.paused_remaining is not None:
+                    frozen[slot.name] = slot.paused_remaining
+            self._heap.clear()
+            self._wake()
+            return frozen
+
+    def resume(self, at=None):
+        """Retoma os timers pausados a partir do tempo congelado, no instante `at` (padrão: agora).
+        Retorna {nome: tempo restante}."""
+        with self._lock:
+            now = self._clock() if at is None else at
+            resumed = {}
+            for slot in self._timers.values():
+                if slot.paused_remaining is None:
+                    continue
+                resumed[slot.name] = slot.paused_remaining
+                slot.deadline = now + slot.paused_remaining
+                slot.paused_time += now - slot.paused_at
+                slot.paused_remaining = None
+                slot.paused_at = None
+                self._push(slot, resumed[slot.name])
+            self._wake()
+            return resumed
+
+    def cancel(self, name=None):
+        """Cancela o timer `name` (ou todos)."""
+        with self._lock:
+            if name is None:
+                slots = list(self._timers.values())
+            else:
+                slots = [self._timers[name]] if name in self._timers else []
+            for slot in slots:
+                slot.deadline = None
+                slot.paused_remaining = None
+            self._wake()
+
+    def stop(self):
+        self._stopped = True
+        self._wake()
+
+    def duration(self, name=MAIN_TIMER_NAME):
+        slot = self._timers.get(name)
+        return slot.duration if slot else 0.0
+
+    def deadline(self, name=MAIN_TIMER_NAME):
+        slot = self._timers.get(name)
+        return slot.deadline if slot else None
+
+    def paused_time(self, name=MAIN_TIMER_NAME):
+        slot = self._timers.get(name)
+        return slot.paused_time if slot else 0.0
+
+    def is_armed(self, name=MAIN_TIMER_NAME):
+        with self._lock:
+            slot = self._timers.get(name)
+            return slot is not None and (slot.deadline is not None or slot.paused_remaining is not None)
+
+    def remaining(self, name=MAIN_TIMER_NAME):
+        with self._lock:
+            slot = self._timers.get(name)
+            if slot is None:
+                return None
+            if slot.paused_remaining is not None:
+                return slot.paused_remaining
+            if slot.deadline is None:
+                return None
+            return max(0.0, slot.deadline - self._clock())
+
+    def status(self, name=MAIN_TIMER_NAME):
+        """(estado, restante) do timer: ("counting", até o deadline), ("paused", congelado) ou ("idle", 0.0)."""
+        with self._lock:
+            slot = self._timers.get(name)
+            if slot is not None and slot.paused_remaining is not None:
+                return "paused", slot.paused_remaining
+            if slot is not None and slot.deadline is not None:
+                return "counting", max(0.0, slot.deadline - self._clock())
+            return "idle", 0.0
+
+    def active_timers(self):
+        """{nome: (deadline, duração)} dos timers em contagem (não pausados)."""
+        with self._lock:
+            return {slot.name: (slot.deadline, slot.duration) for slot in self._timers.values() if slot.deadline is not None}
+
+    def wait(self):
+        """Bloqueia até o próximo acontecimento e retorna PRESS, FIRE, CUE ou STOP.
+
+        Em PRESS, `last_press` é a PressMessage recebida; em FIRE, `last_fired_timer`
+        identifica o timer que disparou; em CUE, `last_cue` é (nome, antecedência). Presses já enfileirados saem antes de um deadline
+        vencido (um reset sinalizado antes do disparo cancela o disparo).
+        """
+        while True:
+            wakeup_counter.tick("timer")
+            outcome, time_to_deadline = self._poll()
+            if outcome is not None:
+                return outcome
+            if time_to_deadline is not None and self.spin_threshold > 0:
+                if time_to_deadline <= self.spin_threshold:
+                    self._spin(time_to_deadline)
+                    continue
+                time_to_deadline -= self.spin_threshold
+            stall_watchdog.idle("timer", time_to_deadline)
+            pressed = self._take_message(time_to_deadline)
+            stall_watchdog.busy("timer")
+            if pressed:
+                return self.PRESS
+
+    def _spin(self, duration):
+        """Espera ativa até `duration` no relógio; sai antes se chegar mensagem (press, pausa, parada)."""
+        target = self._clock() + duration
+        inbox_empty = self._inbox.empty
+        clock = self._clock
+        while clock() < target and inbox_empty():
+            pass
+
+    def poll(self):
+        """Versão não bloqueante de wait(): PRESS, FIRE, CUE, STOP ou None se nada vence no instante atual do relógio.
+
+        Com um VirtualClock, quem chama avança o relógio (até next_deadline() ou o próximo evento)
+        e drena com poll(): é assim que o replay acelerado roda sem esperar tempo real.
+        """
+        return self._poll()[0]
+
+    def next_deadline(self):
+        with self._lock:
+            self._drop_stale_entries()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_stale_entries(self):
+        while self._heap:
+            at, generation, name, offset = self._heap[0]
+            slot = self._timers.get(name)
+            if (slot is not None and slot.generation == generation and slot.deadline is not None
+                    and slot.deadline - offset == at):
+                return
+            heapq.heappop(self._heap) # entrada de um ciclo rearmado, pausado ou cancelado
+
+    def _poll(self):
+        """(resultado ou None, segundos até o próximo deadline ou None)."""
+        if self._stopped:
+            return self.STOP, None
+        if self._take_message(0):
+            return self.PRESS, None
+        with self._lock:
+            if self._stopped:
+                return self.STOP, None
+            self._drop_stale_entries()
+            if not self._heap:
+                return None, None
+            deadline, _, name, offset = self._heap[0]
+            now = self._clock()
+            time_to_deadline = deadline - now
+            if time_to_deadline > 0:
+                return None, time_to_deadline
+            heapq.heappop(self._heap)
+            if offset:
+                self.last_cue = (name, offset)
+                return self.CUE, None
+            slot = self._timers[name]
+            slot.deadline = None
+            self.last_fired_timer = name
+            self.last_fired_deadline = deadline
+            self._record_fire(name, slot.generation, now - deadline)
+            return self.FIRE, None
+
+    def _take_message(self, timeout):
+        """Tira uma mensagem da fila (timeout 0 = não bloqueia, None = sem limite). True se foi um press."""
+        try:
+            message = self._inbox.get_nowait() if timeout == 0 else self._inbox.get(timeout=timeout)
+            while message is self._WAKE: # Vários _WAKE acumulados: uma reavaliação cobre todos
+                message = self._inbox.get_nowait()
+        except queue.Empty:
+            return False
+        depth = self._inbox.qsize() + 1 # inclui a mensagem recém-retirada
+        self.presses_received += 1
+        self._queue_depth_sum += depth
+        if depth > self.queue_depth_max: self.queue_depth_max = depth
+        self.last_press = message
+        return True
+
+    def _record_fire(self, name, generation, error):
+        self.fire_count += 1
+        self.last_fired_cycle = generation
+        self.last_firing_error = error
+        self.firing_errors.append((name, generation, error))
+        self._error_sum += error
+        self._error_abs_max = max(self._error_abs_max, abs(error))
+
+    def firing_error_stats(self):
+        """Resumo do erro de disparo (segundos) desde o início da sessão."""
+        with self._lock:
+            return {
+                "fires": self.fire_count,
+                "last": self.last_firing_error,
+                "mean": self._error_sum / self.fire_count if self.fire_count else None,
+                "abs_max": self._error_abs_max if self.fire_count else None,
+            }
+
+    def queue_stats(self):
+        """Profundidade da fila de presses (vista a cada retirada) e contenção do lock do scheduler."""
+        return {
+            "presses": self.presses_received,
+            "depth_now": self._inbox.qsize(),
+            "depth_max": self.queue_depth_max,
+            "depth_mean": self._queue_depth_sum / self.presses_received if self.presses_received else None,
+            "lock": self._lock.stats(),
+        }
+
+
+timer_scheduler = TimerScheduler()
+
+def engine_metrics():
+    """Profundidade da fila de presses e contenção dos locks compartilhados (scheduler e estado do engine)."""
+    return {"press_queue": timer_scheduler.queue_stats(), "engine_state_lock": engine_state.lock_stats()}
+
+def format_engine_metrics():
+    metrics = engine_metrics()
+    parts = [f"Fila de presses: máx {metrics['press_queue']['depth_max']}"]
+    for label, stats in (("scheduler", metrics["press_queue"]["lock"]), ("estado", metrics["engine_state_lock"])):
+        share = stats["contended"] / stats["acquisitions"] * 100 if stats["acquisitions"] else 0.0
+        parts.append(f"contenção {label} {share:.1f}% (máx {stats['wait_max'] * 1000:.2f} ms)")
+    return " | ".join(parts)
+
+def precision_switch_interval(spin_threshold):
+    """Intervalo de troca do GIL usado no modo de precisão (nunca aumenta o atual)."""
+    return min(sys.getswitchinterval(), spin_threshold / 2)
+
+# (intervalo de troca do GIL anterior, timeBeginPeriod pedido) enquanto o modo de precisão está ligado
+precision_timer_restore = None
+
+def enable_precision_timer(spin_threshold_ms=TIMER_SPIN_THRESHOLD_MS_DEFAULT):
+    """Liga o modo de precisão do timer_scheduler (sono grosso + espera ativa nos últimos ms).
+
+    Também encurta o intervalo de troca do GIL (sys.setswitchinterval, padrão 5 ms) para metade
+    do limiar: sem isso, com a thread do Tk ocupada, a thread do timer acorda e espera o GIL por
+    até 5 ms, mais que a janela da espera ativa. No Windows ainda pede ao sistema resolução de
+    1 ms (timeBeginPeriod): com os ~15,6 ms padrão o sono grosso passaria do limiar. As duas
+    coisas valem para o processo inteiro (todas as threads trocam o GIL mais vezes) e são
+    desfeitas por disable_precision_timer() no shutdown_engine.
+    """
+    global precision_timer_restore
+    if spin_threshold_ms <= 0:
+        raise ValueError("o limiar da espera ativa deve ser positivo")
+    previous_interval = sys.getswitchinterval() if precision_timer_restore is None else precision_timer_restore[0]
+    period_begun = precision_timer_restore is not None and precision_timer_restore[1]
+    timer_scheduler.spin_threshold = spin_threshold_ms / 1000.0
+    sys.setswitchinterval(precision_switch_interval(timer_scheduler.spin_threshold))
+    if sys.platform == "win32" and not period_begun:
+        try:
+            import ctypes
+            period_begun = ctypes.windll.winmm.timeBeginPeriod(1) == 0 # TIMERR_NOERROR
+        except (ImportError, AttributeError, OSError) as e_period:
+            logging.warning("Não foi possível ajustar a resolução do timer do sistema: %s", e_period)
+    precision_timer_restore = (previous_interval, period_begun)
+    logging.info("Modo de precisão do timer: espera ativa nos últimos %.1f ms, troca do GIL a cada %.2f ms.",
+                 spin_threshold_ms, sys.getswitchinterval() * 1000)
+
+def disable_precision_timer():
+    """Desfaz enable_precision_timer: intervalo de troca do GIL anterior e timeEndPeriod pareado."""
+    global precision_timer_restore
+    if precision_timer_restore is None:
+        return
+    previous_interval, period_begun = precision_timer_restore
+    precision_timer_restore = None
+    timer_scheduler.spin_threshold = 0.0
+    sys.setswitchinterval(previous_interval)
+    if period_begun:
+        try:
+            import ctypes
+            ctypes.windll.winmm.timeEndPeriod(1)
+        except (ImportError, AttributeError, OSError) as e_period:
+            logging.warning("Não foi possível restaurar a resolução do timer do sistema: %s", e_period)
+    logging.info("Modo de precisão do timer desligado (troca do GIL a cada %.2f ms).", previous_interval * 1000)
+
+def get_active_delay_seconds():
+    return engine_state.snapshot().delay
+
+class AudioWorker:
+    """Thread dedicada à reprodução: a thread do timer só enfileira o som e volta a contar.
+
+    Toca nos canais reservados do mixer (pygame.mixer.set_reserved), então outros sons
+    nunca roubam o canal da deixa, e mede a latência disparo → play() retornado. O volume é
+    do canal, não do Sound: mexer no slider custa o mesmo com 1 ou 20 sons no CueBank.
+    """
+    def __init__(self, reserved_channels=None):
+        self.reserved_channels = reserved_channels or AUDIO_RESERVED_CHANNELS
+        self.channels = []
+        self._next_channel = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.volume = 1.0
+
+    def start(self):
+        """Reserva os canais e sobe a thread. Chamar depois do pygame.mixer.init()."""
+        pygame.mixer.set_reserved(self.reserved_channels)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.reserved_channels)]
+        self._thread = threading.Thread(target=self._loop, name="AudioThread", daemon=True)
+        self._thread.start()
+        logging.info("AudioWorker iniciado com %d canal(is) reservado(s).", self.reserved_channels)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def play(self, sound, fired_at=None, expected_at=None):
+        """Enfileira a reprodução (não bloqueia)."""
+        self._queue.put(("play", sound, fired_at, expected_at))
+
+    def set_volume(self, volume):
+        """Volume aplicado a cada play() e aos canais que já estão tocando."""
+        self.volume = volume
+        for channel in self.channels:
+            channel.set_volume(volume)
+
+    def warm_up(self, sound):
+        """Toca o som em volume zero uma vez, para o primeiro disparo real não pagar a abertura do dispositivo."""
+        self._queue.put(("warm_up", sound, None, None))
+
+    def stop(self, timeout=1.0):
+        if self.is_running():
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+
+    def _channel(self):
+        # Round-robin entre os canais reservados, preferindo um livre; se todos tocam, reusa o mais antigo
+        count = len(self.channels)
+        for offset in range(count):
+            index = (self._next_channel + offset) % count
+            if not self.channels[index].get_busy():
+                break
+        else:
+            index = self._next_channel
+        self._next_channel = (index + 1) % count
+        return self.channels[index]
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            wakeup_counter.tick("audio")
+            if item is None:
+                return
+            action, sound, fired_at, expected_at = item
+            try:
+                channel = self._channel()
+                if action == "warm_up":
+                    channel.set_volume(0.0)
+                    channel.play(sound)
+                    time.sleep(min(sound.get_length(), AUDIO_WARM_UP_SECONDS))
+                    channel.stop()
+                    channel.set_volume(self.volume)
+                    logging.info("Aquecimento do áudio concluído.")
+                    continue
+                channel.set_volume(self.volume) # Antes do play(): o mixer pode começar a tocar assim que ele retorna
+                channel.play(sound)
+                played_at = timer_scheduler.now()
+                if fired_at is not None:
+                    pipeline_latency.record("playback", played_at - fired_at)
+                if expected_at is not None:
+                    pipeline_latency.record("end_to_end", played_at - expected_at)
+                logging.debug("Som reproduzido.")
+            except pygame.error as e_play:
+                logging.error("Erro ao reproduzir som: %s", e_play, exc_info=True)
+                update_main_status_ui("Erro ao tocar som.")
+
+
+audio_worker = AudioWorker()
+
+def configure_mixer_pre_init():
+    """Aplica buffer/frequência do áudio antes do pygame.init() (que já inicializa o mixer)."""
+    pygame.mixer.pre_init(frequency=AUDIO_FREQUENCY, size=-16, channels=2, buffer=AUDIO_BUFFER_SIZE)
+    logging.info("Mixer pré-configurado: %d Hz, buffer de %d amostras (~%.1f ms).",
+                 AUDIO_FREQUENCY, AUDIO_BUFFER_SIZE, AUDIO_BUFFER_SIZE / AUDIO_FREQUENCY * 1000)
+
+def timer_sound(name):
+    definition = extra_timers.get(name)
+    if definition is not None and definition.sound is not None:
+        return definition.sound
+    return sound_to_play
+
+def set_ui_delay(delay):
+    """Mostra no spinbox um delay definido fora da UI (a trace do spinbox republica o mesmo valor)."""
+    if ui_root and ui_delay_var and ui_root.winfo_exists():
+        schedule_ui(0, ui_delay_var.set, f"{delay:.1f}")
+    publish_engine_status()
+
+def auto_apply_suggested_delay():
+    """Com o ajuste automático ligado, troca o delay pelo sugerido quando a diferença passa do mínimo."""
+    settings = engine_state.snapshot()
+    if not settings.auto_delay:
+        return
+    suggestion = cycle_analytics.suggested_delay()
+    if suggestion is None or abs(suggestion - settings.delay) < CYCLE_AUTO_APPLY_MIN_CHANGE:
+        return
+    engine_state.update(delay=suggestion)
+    set_ui_delay(suggestion)
+    update_main_status_ui(f"🔧 Delay ajustado automaticamente: {settings.delay:.1f}s → {suggestion:.1f}s")
+    logging.info("Ajuste automático do delay: %.2fs -> %.2fs (%s)", settings.delay, suggestion, cycle_analytics.snapshot())
+
+def handle_timer_press(press, cycle_pressed_at):
+    """Trata um press entregue pelo scheduler: (re)arma o timer vinculado.
+
+    Usado pela thread do timer e pelo replay (replay_recording), por isso só fala com o
+    engine através dos globais (timer_scheduler, engine_state, ...).
+    """
+    name = press.timer_name
+    definition = extra_timers.get(name)
+    if input_recorder is not None:
+        input_recorder.record_press(press, get_active_delay_seconds() if definition is None else definition.delay)
+    if engine_state.snapshot().paused: # Se pausado, ignora o press (não inicia nem reseta o timer)
+        engine_counters.ignored_timer += 1
+        logging.info("timer_and_sound_task: Aplicação pausada, press ignorado.")
+        update_main_status_ui("Pausado. Pressione Continuar.")
+        return
+    if name != MAIN_TIMER_NAME and definition is None:
+        logging.warning("Press para timer desconhecido '%s' ignorado.", name)
+        return
+    if definition is None:
+        cycle_analytics.record_press(press.pressed_at if press.pressed_at is not None else press.signalled_at)
+        auto_apply_suggested_delay()
+    is_reset = timer_scheduler.is_armed(name)
+    settings = engine_state.snapshot()
+    delay_to_use = settings.delay if definition is None else definition.delay
+    cycle_pressed_at[name] = press.pressed_at
+    cycle = timer_scheduler.arm(delay_to_use, armed_at=press.pressed_at, name=name, cues=settings.prewarning)
+    pipeline_latency.record("dispatch", timer_scheduler.now() - press.signalled_at)
+    engine_counters.add(engine_counters.resets if is_reset else engine_counters.starts, name)
+    publish_timer_event("reset" if is_reset else "started", timer_scheduler.deadline(name), delay_to_use, name=name)
+    timer_label = "timer" if name == MAIN_TIMER_NAME else f"timer '{name}'"
+    if is_reset:
+        update_main_status_ui(f"Botão Reset! Novo {timer_label} de {delay_to_use:.1f}s.")
+        logging.info(LOG_MSG_TIMER_RESET, name, delay_to_use, cycle)
+    else:
+        update_main_status_ui(f"Botão! {timer_label.capitalize()} de {delay_to_use:.1f}s iniciado.")
+        logging.info(LOG_MSG_TIMER_STARTED, name, delay_to_use, cycle)
+
+def handle_timer_cue(name, offset):
+    """Aviso de T-`offset` do timer `name`: toca o tick pré-carregado no CueBank."""
+    engine_counters.cues += 1
+    sound = cue_bank.for_offset(offset)
+    if sound is not None and engine_state.snapshot().sound_enabled:
+        audio_worker.play(sound)
+    logging.debug("Aviso do timer '%s': T-%.1fs.", name, offset)
+
+def handle_timer_fire(name, fired_at, cycle_pressed_at):
+    """Trata o disparo do timer `name`: entrega o som primeiro, depois a contabilidade."""
+    should_play_sound = engine_state.snapshot().sound_enabled
+    sound = timer_sound(name)
+    if should_play_sound and sound: # Entrega o som primeiro; o resto é contabilidade
+        pressed_at = cycle_pressed_at.get(name)
+        expected_at = None
+        if pressed_at is not None:
+            expected_at = pressed_at + timer_scheduler.duration(name) + timer_scheduler.paused_time(name)
+        audio_worker.play(sound, fired_at, expected_at)
+
+    if input_recorder is not None:
+        input_recorder.record_fire(name, fired_at, fired_at - timer_scheduler.last_fired_deadline)
+    pipeline_latency.record("firing", timer_scheduler.last_firing_error)
+    engine_counters.add(engine_counters.fires, name)
+    if name == MAIN_TIMER_NAME:
+        cycle_analytics.record_fire(fired_at)
+    record_history("fire", name)
+    publish_timer_event("fired", duration=timer_scheduler.duration(name), name=name)
+    logging.info(LOG_MSG_TIMER_FIRED, name, timer_scheduler.last_fired_cycle, timer_scheduler.last_firing_error * 1000)
+    if should_play_sound and sound:
+        update_main_status_ui("Timer finalizado. Tocando som..." if name == MAIN_TIMER_NAME else f"Timer '{name}' finalizado. Tocando som...")
+    elif not sound:
+        update_main_status_ui("Nenhum som para tocar.")
+        logging.warning("Tentativa de tocar som, mas sound_to_play é None.")
+    else:
+        update_main_status_ui("Som desabilitado.")
+        logging.info("Som desabilitado pela UI.")
+    update_main_status_ui("Aguardando Botão de Ação...")
+
+def timer_and_sound_task():
+    global sound_to_play, app_running
+    logging.info("Thread timer_and_sound_task iniciada.")
+    update_main_status_ui("Aguardando Botão de Ação...")
+    cycle_pressed_at = {} # nome do timer -> instante do press que armou o ciclo atual
+    try:
+        while app_running: # Loop principal da thread, continua mesmo se pausado
+            outcome = timer_scheduler.wait()
+            if outcome == TimerScheduler.STOP or not app_running:
+                logging.debug("timer_and_sound_task: scheduler parado ou app_running é False, saindo do loop.")
+                break
+            if outcome == TimerScheduler.PRESS:
+                handle_timer_press(timer_scheduler.last_press, cycle_pressed_at)
+            elif outcome == TimerScheduler.CUE:
+                handle_timer_cue(*timer_scheduler.last_cue)
+            else: # outcome == FIRE
+                handle_timer_fire(timer_scheduler.last_fired_timer, timer_scheduler.now(), cycle_pressed_at)
+    except Exception as e_thread:
+        logging.critical("Erro fatal na thread do timer: %s", e_thread, exc_info=True)
+        update_main_status_ui(f"Erro na thread do timer: {e_thread}")
+    finally:
+        stall_watchdog.idle("timer") # Encerrada: deixa de ser vigiada
+        logging.info("Thread timer_and_sound_task finalizada. Erro de disparo: %s", timer_scheduler.firing_error_stats())
+        if app_running: update_main_status_ui("Thread do timer parada.")
+
+
+def pause_engine(at=None):
+    """Pausa o engine: input bloqueado, timers congelados. Retorna {nome: restante congelado}.
+
+    `at` é o instante da pausa no relógio do scheduler (padrão: agora); o replay passa o gravado.
+    """
+    at = timer_scheduler.now() if at is None else at
+    engine_state.update(paused=True)
+    wake_pygame_loop() # Entra no bloqueio da pausa na hora, sem esperar o timeout do event.wait
+    record_history("pause")
+    cycle_analytics.break_sequence()
+    if input_recorder is not None:
+        input_recorder.record_event(InputRecorder.PAUSE, at)
+    return timer_scheduler.pause(at) # O mesmo instante gravado: o replay reproduz os deadlines exatos
+
+def resume_engine(at=None):
+    """Retoma o engine. Retorna {nome: restante} dos timers retomados."""
+    at = timer_scheduler.now() if at is None else at
+    engine_state.update(paused=False)
+    wake_pygame_loop()
+    record_history("resume")
+    if input_recorder is not None:
+        input_recorder.record_event(InputRecorder.RESUME, at)
+    return timer_scheduler.resume(at) # Recalcula os deadlines e acorda a thread do timer
+
+
+class VirtualClock:
+    """Relógio injetável no TimerScheduler: só anda quando alguém chama advance_to()."""
+
+    def __init__(self, start=0.0):
+        self._now = start
+
+    def __call__(self):
+        return self._now
+
+    def advance_to(self, instant):
+        self._now = max(self._now, instant)
+
+
+RecordedEvent = collections.namedtuple("RecordedEvent", "at kind timer_name button value")
+
+class InputRecorder:
+    """Grava o fluxo de input do engine num arquivo binário compacto para replay_recording().
+
+    Formato: INPUT_RECORDING_MAGIC, versão (B), tamanho do cabeçalho (I) e um cabeçalho JSON
+    (configuração do engine e tabela de nomes de timer), seguido de registros fixos de 16 bytes
+    `<dBBHf`: instante (s desde o início da gravação, relógio do scheduler), tipo, índice do
+    timer, botão do controle (NO_BUTTON pela API e em pausa/retomada) e valor: o delay usado no
+    press, ou o erro de disparo (disparo - deadline) no disparo. Os disparos também são gravados,
+    para o replay conferir os deadlines que ele reproduz (instante - erro) contra os da sessão original.
+    """
+    PRESS = 1
+    FIRE = 2
+    PAUSE = 3
+    RESUME = 4
+    NO_BUTTON = 0xFFFF # Botão de registros sem botão do controle (lido de volta como None)
+    _RECORD = struct.Struct("<dBBHf")
+    _PREAMBLE = struct.Struct("<BI")
+    FLUSH_EVERY = 64 # Registros entre flushes (uma queda perde no máximo isso)
+
+    def __init__(self, stream, origin, settings=None, timers=None):
+        self._stream = stream
+        self._origin = origin
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.events = 0
+        settings = settings or engine_state.snapshot()
+        timers = extra_timers if timers is None else timers
+        self._timer_names = [MAIN_TIMER_NAME] + [name for name in timers if name != MAIN_TIMER_NAME]
+        self._timer_index = {name: index for index, name in enumerate(self._timer_names)}
+        header = json.dumps({
+            "recorded_at": time.time(), "delay": settings.delay, "action_button": settings.action_button,
+            "auto_delay": settings.auto_delay, "paused": settings.paused, "prewarning": list(settings.prewarning),
+            "timer_names": self._timer_names,
+            "timers": {name: {"button": definition.button, "delay": definition.delay}
+                       for name, definition in timers.items()},
+        }).encode("utf-8")
+        stream.write(INPUT_RECORDING_MAGIC + self._PREAMBLE.pack(INPUT_RECORDING_VERSION, len(header)) + header)
+
+    @classmethod
+    def open(cls, path, origin):
+        return cls(open(path, "wb"), origin)
+
+    def record_press(self, press, delay):
+        at = press.pressed_at if press.pressed_at is not None else press.signalled_at
+        self.record_event(self.PRESS, at, press.timer_name, delay, press.button)
+
+    def record_fire(self, timer_name, fired_at, error):
+        self.record_event(self.FIRE, fired_at, timer_name, error)
+
+    def record_event(self, kind, at, timer_name=MAIN_TIMER_NAME, value=0.0, button=None):
+        index = self._timer_index.get(timer_name)
+        if index is None:
+            return # timer desconhecido no início da gravação: o replay não saberia reproduzi-lo
+        packed = self._RECORD.pack(at - self._origin, kind, index, self.NO_BUTTON if button is None else button, value)
+        with self._lock:
+            if self._stream.closed:
+                return
+            self._stream.write(packed)
+            self.events += 1
+            self._pending += 1
+            if self._pending >= self.FLUSH_EVERY:
+                self._stream.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if not self._stream.closed:
+                self._stream.flush()
+                if not isinstance(self._stream, io.BytesIO):
+                    self._stream.close()
+
+    def read_back(self):
+        """(cabeçalho, [RecordedEvent]) gravados até aqui numa gravação em memória (io.BytesIO), ex: o replay em tempo real."""
+        with self._lock:
+            data = self._stream.getvalue()
+        return self.read(io.BytesIO(data))
+
+    @classmethod
+    def read(cls, stream):
+        """(cabeçalho, [RecordedEvent]) de uma gravação. Levanta ValueError se o arquivo não for uma."""
+        magic = stream.read(len(INPUT_RECORDING_MAGIC))
+        preamble = stream.read(cls._PREAMBLE.size)
+        if magic != INPUT_RECORDING_MAGIC or len(preamble) != cls._PREAMBLE.size:
+            raise ValueError("não é uma gravação de input do FarmHelper")
+        version, header_size = cls._PREAMBLE.unpack(preamble)
+        if version != INPUT_RECORDING_VERSION:
+            raise ValueError(f"versão de gravação {version} não suportada")
+        header = json.loads(stream.read(header_size).decode("utf-8"))
+        names = header["timer_names"]
+        body = stream.read()
+        usable = len(body) - len(body) % cls._RECORD.size # registro final truncado (queda) é ignorado
+        events = [RecordedEvent(at, kind, names[index], None if button == cls.NO_BUTTON else button, value)
+                  for at, kind, index, button, value in cls._RECORD.iter_unpack(body[:usable])]
+        return header, events
+
+
+def compare_fire_times(expected, replayed, tolerance=REPLAY_TOLERANCE_SECONDS):
+    """Compara os deadlines dos disparos gravados e reproduzidos ([(timer, deadline)]) em ordem, timer a timer.
+
+    Compara deadlines, não os instantes de disparo: esses incluem o atraso do SO para acordar a
+    thread do timer, que varia de sessão para sessão; a tolerância só cobre ruído de float.
+    """
+    by_timer = collections.defaultdict(lambda: ([], []))
+    for name, at in expected:
+        by_timer[name][0].append(at)
+    for name, at in replayed:
+        by_timer[name][1].append(at)
+    differences = []
+    count_mismatch = {}
+    for name, (recorded_times, replayed_times) in by_timer.items():
+        if len(recorded_times) != len(replayed_times):
+            count_mismatch[name] = (len(recorded_times), len(replayed_times))
+        differences.extend(abs(a - b) for a, b in zip(recorded_times, replayed_times))
+    outside = sum(1 for difference in differences if difference > tolerance)
+    return {
+        "recorded_fires": len(expected), "replayed_fires": len(replayed),
+        "count_mismatch": count_mismatch, "outside_tolerance": outside, "tolerance": tolerance,
+        "max_difference": max(differences) if differences else 0.0,
+        "mean_difference": sum(differences) / len(differences) if differences else 0.0,
+        "ok": not count_mismatch and not outside,
+    }
+
+def replay_recording(path, realtime=False, tolerance=REPLAY_TOLERANCE_SECONDS):
+    """Reproduz uma gravação de --record-input no engine e confere os disparos contra os gravados.
+
+    Acelerado (padrão): o TimerScheduler roda num VirtualClock e esta thread o dirige sozinha,
+    saltando de evento em evento (uma sessão de uma hora leva frações de segundo). Em tempo
+    real, os presses são entregues no relógio de verdade para a thread do timer, como na sessão
+    original. Troca os globais do engine (sem som e sem histórico) e os restaura ao terminar,
+    mas não deve rodar com o engine do app ativo (--replay-input usa um processo dedicado).
+    """
+    with open(path, "rb") as f:
+        header, events = InputRecorder.read(f)
+    saved = {name: globals()[name] for name in REPLAY_SWAPPED_GLOBALS}
+    try:
+        return _replay_events(header, events, realtime, tolerance)
+    finally:
+        globals().update(saved)
+
+# Globais que replay_recording troca pelos da gravação e restaura no fim
+REPLAY_SWAPPED_GLOBALS = ("timer_scheduler", "engine_state", "cycle_analytics", "pipeline_latency", "engine_counters",
+                          "extra_timers", "input_recorder", "history_store", "app_running", "timer_sound_thread_global")
+
+def _replay_events(header, events, realtime, tolerance):
+    global timer_scheduler, engine_state, cycle_analytics, pipeline_latency, engine_counters, extra_timers, input_recorder
+    global history_store, app_running, timer_sound_thread_global
+    extra_timers = {name: TimerDefinition(name, options["button"], options["delay"], None)
+                    for name, options in header["timers"].items()}
+    engine_state = EngineState(delay=header["delay"], action_button=header["action_button"], paused=header["paused"],
+                               sound_enabled=False, volume=0.0, auto_delay=header["auto_delay"],
+                               prewarning=tuple(header["prewarning"]))
+    cycle_analytics = CycleAnalytics()
+    pipeline_latency = LatencyTracker()
+    engine_counters = EngineCounters()
+    history_store = None
+    recorded_fires = [event for event in events if event.kind == InputRecorder.FIRE]
+    expected = [(event.timer_name, event.at - event.value) for event in recorded_fires]
+    started = time.perf_counter()
+
+    if realtime:
+        timer_scheduler = TimerScheduler()
+        origin = timer_scheduler.now()
+        input_recorder = InputRecorder(io.BytesIO(), origin)
+        app_running = True
+        timer_sound_thread_global = threading.Thread(target=timer_and_sound_task, name="TimerSoundThread", daemon=True)
+        timer_sound_thread_global.start()
+        for event in events:
+            if event.kind == InputRecorder.FIRE:
+                continue
+            wait = origin + event.at - timer_scheduler.now()
+            if wait > 0:
+                time.sleep(wait)
+            apply_recorded_event(event, origin + event.at)
+        last_deadline = timer_scheduler.next_deadline()
+        while last_deadline is not None: # Espera os timers ainda armados dispararem
+            time.sleep(max(0.0, last_deadline - timer_scheduler.now()) + 0.01)
+            last_deadline = timer_scheduler.next_deadline()
+        app_running = False
+        timer_scheduler.stop()
+        timer_sound_thread_global.join(timeout=1.0)
+        recorder, input_recorder = input_recorder, None
+        replayed = [(event.timer_name, event.at - event.value) for event in recorder.read_back()[1]
+                    if event.kind == InputRecorder.FIRE]
+    else:
+        clock = VirtualClock()
+        timer_scheduler = TimerScheduler(clock=clock)
+        input_recorder = None
+        replayed = []
+        cycle_pressed_at = {}
+
+        def drain():
+            while True:
+                outcome = timer_scheduler.poll()
+                if outcome is None or outcome == TimerScheduler.STOP:
+                    return
+                if outcome == TimerScheduler.PRESS:
+                    handle_timer_press(timer_scheduler.last_press, cycle_pressed_at)
+                elif outcome == TimerScheduler.CUE:
+                    handle_timer_cue(*timer_scheduler.last_cue)
+                else:
+                    replayed.append((timer_scheduler.last_fired_timer, timer_scheduler.last_fired_deadline))
+                    handle_timer_fire(timer_scheduler.last_fired_timer, clock(), cycle_pressed_at)
+
+        for event in events + [None]: # None: dispara o que ainda estiver armado no fim
+            while True: # Dispara tudo o que vence antes do próximo evento
+                deadline = timer_scheduler.next_deadline()
+                if deadline is None or (event is not None and deadline > event.at):
+                    break
+                clock.advance_to(deadline)
+                drain()
+            if event is None:
+                break
+            clock.advance_to(event.at)
+            if event.kind != InputRecorder.FIRE:
+                apply_recorded_event(event, event.at)
+                drain()
+
+    report = compare_fire_times(expected, replayed, tolerance)
+    jitter = [event.value for event in recorded_fires]
+    report.update({"recorded_error_mean": sum(jitter) / len(jitter) if jitter else 0.0,
+                   "recorded_error_max": max(jitter, key=abs) if jitter else 0.0})
+    report.update({"events": len(events), "session_seconds": events[-1].at if events else 0.0,
+                   "replay_seconds": time.perf_counter() - started, "mode": "tempo real" if realtime else "acelerado"})
+    return report
+
+def apply_recorded_event(event, at):
+    """Entrega um evento gravado ao engine (press, pausa ou retomada) no instante `at` do scheduler."""
+    if event.kind == InputRecorder.PRESS:
+        if event.timer_name == MAIN_TIMER_NAME:
+            engine_state.update(delay=event.value, auto_delay=False) # O delay gravado já inclui ajustes da sessão
+        timer_scheduler.signal_press(at, event.timer_name, pressed_at=at, button=event.button)
+    elif event.kind == InputRecorder.PAUSE:
+        pause_engine(at)
+    elif event.kind == InputRecorder.RESUME:
+        resume_engine(at)
+
+def format_replay_report(report):
+    lines = [f"Replay {report['mode']}: {report['events']} eventos, sessão de {format_duration(report['session_seconds'])} "
+             f"reproduzida em {report['replay_seconds']:.3f}s",
+             f"Disparos: {report['recorded_fires']} gravados, {report['replayed_fires']} reproduzidos; "
+             f"diferença média {report['mean_difference'] * 1000:.3f} ms, máxima {report['max_difference'] * 1000:.3f} ms "
+             f"(tolerância {report['tolerance'] * 1000:.1f} ms) entre deadlines",
+             f"Erro de disparo na gravação: médio {report['recorded_error_mean'] * 1000:.3f} ms, "
+             f"máximo {report['recorded_error_max'] * 1000:.3f} ms"]
+    for name, (recorded, replayed) in report["count_mismatch"].items():
+        lines.append(f"Timer '{name}': {recorded} disparos gravados, {replayed} reproduzidos")
+    if report["outside_tolerance"]:
+        lines.append(f"{report['outside_tolerance']} disparo(s) fora da tolerância")
+    lines.append("OK: disparos conferem com a gravação" if report["ok"] else "FALHA: disparos divergem da gravação")
+    return "\n".join(lines)
+
+
+# --- Análise do log (--analyze-log) ---
+
+def log_files_in_order(path):
+    """O log e os backups da rotação (path.N, ..., path.1, path), do mais antigo para o mais novo."""
+    backups = []
+    while os.path.exists(f"{path}.{len(backups) + 1}"):
+        backups.append(f"{path}.{len(backups) + 1}")
+    return backups[::-1] + ([path] if os.path.exists(path) else [])
+
+
+def log_message_regex(message_format, *fields):
+    """Regex (bytes) de uma mensagem LOG_MSG_*: o texto literal escapado e cada campo % trocado, em ordem,
+    por um de `fields`. Com menos `fields` que campos, a regex termina antes do primeiro campo sem regex."""
+    parts = re.split(r"%[-+ #0]*\d*(?:\.\d+)?[sdf]", message_format)
+    if len(fields) >= len(parts):
+        raise ValueError(f"mais regexes que campos em {message_format!r}")
+    pattern = "".join(re.escape(part) + field for part, field in zip(parts, fields)) + re.escape(parts[len(fields)])
+    return pattern.encode("utf-8")
+
+class LogScanner:
+    """Extrai do log os registros do ritmo de farm sem carregar o arquivo: press, início, reset,
+    disparo, pausa/retomada e início de sessão.
+
+    Lê em blocos de LOG_ANALYSIS_BLOCK_BYTES e procura cada tipo de registro com uma regex que
+    começa por um literal (o re só acelera a busca nesse caso; uma alternância entre os tipos
+    deixaria a varredura ~10x mais lenta). Os registros vão para colunas compactas (array), na
+    ordem do log. Cada início de sessão fecha a anterior com um registro END no instante da
+    última linha dela, assim como o fim do último arquivo.
+    """
+    SESSION, END, PRESS, START, RESET, FIRE, PAUSE, RESUME = range(8)
+    KIND_NAMES = ("sessao", "fim", "press", "inicio", "reset", "disparo", "pausa", "retomada")
+    STAMP_BYTES = 23 # "2026-10-17 00:12:47,372" (asctime do LOG_FORMAT, hora local)
+    SEPARATOR = b" - " + LOG_SESSION_SEPARATOR.encode("ascii") # Linha logada logo antes do início de cada sessão
+    TIMER_PATTERN = re.compile(
+        log_message_regex(LOG_MSG_TIMER_PREFIX, "([^']*)") + b"(?:"
+        + b"|".join(log_message_regex(message_format[len(LOG_MSG_TIMER_PREFIX):], *fields) for message_format, fields in (
+            (LOG_MSG_TIMER_STARTED, (r"([\d.]+)", r"\d+")),
+            (LOG_MSG_TIMER_RESET, (r"([\d.]+)", r"\d+")),
+            (LOG_MSG_TIMER_FIRED, (r"\d+", r"(-?[\d.]+)")))) + b")")
+    PATTERNS = ( # (tipo, regex); o tipo do TIMER_PATTERN sai dos grupos
+        (PRESS, re.compile(log_message_regex(LOG_MSG_PRESS, r"[^,]*", r"([^']*)"))), # A origem do press fica de fora
+        (FIRE, TIMER_PATTERN),
+        (PAUSE, re.compile(log_message_regex(LOG_MSG_INPUT_PREFIX) + b"(?:(" + log_message_regex(LOG_MSG_INPUT_PAUSED[len(LOG_MSG_INPUT_PREFIX):])
+                           + b")|" + log_message_regex(LOG_MSG_INPUT_RESUMED[len(LOG_MSG_INPUT_PREFIX):]) + b")")),
+        (SESSION, re.compile(log_message_regex(LOG_MSG_SESSION_START))),
+        (SESSION, re.compile(log_message_regex(LOG_MSG_ENGINE_STARTED, r"\d+"))), # A UI loga outro texto, com ", bloco ..."
+    )
+
+    def __init__(self):
+        self.kinds = array.array("b")
+        self.timers = array.array("h")  # Índice em timer_names (-1 = registro sem timer)
+        self.values = array.array("d")  # Delay (início/reset, s) ou erro de disparo (ms); NaN nos outros
+        self.stamps = bytearray()       # STAMP_BYTES por registro
+        self.timer_names = []
+        self._timer_index = {}
+        self.bytes_read = 0
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def scan(self, paths):
+        last_stamp = None # Última linha com timestamp lida (fim da sessão em andamento)
+        for path in paths:
+            with open(path, "rb") as stream:
+                carry = b""
+                while True:
+                    chunk = stream.read(LOG_ANALYSIS_BLOCK_BYTES)
+                    block = carry + chunk
+                    if not block:
+                        break
+                    cut = block.rfind(b"\n") + 1 if chunk else len(block) # Sem chunk: a última linha não tem \n
+                    carry = block[cut:]
+                    if cut:
+                        last_stamp = self._scan_block(block, cut, last_stamp)
+                    self.bytes_read += len(chunk)
+        if last_stamp is not None and len(self):
+            self._add(self.END, -1, math.nan, last_stamp)
+        return self
+
+    def _timer(self, name):
+        index = self._timer_index.get(name)
+        if index is None:
+            index = self._timer_index[name] = len(self.timer_names)
+            self.timer_names.append(name.decode("utf-8", "replace"))
+        return index
+
+    def _add(self, kind, timer, value, stamp):
+        self.kinds.append(kind)
+        self.timers.append(timer)
+        self.values.append(value)
+        self.stamps += stamp
+
+    @classmethod
+    def _is_stamp(cls, stamp):
+        return len(stamp) == cls.STAMP_BYTES and stamp[4] == 45 and stamp[19] == 44 # "-" da data, "," dos ms
+
+    def _stamp_before(self, block, position, max_lines=64):
+        """Timestamp da última linha antes de `position` que tem um (linhas de traceback não têm) e não é o separador de sessão."""
+        end = position
+        for _ in range(max_lines):
+            if end <= 0:
+                return None
+            start = block.rfind(b"\n", 0, end - 1) + 1
+            stamp = block[start:start + self.STAMP_BYTES]
+            if self._is_stamp(stamp) and not block.endswith(self.SEPARATOR, start, end - 1):
+                return stamp
+            end = start
+        return None
+
+    def _scan_block(self, block, cut, last_stamp):
+        found = [(match.start(), kind, match) for kind, pattern in self.PATTERNS for match in pattern.finditer(block, 0, cut)]
+        found.sort(key=lambda item: item[0])
+        for position, kind, match in found:
+            if block[position - 3:position] != b" - ": # Texto citado no meio de outra mensagem
+                continue
+            line_start = block.rfind(b"\n", 0, position) + 1
+            stamp = block[line_start:line_start + self.STAMP_BYTES]
+            if not self._is_stamp(stamp):
+                continue
+            if kind == self.SESSION:
+                previous = self._stamp_before(block, line_start) or last_stamp
+                if previous is not None and len(self):
+                    self._add(self.END, -1, math.nan, previous)
+                self._add(kind, -1, math.nan, stamp)
+            elif kind == self.PRESS:
+                self._add(kind, self._timer(match.group(1)), math.nan, stamp)
+            elif kind == self.PAUSE:
+                self._add(self.PAUSE if match.group(1) is not None else self.RESUME, -1, math.nan, stamp)
+            else:
+                name, started, reset, error = match.groups()
+                if started is not None:
+                    self._add(self.START, self._timer(name), float(started), stamp)
+                elif reset is not None:
+                    self._add(self.RESET, self._timer(name), float(reset), stamp)
+                else:
+                    self._add(self.FIRE, self._timer(name), float(error), stamp)
+        return self._stamp_before(block, cut) or last_stamp
+
+    def seconds(self):
+        """Timestamps dos registros em segundos (float64), vetorizado a partir dos bytes do asctime."""
+        import numpy as np
+        import datetime
+        raw = np.frombuffer(bytes(self.stamps), dtype=np.uint8).reshape(-1, self.STAMP_BYTES)
+        digits = raw.astype(np.int64) - ord("0")
+        dates, day_index = np.unique(np.ascontiguousarray(raw[:, :10]).view("S10").ravel(), return_inverse=True)
+        days = np.array([datetime.date.fromisoformat(date.decode("ascii")).toordinal() for date in dates], dtype=np.int64)
+        return (days[day_index] * 86400
+                + (digits[:, 11] * 10 + digits[:, 12]) * 3600 + (digits[:, 14] * 10 + digits[:, 15]) * 60
+                + digits[:, 17] * 10 + digits[:, 18]
+                + (digits[:, 20] * 100 + digits[:, 21] * 10 + digits[:, 22]) / 1000.0)
+
+
+def _distribution(values):
+    """Resumo de um array NumPy: contagem, média, desvio e quantis (None se vazio)."""
+    import numpy as np
+    if not len(values):
+        return None
+    p10, p50, p90, p95, p99 = np.percentile(values, (10, 50, 90, 95, 99))
+    return {"count": int(len(values)), "mean": float(values.mean()), "stdev": float(values.std()),
+            "min": float(values.min()), "p10": float(p10), "p50": float(p50), "p90": float(p90),
+            "p95": float(p95), "p99": float(p99), "max": float(values.max())}
+
+def analyze_log(paths, csv_path=None, max_gap=CYCLE_MAX_GAP_SECONDS):
+    """Varre os logs (LogScanner) e calcula, com NumPy, o relatório das sessões.
+
+    Por timer: intervalo entre presses (ritmo; descarta os que atravessam pausa ou sessão e os
+    acima de `max_gap`, como o CycleAnalytics), reação (disparo -> press seguinte), taxa de reset
+    e erro de disparo. Das sessões: duração, tempo pausado e tempo ativo. Com `csv_path`, grava
+    um registro por linha (com o intervalo de cada press que fechou um ciclo).
+    """
+    import numpy as np
+    started = time.perf_counter()
+    scanner = LogScanner().scan(paths)
+    scanned = time.perf_counter()
+    report = {"files": list(paths), "bytes": scanner.bytes_read, "records": len(scanner), "sessions": 0,
+              "span_seconds": 0.0, "paused_seconds": 0.0, "pauses": 0, "active_seconds": 0.0, "timers": {},
+              "scan_seconds": scanned - started}
+    if not len(scanner):
+        report["analysis_seconds"] = 0.0
+        return report
+
+    kinds = np.frombuffer(scanner.kinds, dtype=np.int8)
+    timers = np.frombuffer(scanner.timers, dtype=np.int16)
+    values = np.frombuffer(scanner.values, dtype=np.float64)
+    t = scanner.seconds()
+    session = np.cumsum(kinds == LogScanner.SESSION)
+    segment = np.cumsum(np.isin(kinds, (LogScanner.SESSION, LogScanner.PAUSE, LogScanner.RESUME))) # Ciclos não atravessam
 
-timer_event = threading.Event()
-last_action_press_time = 0.0
-sound_to_play = None
-joystick = None
-pygame_running = True # Controla o loop do pygame em si
-app_running = True    # Controla o estado geral da aplicação (rodando vs fechando)
-app_paused = False    # --- NOVO: Estado de pausa da aplicação ---
+    boundaries = np.flatnonzero(np.diff(session)) + 1
+    starts = np.concatenate(([0], boundaries))
+    report["sessions"] = len(starts)
+    report["span_seconds"] = float((np.maximum.reduceat(t, starts) - np.minimum.reduceat(t, starts)).sum())
+    paused_since = None
+    for index in np.flatnonzero(np.isin(kinds, (LogScanner.SESSION, LogScanner.END, LogScanner.PAUSE, LogScanner.RESUME))):
+        if kinds[index] == LogScanner.PAUSE and paused_since is None:
+            paused_since = t[index]
+            report["pauses"] += 1
+        elif kinds[index] != LogScanner.PAUSE and paused_since is not None: # Retomada ou fim da sessão
+            report["paused_seconds"] += float(t[index] - paused_since)
+            paused_since = None
+    report["active_seconds"] = report["span_seconds"] - report["paused_seconds"]
+    active_hours = report["active_seconds"] / 3600.0
 
-# --- Variáveis de Controle de Captura de Botão ---
-capturing_button_mode = False
-target_button_index = ACTION_BUTTON_INDEX_DEFAULT
+    intervals_column = np.full(len(kinds), np.nan)
+    for timer_index, name in enumerate(scanner.timer_names):
+        of_timer = timers == timer_index
+        presses = np.flatnonzero(of_timer & (kinds == LogScanner.PRESS))
+        press_times = t[presses]
+        gaps = np.diff(press_times)
+        same_segment = segment[presses][1:] == segment[presses][:-1]
+        closes_cycle = same_segment & (gaps <= max_gap)
+        intervals_column[presses[1:][closes_cycle]] = gaps[closes_cycle]
 
-# --- Variáveis Globais para a UI ---
-ui_root = None
-ui_status_var = None
-ui_delay_var = None
-ui_controller_status_var = None
-ui_time_remaining_var = None
-ui_progress_var = None
-ui_program_runtime_var = None
-ui_action_press_count_var = None
-ui_action_button_display_var = None
+        fire_times = t[of_timer & (kinds == LogScanner.FIRE)]
+        reactions = np.empty(0)
+        if len(fire_times) and len(presses) > 1:
+            last_fire = np.searchsorted(fire_times, press_times[1:], side="right") - 1
+            has_fire = last_fire >= 0
+            fired_at = fire_times[np.maximum(last_fire, 0)]
+            valid = closes_cycle & has_fire & (fired_at >= press_times[:-1]) # O disparo é do ciclo anterior
+            reactions = press_times[1:][valid] - fired_at[valid]
 
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-        logging.debug(f"Bundle, base_path: {base_path}")
-    except Exception:
-        base_path = os.path.abspath(os.path.dirname(__file__))
-        logging.debug(f"Script, base_path: {base_path}")
-    path_to_resource = os.path.join(base_path, relative_path)
-    logging.debug(f"Path to resource '{relative_path}': {path_to_resource}")
-    return path_to_resource
-
-logging.info("Prestes a chamar resource_path para SOUND_FILE_PATH.")
-SOUND_FILE_PATH = resource_path("beep.wav")
-logging.info(f"SOUND_FILE_PATH definido como: {SOUND_FILE_PATH}")
+        start_count = int(np.count_nonzero(of_timer & (kinds == LogScanner.START)))
+        reset_count = int(np.count_nonzero(of_timer & (kinds == LogScanner.RESET)))
+        delays = values[of_timer & np.isin(kinds, (LogScanner.START, LogScanner.RESET))]
+        report["timers"][name] = {
+            "presses": int(len(presses)), "starts": start_count, "resets": reset_count, "fires": int(len(fire_times)),
+            "reset_rate": reset_count / (start_count + reset_count) if start_count + reset_count else None,
+            "resets_per_hour": reset_count / active_hours if active_hours > 0 else None,
+            "delay_median": float(np.median(delays)) if len(delays) else None,
+            "cycle_seconds": _distribution(gaps[closes_cycle]),
+            "reaction_seconds": _distribution(reactions),
+            "firing_error_ms": _distribution(values[of_timer & (kinds == LogScanner.FIRE)]),
+        }
+    if csv_path:
+        write_log_analysis_csv(csv_path, scanner, session, intervals_column)
+    report["analysis_seconds"] = time.perf_counter() - scanned
+    return report
 
+def write_log_analysis_csv(path, scanner, session, intervals):
+    """Um registro por linha: instante, sessão, tipo, timer, delay (s), erro de disparo (ms), intervalo do ciclo (s)."""
+    names = scanner.timer_names
+    stamps = bytes(scanner.stamps)
+    width = LogScanner.STAMP_BYTES
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("timestamp,sessao,evento,timer,delay_s,erro_disparo_ms,intervalo_s\n")
+        for index, (kind, timer, value, session_number, interval) in enumerate(
+                zip(scanner.kinds, scanner.timers, scanner.values, session.tolist(), intervals.tolist())):
+            f.write(f"{stamps[index * width:(index + 1) * width].decode('ascii').replace(',', '.')},{session_number}," # ms com ponto
+                    f"{LogScanner.KIND_NAMES[kind]},{names[timer] if timer >= 0 else ''},"
+                    f"{value if kind in (LogScanner.START, LogScanner.RESET) else ''},"
+                    f"{value if kind == LogScanner.FIRE else ''},"
+                    f"{'' if interval != interval else f'{interval:.3f}'}\n") # interval != interval: NaN
 
-def update_main_status_ui(message):
-    if ui_root and ui_status_var and ui_root.winfo_exists():
-        ui_root.after(0, lambda: ui_status_var.set(message))
-    logging.info(f"Status UI Principal: {message}")
+def format_log_analysis(report):
+    megabytes = report["bytes"] / (1024 * 1024)
+    lines = [f"Log: {len(report['files'])} arquivo(s), {megabytes:.1f} MB, {report['records']} registros "
+             f"(varredura {report['scan_seconds']:.2f}s, {megabytes / max(report['scan_seconds'], 1e-9):.0f} MB/s; "
+             f"análise {report['analysis_seconds']:.2f}s)"]
+    if not report["records"]:
+        lines.append("Nenhum registro de press, timer ou pausa encontrado.")
+        return "\n".join(lines)
+    lines.append(f"Sessões: {report['sessions']} | Duração: {format_duration(report['span_seconds'])} | "
+                 f"Pausado: {format_duration(report['paused_seconds'])} em {report['pauses']} pausa(s) | "
+                 f"Ativo: {format_duration(report['active_seconds'])}")
+    for name, stats in report["timers"].items():
+        lines.append(f"Timer '{name}': {stats['presses']} presses, {stats['starts']} inícios, {stats['resets']} resets, "
+                     f"{stats['fires']} disparos"
+                     + (f", delay mediano {stats['delay_median']:.2f}s" if stats["delay_median"] is not None else ""))
+        if stats["reset_rate"] is not None:
+            per_hour = f", {stats['resets_per_hour']:.1f}/h ativa" if stats["resets_per_hour"] is not None else ""
+            lines.append(f"  Resets: {stats['reset_rate']:.1%} dos ciclos armados{per_hour}")
+        for key, label, unit, precision in (("cycle_seconds", "Ciclo", "s", 2), ("reaction_seconds", "Reação", "s", 2),
+                                            ("firing_error_ms", "Erro de disparo", " ms", 3)):
+            d = stats[key]
+            if d is not None:
+                lines.append(f"  {label}: n={d['count']} média {d['mean']:.{precision}f}{unit} (desvio {d['stdev']:.{precision}f}) | "
+                             f"p10 {d['p10']:.{precision}f} p50 {d['p50']:.{precision}f} p90 {d['p90']:.{precision}f} "
+                             f"p99 {d['p99']:.{precision}f} máx {d['max']:.{precision}f}{unit}")
+    return "\n".join(lines)
 
-def update_controller_status_ui(message):
-    if ui_root and ui_controller_status_var and ui_root.winfo_exists():
-        ui_root.after(0, lambda: ui_controller_status_var.set(message))
-    logging.info(f"Status Controle UI: {message}")
 
-def update_action_button_display_ui():
-    global target_button_index
-    if ui_root and ui_action_button_display_var and ui_root.winfo_exists():
-        display_text = f"Índice: {target_button_index}" if target_button_index is not None else "Nenhum (Defina abaixo)"
-        ui_root.after(0, lambda: ui_action_button_display_var.set(display_text))
-    logging.info(f"Display do botão de ação atualizado para: {target_button_index}")
+class ControllerDevice:
+    """Um controle conectado: joystick do pygame, nome, GUID e botões de ação vinculados (botão -> timer)."""
+    __slots__ = ("instance_id", "joystick", "name", "guid", "action_buttons")
 
+    def __init__(self, joystick, action_buttons):
+        self.joystick = joystick
+        self.instance_id = joystick.get_instance_id()
+        self.name = joystick.get_name()
+        self.guid = joystick.get_guid() if hasattr(joystick, 'get_guid') else ""
+        self.action_buttons = dict(action_buttons) # Substituído por inteiro ao mudar (nunca alterado in-place)
 
-def update_timer_display_ui(remaining_seconds, current_target_delay):
-    if ui_root and ui_time_remaining_var and ui_root.winfo_exists():
-        minutes = int(remaining_seconds // 60)
-        seconds_part = remaining_seconds % 60
-        ui_root.after(0, lambda m=minutes, s=seconds_part: ui_time_remaining_var.set(f"{m:02d}:{s:05.2f}"))
 
-    if ui_root and ui_progress_var and current_target_delay > 0 and ui_root.winfo_exists():
-        progress = ((current_target_delay - remaining_seconds) / current_target_delay) * 100
-        progress = max(0, min(100, progress))
-        ui_root.after(0, lambda p=progress: ui_progress_var.set(p))
+class DeviceRegistry:
+    """Controles conectados indexados por instance_id (lookup O(1) por evento).
 
-def update_runtime_stats_ui():
-    global app_running, program_start_time
-    # O tempo de execução continua contando mesmo se pausado, pois a app está "aberta"
-    if ui_root and ui_program_runtime_var and ui_root.winfo_exists(): # app_running não é mais a condição aqui
-        elapsed_seconds = time.time() - program_start_time
-        hours = int(elapsed_seconds // 3600)
-        minutes = int((elapsed_seconds % 3600) // 60)
-        seconds = int(elapsed_seconds % 60)
-        ui_program_runtime_var.set(f"{hours:02d}:{minutes:02d}:{seconds:02d}")
-        if ui_root.winfo_exists(): # Verifica se a root ainda existe antes de reagendar
-            ui_root.after(1000, update_runtime_stats_ui)
+    Só a PygameThread altera o registro (na inicialização e nos eventos JOYDEVICEADDED/REMOVED);
+    a UI apenas lê.
+    """
+    def __init__(self):
+        self._devices = {}
 
+    def __len__(self):
+        return len(self._devices)
 
-def update_action_press_count_ui():
-    global action_press_count
-    if ui_root and ui_action_press_count_var and ui_root.winfo_exists():
-        ui_action_press_count_var.set(str(action_press_count))
+    def get(self, instance_id):
+        return self._devices.get(instance_id)
 
-def increment_action_press_count_and_update_ui():
-    global action_press_count
-    action_press_count += 1
-    update_action_press_count_ui()
+    def devices(self):
+        return list(self._devices.values())
 
-def generate_simple_beep(frequency=440, duration_ms=200, sample_rate=44100):
-    if not (pygame and hasattr(pygame, 'sndarray')):
-        logging.warning("Pygame sndarray não disponível para gerar beep.")
-        return None
-    update_main_status_ui("Gerando beep padrão...")
-    try:
-        n_samples = int(sample_rate * duration_ms / 1000.0)
-        buf = np.zeros((n_samples, 2), dtype=np.int16)
-        max_sample = 2**(15) - 1
-        for s_idx in range(n_samples):
-            t_sample = float(s_idx) / sample_rate
-            value = int(max_sample * np.sin(2 * np.pi * frequency * t_sample))
-            buf[s_idx][0] = value
-            buf[s_idx][1] = value
-        sound = pygame.sndarray.make_sound(buf)
-        update_main_status_ui("Beep padrão gerado.")
-        return sound
-    except Exception as e_beep:
-        logging.error(f"Falha ao gerar som de beep: {e_beep}", exc_info=True)
-        update_main_status_ui("Falha ao gerar beep.")
-        return None
+    def add_joystick(self, joystick, action_buttons=None):
+        """Registra um joystick já inicializado. Se o instance_id já existe, mantém o registro atual."""
+        instance_id = joystick.get_instance_id()
+        device = self._devices.get(instance_id)
+        if device is None:
+            device = ControllerDevice(joystick, action_buttons or {})
+            self._devices[instance_id] = device
+        return device
 
-def timer_and_sound_task():
-    global last_action_press_time, sound_to_play, current_delay_seconds, app_running, app_paused
-    logging.info("Thread timer_and_sound_task iniciada.")
-    update_main_status_ui("Aguardando Botão de Ação...")
-    try:
-        while app_running: # Loop principal da thread, continua mesmo se app_paused
-            if not timer_event.wait(timeout=0.5): # Espera pelo evento do botão de ação
-                if not app_running: # Se a aplicação foi fechada, sai
-                    logging.debug("timer_and_sound_task: app_running é False, saindo do loop de espera.")
-                    break
-                continue # Volta a esperar se não houve evento e app ainda está rodando
-
-            logging.debug("timer_and_sound_task: timer_event recebido.")
-            timer_event.clear()
-
-            if app_paused: # Se a aplicação está pausada, não inicia o timer
-                logging.info("timer_and_sound_task: Aplicação pausada, timer não iniciado.")
-                update_main_status_ui("Pausado. Pressione Continuar.")
-                continue # Volta a esperar pelo próximo evento (ou despausar)
-
-            current_activation_time = last_action_press_time
-            delay_to_use = float(ui_delay_var.get()) if ui_root and ui_delay_var and ui_delay_var.get() else current_delay_seconds
-            update_main_status_ui(f"Botão! Timer de {delay_to_use:.1f}s iniciado.")
-            logging.info(f"Timer iniciado com delay: {delay_to_use}s")
-
-            time_elapsed_total = 0
-
-            while time_elapsed_total < delay_to_use and app_running:
-                if app_paused: # Se pausado durante a contagem
-                    # Para uma pausa real, precisaria salvar state e quebrar o loop interno.
-                    # Por simplicidade, o timer continua em background mas o som pode não tocar.
-                    # Ou, para congelar visualmente:
-                    time_to_freeze_display_at = delay_to_use - time_elapsed_total
-                    update_timer_display_ui(time_to_freeze_display_at, delay_to_use)
-                    logging.info(f"timer_and_sound_task: Pausado durante contagem. Tempo restante congelado em {time_to_freeze_display_at:.2f}s.")
-                    # Espera até ser despausado ou app fechar
-                    while app_paused and app_running:
-                        time.sleep(0.1)
-                    if not app_running: break
-                    # Ao despausar, recalcular o tempo de ativação para continuar de onde parou
-                    current_activation_time = time.time() - time_elapsed_total
-                    logging.info(f"timer_and_sound_task: Despausado. Retomando contagem.")
-                    update_main_status_ui(f"Continuando timer de {delay_to_use:.1f}s...")
-
-
-                time_remaining = delay_to_use - time_elapsed_total
-                update_timer_display_ui(time_remaining, delay_to_use)
-                wait_interval = min(time_remaining, 0.05)
-
-                if timer_event.wait(timeout=wait_interval): # Verifica se o botão foi pressionado novamente (reset)
-                    if app_paused: # Se pausado, ignora o reset do timer por botão.
-                        timer_event.clear() # Limpa o evento para não processar no próximo ciclo
-                        logging.info("timer_and_sound_task: Reset de timer ignorado (pausado).")
-                        continue
+    def open(self, device_index, action_buttons=None):
+        joystick = pygame.joystick.Joystick(device_index)
+        joystick.init()
+        return self.add_joystick(joystick, action_buttons)
 
-                    logging.debug("timer_and_sound_task: timer_event recebido durante a contagem (reset).")
-                    timer_event.clear()
-                    current_activation_time = last_action_press_time
-                    delay_to_use = float(ui_delay_var.get()) if ui_root and ui_delay_var and ui_delay_var.get() else current_delay_seconds
-                    update_main_status_ui(f"Botão Reset! Novo timer de {delay_to_use:.1f}s.")
-                    logging.info(f"Timer resetado com novo delay: {delay_to_use}s")
-                    time_elapsed_total = 0 # Reseta o tempo decorrido
-                    continue # Volta para o início do loop de contagem
-
-                if not app_running:
-                    logging.debug("timer_and_sound_task: app_running é False, saindo do loop de contagem.")
-                    break
-                time_elapsed_total = time.time() - current_activation_time
+    def remove(self, instance_id):
+        device = self._devices.pop(instance_id, None)
+        if device is not None:
+            try:
+                device.joystick.quit()
+            except pygame.error:
+                pass
+        return device
 
-            if app_running and not app_paused and time_elapsed_total >= delay_to_use: # Só toca som se não estiver pausado
-                update_timer_display_ui(0, delay_to_use)
-                update_main_status_ui("Timer finalizado. Tocando som...")
-                logging.info("Timer finalizado, tentando tocar som.")
+    def status_text(self):
+        devices = self.devices()
+        if not devices:
+            return "🔴 Nenhum controle conectado."
+        if len(devices) == 1:
+            return f"🟢 {devices[0].name[:30]}"
+        return f"🟢 {len(devices)} controles: " + ", ".join(device.name[:20] for device in devices)
 
-                should_play_sound = True
-                if FarmHelperApp.instance and FarmHelperApp.instance.sound_enabled_var:
-                    should_play_sound = FarmHelperApp.instance.sound_enabled_var.get()
 
-                if should_play_sound and sound_to_play:
-                    try:
-                        sound_to_play.play()
-                        logging.debug("Som reproduzido.")
-                    except pygame.error as e_play:
-                        logging.error(f"Erro ao reproduzir som: {e_play}", exc_info=True)
-                        update_main_status_ui("Erro ao tocar som.")
-                elif not sound_to_play:
-                    update_main_status_ui("Nenhum som para tocar.")
-                    logging.warning("Tentativa de tocar som, mas sound_to_play é None.")
-                else:
-                    update_main_status_ui("Som desabilitado.")
-                    logging.info("Som desabilitado pela UI.")
-                update_main_status_ui("Aguardando Botão de Ação...")
-            elif app_running and app_paused and time_elapsed_total >= delay_to_use:
-                update_timer_display_ui(0, delay_to_use) # Atualiza display mesmo pausado
-                update_main_status_ui("Timer finalizado (durante pausa). Som não tocado.")
-                logging.info("Timer finalizado durante pausa. Som não tocado.")
-            elif not app_running:
-                update_main_status_ui("Timer interrompido (app_running False).")
-                logging.info("Timer interrompido pois app_running se tornou False.")
-                break
-    except Exception as e_thread:
-        logging.critical(f"Erro fatal na thread do timer: {e_thread}", exc_info=True)
-        update_main_status_ui(f"Erro na thread do timer: {e_thread}")
-    finally:
-        logging.info("Thread timer_and_sound_task finalizada.")
-        if app_running: update_main_status_ui("Thread do timer parada.")
+device_registry = DeviceRegistry()
+
+def default_action_buttons():
+    """Mapa botão -> timer para um controle recém-conectado: timers extras + botão de ação principal."""
+    bindings = {definition.button: name for name, definition in extra_timers.items()}
+    action_button = engine_state.snapshot().action_button
+    if action_button is not None:
+        bindings[action_button] = MAIN_TIMER_NAME
+    return bindings
+
+def set_main_action_button(button, devices=None):
+    """Troca o botão do timer principal no engine e nos vínculos dos controles (todos, ou `devices`).
 
+    Cada controle recebe um dict novo (atribuição atômica), então a PygameThread nunca lê um
+    mapa pela metade mesmo quando a troca vem de outra thread (API de controle). Levanta
+    ValueError se o botão já for de um timer extra (o timer extra ficaria inalcançável).
+    """
+    owner = extra_timer_for_button(button)
+    if owner is not None:
+        raise ValueError(f"o botão {button} já é do timer extra '{owner}'")
+    engine_state.update(action_button=button)
+    for device in device_registry.devices() if devices is None else devices:
+        bindings = {bound: name for bound, name in device.action_buttons.items() if name != MAIN_TIMER_NAME}
+        bindings[button] = MAIN_TIMER_NAME
+        device.action_buttons = bindings
+    update_action_button_display_ui()
 
 def pygame_loop():
-    global joystick, sound_to_play, last_action_press_time, pygame_running, app_running, app_paused, \
-           capturing_button_mode, target_button_index
+    global sound_to_play, pygame_running, app_running, capturing_button_mode
     logging.info("Thread pygame_loop iniciada.")
 
-    if not pygame:
-        logging.error("Pygame não está disponível no início do pygame_loop. Encerrando thread.")
+    update_controller_status_ui("Carregando Pygame...")
+    if not load_pygame():
+        logging.error("FALHA AO IMPORTAR PYGAME. O módulo 'pygame' não foi encontrado. Encerrando thread.")
         update_controller_status_ui("🔴 Pygame não disponível.")
         return
+    logging.info("Pygame importado com sucesso. Versão: %s", pygame.version.ver)
 
     try:
         update_controller_status_ui("Inicializando Pygame...")
+        configure_mixer_pre_init()
         pygame.init()
         if not pygame.get_init():
             logging.error("Falha ao inicializar Pygame dentro do pygame_loop.")
@@ -301,124 +3082,145 @@ def pygame_loop():
         if not pygame.mixer.get_init():
             logging.warning("Módulo Pygame Mixer não pôde ser inicializado.")
             update_main_status_ui("⚠️ Mixer de áudio não disponível.")
+        else:
+            logging.info("Mixer ativo: %s", pygame.mixer.get_init())
+            audio_worker.start()
 
         logging.info("Pygame (core, joystick, mixer) inicializado/verificado no pygame_loop.")
 
         joystick_count = pygame.joystick.get_count()
-        logging.info(f"Controles detectados: {joystick_count}")
-        if joystick_count == 0:
-            update_controller_status_ui("Nenhum controle detectado!")
-        else:
+        logging.info("Controles detectados: %s", joystick_count)
+        for device_index in range(joystick_count):
             try:
-                joystick = pygame.joystick.Joystick(0)
-                joystick.init()
-                controller_name = joystick.get_name()
-                update_controller_status_ui(f"🟢 {controller_name[:30]}")
-                logging.info(f"Controle detectado: {controller_name}")
+                device = device_registry.open(device_index, default_action_buttons())
+                logging.info("Controle detectado: %s (instance_id %s, GUID %s)", device.name, device.instance_id, device.guid)
             except pygame.error as e_joy_init:
-                logging.error(f"Erro ao inicializar joystick 0: {e_joy_init}")
+                logging.error("Erro ao inicializar joystick %s: %s", device_index, e_joy_init)
                 update_controller_status_ui("🔴 Erro ao iniciar controle.")
+        if len(device_registry) == 0:
+            update_controller_status_ui("Nenhum controle detectado!")
+        else:
+            update_controller_status_ui(device_registry.status_text())
+        startup_timeline.mark("controller_ready")
 
         try:
             if os.path.exists(SOUND_FILE_PATH):
                 sound_to_play = pygame.mixer.Sound(SOUND_FILE_PATH)
-                logging.info(f"Arquivo de som '{SOUND_FILE_PATH}' carregado.")
+                logging.info("Arquivo de som '%s' carregado.", SOUND_FILE_PATH)
             else:
-                logging.warning(f"Arquivo de som '{SOUND_FILE_PATH}' não encontrado. Gerando beep.")
+                logging.warning("Arquivo de som '%s' não encontrado. Gerando beep.", SOUND_FILE_PATH)
                 update_main_status_ui("Arquivo beep.wav não encontrado. Gerando som...")
                 sound_to_play = generate_simple_beep()
         except pygame.error as e_sound:
-            logging.error(f"Não foi possível carregar o som '{SOUND_FILE_PATH}': {e_sound}", exc_info=True)
+            logging.error("Não foi possível carregar o som '%s': %s", SOUND_FILE_PATH, e_sound, exc_info=True)
             update_main_status_ui("Erro ao carregar som. Tentando beep...")
             sound_to_play = generate_simple_beep()
 
         if not sound_to_play:
             update_main_status_ui("Falha no beep. Sem áudio.")
             logging.error("sound_to_play continua None após tentativas de carga/geração.")
-        else:
-            if FarmHelperApp.instance and FarmHelperApp.instance.volume_var:
-                initial_volume = FarmHelperApp.instance.volume_var.get()
-                sound_to_play.set_volume(initial_volume)
-                logging.info(f"Volume inicial do som '{SOUND_FILE_PATH or 'beep'}' definido para {initial_volume:.2f}")
+        if pygame.mixer.get_init():
+            cue_bank.preload(sound_to_play)
+            logging.info("Banco de deixas carregado: %d som(ns).", len(cue_bank))
+        initial_volume = engine_state.snapshot().volume
+        audio_worker.set_volume(initial_volume)
+        logging.info("Volume inicial do som '%s' definido para %.2f", SOUND_FILE_PATH or 'beep', initial_volume)
+
+
+        for definition in extra_timers.values():
+            if not definition.sound_path:
+                continue
+            try:
+                definition.sound = pygame.mixer.Sound(definition.sound_path)
+                logging.info("Som do timer '%s' carregado: %s", definition.name, definition.sound_path)
+            except (pygame.error, FileNotFoundError) as e_timer_sound:
+                logging.error("Não foi possível carregar o som do timer '%s' (%s): %s. Usando o som padrão.",
+                              definition.name, definition.sound_path, e_timer_sound)
+
+        if sound_to_play and audio_worker.is_running():
+            audio_worker.warm_up(sound_to_play)
+        startup_timeline.mark("sound_ready")
 
+        configure_pygame_event_filter()
 
-        while pygame_running: # Loop do Pygame continua mesmo se app_paused, para eventos de UI e joystick
+        while pygame_running:
             if not app_running: # Se app_running se tornar False (app fechando), então pygame_running também deve se tornar
                 pygame_running = False
                 break
 
-            for event in pygame.event.get():
+            if engine_state.snapshot().paused:
+                # Pausado: nada de pump do SDL nem timeout, a thread só acorda na retomada ou no fechamento.
+                # Presses feitos durante a pausa são descartados ao retomar (não armam timers atrasados).
+                logging.info(LOG_MSG_INPUT_PAUSED)
+                stall_watchdog.idle("input")
+                engine_state.wait_while_paused(lambda: app_running and pygame_running)
+                stall_watchdog.busy("input")
+                engine_counters.ignored_input += len(pygame.event.get(pygame.JOYBUTTONDOWN))
+                logging.info(LOG_MSG_INPUT_RESUMED)
+                continue
+
+            stall_watchdog.idle("input", INPUT_WAIT_TIMEOUT_MS / 1000.0) # Travar dentro do SDL passa desse timeout
+            pending_events = next_pygame_events()
+            stall_watchdog.busy("input")
+            wakeup_counter.tick("input")
+            dequeued_at = timer_scheduler.now()
+            for event in pending_events:
                 if event.type == pygame.QUIT:
                     logging.info("Evento QUIT do Pygame recebido.")
                     pygame_running = False; app_running = False # Sinaliza para todas as threads pararem
                     if ui_root and ui_root.winfo_exists(): ui_root.event_generate("<<AppClosing>>")
                     break
 
-                if event.type == pygame.JOYDEVICEADDED:
-                    logging.info(f"Novo joystick detectado: {event.device_index}")
-                    joystick_count = pygame.joystick.get_count()
-                    if joystick_count > 0 and (joystick is None or not joystick.get_init()):
-                        try:
-                            new_joystick_idx = event.device_index
-                            joystick = pygame.joystick.Joystick(new_joystick_idx)
-                            joystick.init()
-                            controller_name = joystick.get_name()
-                            update_controller_status_ui(f"🟢 {controller_name[:30]}")
-                            logging.info(f"Novo controle conectado: {controller_name}")
-                        except pygame.error as e_joy_add:
-                            logging.error(f"Erro ao inicializar novo joystick {new_joystick_idx}: {e_joy_add}")
-                            update_controller_status_ui("🔴 Erro ao adicionar controle.")
-
-                if event.type == pygame.JOYDEVICEREMOVED:
-                    logging.info(f"Joystick removido: instance_id {event.instance_id}")
-                    if joystick and hasattr(joystick, 'get_instance_id') and event.instance_id == joystick.get_instance_id():
-                        joystick.quit()
-                        joystick = None
-                        update_controller_status_ui("🔴 Controle desconectado.")
-                        if pygame.joystick.get_count() > 0:
-                            try:
-                                joystick = pygame.joystick.Joystick(0)
-                                joystick.init()
-                                controller_name = joystick.get_name()
-                                update_controller_status_ui(f"🟢 {controller_name[:30]} (Alternativo)")
-                                logging.info(f"Controle alternativo conectado: {controller_name}")
-                            except pygame.error as e_joy_alt:
-                                logging.error(f"Erro ao inicializar joystick alternativo: {e_joy_alt}")
-                                update_controller_status_ui("🔴 Erro controle alternativo.")
-
-                if event.type == pygame.JOYBUTTONDOWN:
-                    if capturing_button_mode: # Captura de botão funciona mesmo se pausado
-                        target_button_index = event.button
+                elif event.type == pygame.JOYBUTTONDOWN:
+                    device = device_registry.get(event.instance_id)
+                    if capturing_button_mode:
                         capturing_button_mode = False
-                        update_action_button_display_ui()
-                        update_main_status_ui(f"Botão de Ação definido: Índice {target_button_index}. Aguardando...")
-                        logging.info(f"Modo de captura: Botão {target_button_index} capturado.")
+                        try:
+                            set_main_action_button(event.button, [device] if device is not None else [])
+                            update_main_status_ui(f"Botão de Ação definido: Índice {event.button}. Aguardando...")
+                            logging.info("Modo de captura: Botão %s capturado no joystick %s.", event.button, event.instance_id)
+                        except ValueError as e_capture:
+                            update_main_status_ui(f"Botão não definido: {e_capture}. Escolha outro botão.")
+                            logging.warning("Modo de captura: botão %s recusado: %s.", event.button, e_capture)
                         if FarmHelperApp.instance and hasattr(FarmHelperApp.instance, 'define_button_btn'):
                             if FarmHelperApp.instance.define_button_btn.winfo_exists():
                                 FarmHelperApp.instance.define_button_btn.config(state=tk.NORMAL, text="🎯 Definir Botão de Ação")
-                    elif not app_paused and target_button_index is not None: # Só processa botão de ação se não estiver pausado
-                        logging.debug(f"Botão do controle pressionado: {event.button} no joystick {event.instance_id}. Alvo: {target_button_index}")
-                        if joystick and hasattr(joystick, 'get_instance_id') and \
-                           event.instance_id == joystick.get_instance_id() and \
-                           event.button == target_button_index:
-                            logging.info(f"Botão de Ação ({target_button_index}) Pressionado no controle!")
-                            last_action_press_time = time.time()
-                            increment_action_press_count_and_update_ui()
-                            timer_event.set()
-                    elif app_paused and target_button_index is not None and \
-                         joystick and hasattr(joystick, 'get_instance_id') and \
-                         event.instance_id == joystick.get_instance_id() and \
-                         event.button == target_button_index:
-                        logging.info(f"Botão de Ação ({target_button_index}) pressionado, mas app está pausado. Ignorando.")
-                        update_main_status_ui("Pausado. Pressione Continuar para usar o botão de ação.")
+                    elif device is not None and event.button in device.action_buttons:
+                        # Pausado, o loop nem chega aqui; uma pausa no meio do lote cai no ignored_timer
+                        timer_name = device.action_buttons[event.button]
+                        signalled_at = timer_scheduler.now()
+                        timer_scheduler.signal_press(signalled_at, timer_name, pressed_at=dequeued_at, button=event.button)
+                        pipeline_latency.record("input", signalled_at - dequeued_at)
+                        register_press(timer_name, f"no controle {event.instance_id}", event.button)
+                    else:
+                        logging.debug("Botão do controle pressionado: %s no joystick %s (não vinculado).", event.button, event.instance_id)
+
+                elif event.type == pygame.JOYDEVICEADDED:
+                    logging.info("Novo joystick detectado: %s", event.device_index)
+                    try:
+                        device = device_registry.open(event.device_index, default_action_buttons())
+                        update_controller_status_ui(device_registry.status_text())
+                        logging.info("Novo controle conectado: %s (instance_id %s, GUID %s)", device.name, device.instance_id, device.guid)
+                    except pygame.error as e_joy_add:
+                        logging.error("Erro ao inicializar novo joystick %s: %s", event.device_index, e_joy_add)
+                        update_controller_status_ui("🔴 Erro ao adicionar controle.")
 
+                elif event.type == pygame.JOYDEVICEREMOVED:
+                    logging.info("Joystick removido: instance_id %s", event.instance_id)
+                    device = device_registry.remove(event.instance_id)
+                    if device is not None:
+                        logging.info("Controle desconectado: %s", device.name)
+                        update_controller_status_ui(device_registry.status_text() if len(device_registry) else "🔴 Controle desconectado.")
 
             if not pygame_running: break
-            time.sleep(0.02)
+            if INPUT_MODE == "poll":
+                time.sleep(INPUT_POLL_INTERVAL_SECONDS)
     except Exception as e_pygame:
-        logging.critical(f"Erro crítico na thread Pygame: {e_pygame}", exc_info=True)
+        logging.critical("Erro crítico na thread Pygame: %s", e_pygame, exc_info=True)
         if app_running: update_controller_status_ui(f"Erro Pygame: {e_pygame}")
     finally:
+        stall_watchdog.idle("input")
+        audio_worker.stop()
         if pygame and pygame.get_init():
             pygame.quit()
         logging.info("Thread Pygame e Pygame finalizados.")
@@ -433,12 +3235,14 @@ class FarmHelperApp:
     instance = None
     def __init__(self, master_root):
         global ui_root, ui_status_var, ui_delay_var, ui_controller_status_var, \
-               ui_time_remaining_var, ui_progress_var, current_delay_seconds, \
+               ui_time_remaining_var, ui_progress_var, \
                ui_program_runtime_var, ui_action_press_count_var, ui_action_button_display_var, \
-               app_running, app_paused # Adicionado app_paused
+               ui_latency_stats_var, ui_active_timers_var, ui_history_stats_var, ui_cycle_stats_var, \
+               ui_instrumentation_var, ui_lag_var, app_running
 
         FarmHelperApp.instance = self
         self.master_root = master_root
+        self._instrumentation_mark = None # Base das taxas do card de instrumentação (Instrumentation.report)
         ui_root = master_root
         self.master_root.title("🎮 FarmHelper Pro - Gaming Timer Assistant")
         self.master_root.geometry("1400x750")
@@ -448,20 +3252,39 @@ class FarmHelperApp:
 
         # --- ALTERAÇÃO: Estado inicial ---
         app_running = True # Aplicação está rodando ao iniciar
-        app_paused = False # Não está pausada ao iniciar
+        settings = engine_state.update(paused=False) # Não está pausada ao iniciar
 
         ui_status_var = tk.StringVar(master_root, value="🚀 Sistema iniciado. Aguardando ação...") # Mensagem inicial
-        ui_delay_var = tk.StringVar(master_root, value=f"{INITIAL_DELAY_SECONDS:.1f}")
-        current_delay_seconds = INITIAL_DELAY_SECONDS
+        ui_delay_var = tk.StringVar(master_root, value=f"{settings.delay:.1f}")
+        ui_delay_var.trace_add("write", self.on_delay_var_change)
         ui_controller_status_var = tk.StringVar(master_root, value="🔍 Verificando controles...")
         ui_time_remaining_var = tk.StringVar(master_root, value="--:--")
         ui_progress_var = tk.DoubleVar(master_root, value=0.0)
-        self.sound_enabled_var = tk.BooleanVar(master_root, value=True)
+        self.sound_enabled_var = tk.BooleanVar(master_root, value=settings.sound_enabled)
+        self.sound_enabled_var.trace_add("write", self.on_sound_enabled_change)
         ui_program_runtime_var = tk.StringVar(master_root, value="00:00:00")
         ui_action_press_count_var = tk.StringVar(master_root, value="0")
-        ui_action_button_display_var = tk.StringVar(master_root, value=f"Índice: {target_button_index}")
-        self.initial_volume = 0.7
+        ui_action_button_display_var = tk.StringVar(master_root, value=f"Índice: {settings.action_button}")
+        engine_stats_note = f"No processo do engine (ver {ENGINE_LOG_FILENAME})" # --engine-process
+        ui_latency_stats_var = tk.StringVar(master_root, value=pipeline_latency.format_summary() if engine_process is None else engine_stats_note)
+        ui_active_timers_var = tk.StringVar(master_root, value="Nenhum timer ativo")
+        ui_cycle_stats_var = tk.StringVar(master_root, value=cycle_analytics.format_summary() if engine_process is None else engine_stats_note)
+        self.auto_delay_var = tk.BooleanVar(master_root, value=settings.auto_delay)
+        self.auto_delay_var.trace_add("write", self.on_auto_delay_change)
+        self.prewarning_offsets = settings.prewarning or PREWARNING_OFFSETS_DEFAULT
+        self.prewarning_var = tk.BooleanVar(master_root, value=bool(settings.prewarning))
+        self.prewarning_var.trace_add("write", self.on_prewarning_change)
+        ui_history_stats_var = tk.StringVar(master_root, value="Carregando histórico..." if history_store is not None
+                                            else engine_stats_note if engine_process is not None else "Histórico desabilitado")
+        self.instrumentation_var = tk.BooleanVar(master_root, value=instrumentation.enabled)
+        self.instrumentation_var.trace_add("write", self.on_instrumentation_change)
+        ui_instrumentation_var = tk.StringVar(master_root, value="Desligada")
+        ui_lag_var = tk.StringVar(master_root, value=stall_watchdog.format_indicator())
+        self.initial_volume = settings.volume
         self.volume_var = tk.DoubleVar(master_root, value=self.initial_volume)
+        self._active_timers = {} # nome -> [deadline ou None se pausado, duração, restante congelado]
+        self._timer_render_job = None
+        self._timer_render_interval_ms = max(1, int(1000 / TIMER_UI_REFRESH_HZ))
 
         self.setup_styles()
         self.create_widgets()
@@ -587,6 +3410,11 @@ class FarmHelperApp:
         delay_spinbox = tk.Spinbox(delay_input_container, from_=0.1, to=600.0, increment=0.1, textvariable=ui_delay_var, width=12, font=('Consolas', 12, 'bold'), bg=self.colors['bg_secondary'], fg=self.colors['text_primary'], relief='flat', bd=5, justify=tk.CENTER, insertbackground=self.colors['accent_blue'], selectbackground=self.colors['accent_blue'])
         delay_spinbox.pack(pady=5)
         delay_spinbox.bind('<Return>', lambda e: self.apply_delay_from_ui()); delay_spinbox.bind('<FocusOut>', lambda e: self.apply_delay_from_ui())
+        rhythm_frame = ttk.Frame(delay_section_content, style='Card.TFrame')
+        rhythm_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
+        ttk.Label(rhythm_frame, textvariable=ui_cycle_stats_var, font=('Consolas', 9), foreground=self.colors['text_secondary'], background=self.colors['bg_tertiary'], justify=tk.LEFT).pack(anchor=tk.W, pady=(10, 5))
+        ttk.Button(rhythm_frame, text="📈 Usar Delay Sugerido", command=self.apply_suggested_delay, style='Modern.TButton').pack(fill=tk.X, pady=5)
+        ttk.Checkbutton(rhythm_frame, text="🔧 Ajustar delay automaticamente", variable=self.auto_delay_var, style='TCheckbutton').pack(anchor=tk.W, pady=(5, 10))
 
         # === COLUNA MEIO - Timer Principal ===
         timer_section_content = self.create_section(middle_column, "Status do Timer", "🎯")
@@ -603,6 +3431,10 @@ class FarmHelperApp:
         ttk.Label(timer_display_frame, text="Tempo Restante:", font=('Segoe UI', 11, 'bold'), foreground=self.colors['text_secondary'], background=self.colors['bg_tertiary']).pack(pady=(15, 5))
         self.time_label_widget = tk.Label(timer_display_frame, textvariable=ui_time_remaining_var, font=('Consolas', 48, 'bold'), bg=self.colors['bg_tertiary'], fg=self.colors['accent_green'])
         self.time_label_widget.pack(pady=(5, 20))
+        active_timers_frame = ttk.Frame(timer_section_content, style='Card.TFrame')
+        active_timers_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
+        ttk.Label(active_timers_frame, text="Timers Ativos:", font=('Segoe UI', 9, 'bold'), foreground=self.colors['text_secondary'], background=self.colors['bg_tertiary']).pack(pady=(10, 5))
+        ttk.Label(active_timers_frame, textvariable=ui_active_timers_var, font=('Consolas', 11), foreground=self.colors['text_primary'], background=self.colors['bg_tertiary'], justify=tk.LEFT).pack(pady=(0, 10))
 
         # === COLUNA DIREITA - Opções e Estatísticas ===
         options_section_content = self.create_section(right_column, "Opções", "⚙️")
@@ -610,6 +3442,8 @@ class FarmHelperApp:
         sound_check_frame.pack(fill=tk.X, padx=15, pady=(10,5))
         sound_check = ttk.Checkbutton(sound_check_frame, text="🔊 Som habilitado", variable=self.sound_enabled_var, style='TCheckbutton')
         sound_check.pack(anchor=tk.W, pady=5)
+        prewarning_label = ", ".join(f"T-{offset:g}" for offset in self.prewarning_offsets)
+        ttk.Checkbutton(sound_check_frame, text=f"⏱️ Avisos antes do fim ({prewarning_label})", variable=self.prewarning_var, style='TCheckbutton').pack(anchor=tk.W, pady=5)
         volume_control_frame = ttk.Frame(options_section_content, style='Card.TFrame')
         volume_control_frame.pack(fill=tk.X, padx=15, pady=(5, 15))
         volume_label = ttk.Label(volume_control_frame, text="🎧 Volume:", style='Stats.TLabel', background=self.colors['bg_tertiary'])
@@ -626,10 +3460,23 @@ class FarmHelperApp:
         runtime_container.pack(fill=tk.X, pady=(10, 8))
         ttk.Label(runtime_container, text="⏰ Tempo de Execução:", style='Stats.TLabel', padding=(0,0,5,0)).pack(anchor=tk.W)
         ttk.Label(runtime_container, textvariable=ui_program_runtime_var, font=('Consolas', 12, 'bold'), foreground=self.colors['accent_blue'], background=self.colors['bg_tertiary']).pack(anchor=tk.W, padx=(20, 0))
+        ttk.Label(runtime_container, textvariable=ui_lag_var, font=('Consolas', 9), foreground=self.colors['text_secondary'], background=self.colors['bg_tertiary']).pack(anchor=tk.W, padx=(20, 0))
         action_container = ttk.Frame(stats_frame, style='Card.TFrame')
         action_container.pack(fill=tk.X, pady=(8, 10))
         ttk.Label(action_container, text="🎯 Ações Executadas:", style='Stats.TLabel', padding=(0,0,5,0)).pack(anchor=tk.W)
         ttk.Label(action_container, textvariable=ui_action_press_count_var, font=('Consolas', 12, 'bold'), foreground=self.colors['accent_green'], background=self.colors['bg_tertiary']).pack(anchor=tk.W, padx=(20, 0))
+        history_container = ttk.Frame(stats_frame, style='Card.TFrame')
+        history_container.pack(fill=tk.X, pady=(8, 10))
+        ttk.Label(history_container, text="📚 Histórico (todas as sessões):", style='Stats.TLabel', padding=(0,0,5,0)).pack(anchor=tk.W)
+        ttk.Label(history_container, textvariable=ui_history_stats_var, font=('Consolas', 9), foreground=self.colors['text_secondary'], background=self.colors['bg_tertiary'], justify=tk.LEFT).pack(anchor=tk.W, padx=(20, 0))
+        latency_container = ttk.Frame(stats_frame, style='Card.TFrame')
+        latency_container.pack(fill=tk.X, pady=(8, 10))
+        ttk.Label(latency_container, text="⚡ Latência (p50 | p95 | p99):", style='Stats.TLabel', padding=(0,0,5,0)).pack(anchor=tk.W)
+        ttk.Label(latency_container, textvariable=ui_latency_stats_var, font=('Consolas', 9), foreground=self.colors['text_secondary'], background=self.colors['bg_tertiary'], justify=tk.LEFT).pack(anchor=tk.W, padx=(20, 0))
+        instrumentation_container = ttk.Frame(stats_frame, style='Card.TFrame')
+        instrumentation_container.pack(fill=tk.X, pady=(8, 10))
+        ttk.Checkbutton(instrumentation_container, text=f"🔬 Instrumentação (perfil de {PROFILE_WINDOW_SECONDS_DEFAULT:g}s)", variable=self.instrumentation_var, style='TCheckbutton').pack(anchor=tk.W)
+        ttk.Label(instrumentation_container, textvariable=ui_instrumentation_var, font=('Consolas', 9), foreground=self.colors['text_secondary'], background=self.colors['bg_tertiary'], justify=tk.LEFT).pack(anchor=tk.W, padx=(20, 0))
 
         app_controls_section_content = self.create_section(right_column, "Controles", "🕹️")
         controls_frame = ttk.Frame(app_controls_section_content, style='Card.TFrame')
@@ -642,16 +3489,122 @@ class FarmHelperApp:
         # --- FIM ALTERAÇÃO ---
 
 
+    def on_timer_event(self, kind, deadline=None, duration=None, remaining=None, name=MAIN_TIMER_NAME):
+        """Recebe eventos do timer (thread do Tk) e liga/desliga a animação da contagem."""
+        entry = self._active_timers.get(name)
+        if duration is None:
+            duration = entry[1] if entry else 0.0
+        if kind in ("started", "reset"):
+            self._active_timers[name] = [deadline, duration, None]
+        elif kind == "paused":
+            self._active_timers[name] = [None, duration, remaining]
+        elif kind == "fired":
+            self._active_timers.pop(name, None)
+            if name == MAIN_TIMER_NAME:
+                self._set_timer_display(0, duration)
+        self._cancel_timer_render()
+        self._render_timer_display()
+
+    def _cancel_timer_render(self):
+        if self._timer_render_job is not None:
+            self.master_root.after_cancel(self._timer_render_job)
+            self._timer_render_job = None
+
+    def _render_timer_display(self):
+        self._timer_render_job = None
+        if not self.master_root.winfo_exists():
+            return
+        wakeup_counter.tick("ui_render")
+        now = timer_scheduler.now()
+        counting = False
+        lines = []
+        for name, (deadline, duration, frozen_remaining) in self._active_timers.items():
+            if deadline is None:
+                remaining = frozen_remaining
+            else:
+                remaining = max(0.0, deadline - now)
+                counting = counting or remaining > 0
+            if name == MAIN_TIMER_NAME:
+                self._set_timer_display(remaining, duration)
+            minutes, seconds_part = int(remaining // 60), remaining % 60
+            lines.append(f"{name[:18]:<18} {minutes:02d}:{seconds_part:05.2f}{' ⏸' if deadline is None else ''}")
+        ui_active_timers_var.set("\n".join(lines) if lines else "Nenhum timer ativo")
+        if counting: # Sem contagem em andamento para de se reagendar; os eventos do timer religam
+            self._timer_render_job = schedule_ui(self._timer_render_interval_ms, self._render_timer_display)
+
+    def _set_timer_display(self, remaining_seconds, current_target_delay):
+        minutes = int(remaining_seconds // 60)
+        seconds_part = remaining_seconds % 60
+        ui_time_remaining_var.set(f"{minutes:02d}:{seconds_part:05.2f}")
+        if current_target_delay > 0:
+            progress = ((current_target_delay - remaining_seconds) / current_target_delay) * 100
+            ui_progress_var.set(max(0, min(100, progress)))
+
+    def on_sound_enabled_change(self, *_trace_args):
+        engine_state.update(sound_enabled=self.sound_enabled_var.get())
+
+    def on_prewarning_change(self, *_trace_args):
+        # Vale a partir do próximo press (o ciclo em andamento mantém os avisos com que foi armado)
+        engine_state.update(prewarning=self.prewarning_offsets if self.prewarning_var.get() else ())
+
+    def on_instrumentation_change(self, *_trace_args):
+        enabled = self.instrumentation_var.get()
+        if enabled == instrumentation.enabled: # Ligada/desligada fora da UI (--profile, comando PROFILE)
+            return
+        path = instrumentation.set_enabled(enabled)
+        if engine_process is not None: # O engine mede e grava o perfil dele no processo filho
+            engine_process.send(f"PROFILE {PROFILE_WINDOW_SECONDS_DEFAULT:g}" if enabled else "PROFILE 0")
+        self.refresh_instrumentation_ui()
+        if path:
+            update_main_status_ui(f"🔬 Instrumentação ligada. Perfil em {os.path.basename(path)}")
+        refresh_runtime_stats_now()
+
+    def refresh_instrumentation_ui(self):
+        """Relatório da instrumentação no card; acompanha também o liga/desliga vindo de fora da UI."""
+        if self.instrumentation_var.get() != instrumentation.enabled:
+            self.instrumentation_var.set(instrumentation.enabled)
+        if not instrumentation.enabled:
+            self._instrumentation_mark = None
+            ui_instrumentation_var.set("Desligada")
+            return
+        report = instrumentation.report(self._instrumentation_mark)
+        self._instrumentation_mark = report["mark"]
+        ui_instrumentation_var.set(instrumentation.format_report(report))
+
+    def on_auto_delay_change(self, *_trace_args):
+        enabled = self.auto_delay_var.get()
+        engine_state.update(auto_delay=enabled)
+        logging.info("Ajuste automático do delay %s.", "ligado" if enabled else "desligado")
+
+    def apply_suggested_delay(self):
+        suggestion = cycle_analytics.suggested_delay()
+        if suggestion is None:
+            messagebox.showinfo("Delay Sugerido", f"Ainda não há ciclos suficientes (mínimo {CYCLE_SUGGESTION_MIN_SAMPLES}).", parent=self.master_root)
+            return
+        ui_delay_var.set(f"{suggestion:.1f}")
+        self.apply_delay_from_ui()
+
+    def on_delay_var_change(self, *_trace_args):
+        # O spinbox vale assim que muda (como antes), mas só valores válidos chegam ao engine;
+        # a validação com mensagem de erro continua em apply_delay_from_ui.
+        try:
+            new_delay = float(ui_delay_var.get())
+        except ValueError:
+            return
+        if new_delay > 0:
+            engine_state.update(delay=new_delay)
+
     def on_volume_change(self, value_str):
         try:
             volume = float(value_str)
+            engine_state.update(volume=volume)
             if self.volume_percentage_label and self.volume_percentage_label.winfo_exists():
                 self.volume_percentage_label.config(text=f"{int(volume * 100)}%")
-            if pygame and pygame.mixer.get_init() and sound_to_play:
-                sound_to_play.set_volume(volume)
-                logging.info(f"Volume do som ajustado para: {volume:.2f}")
-        except ValueError: logging.error(f"Valor inválido para volume: {value_str}")
-        except Exception as e: logging.error(f"Erro ao definir volume: {e}", exc_info=True)
+            if pygame and pygame.mixer.get_init():
+                audio_worker.set_volume(volume)
+                logging.info("Volume do som ajustado para: %.2f", volume)
+        except ValueError: logging.error("Valor inválido para volume: %s", value_str)
+        except Exception as e: logging.error("Erro ao definir volume: %s", e, exc_info=True)
 
 
     def setup_ui_bindings(self):
@@ -662,82 +3615,103 @@ class FarmHelperApp:
         # self.master_root.bind('<Escape>', lambda event: self.reset_visual_timer_ui())
 
     def start_button_capture_mode(self):
-        global capturing_button_mode, app_paused
-        if app_paused: # Não permitir captura se pausado
+        global capturing_button_mode
+        if engine_state.snapshot().paused: # Não permitir captura se pausado
             messagebox.showinfo("Pausado", "Despause a aplicação para definir o botão.", parent=self.master_root)
             return
-        if joystick is None or not (hasattr(joystick, 'get_init') and joystick.get_init()):
+        controllers = len(device_registry) if engine_process is None else engine_process.controllers()[0]
+        if controllers == 0:
             messagebox.showwarning("Controle Necessário", "Conecte um controle antes de definir o botão.", parent=self.master_root)
             return
         capturing_button_mode = True
+        if engine_process is not None:
+            engine_process.send("CAPTURE 1")
         update_main_status_ui("🎯 Pressione qualquer botão no controle...")
         logging.info("Modo de captura de botão ATIVADO. Aguardando entrada do usuário.")
         if hasattr(self, 'define_button_btn') and self.define_button_btn.winfo_exists():
             self.define_button_btn.config(state=tk.DISABLED, text="⏳ Aguardando...")
-        self.master_root.after(10000, self._check_capture_timeout)
+        schedule_ui(10000, self._check_capture_timeout)
 
     def _check_capture_timeout(self):
         global capturing_button_mode
         if capturing_button_mode:
             capturing_button_mode = False
+            if engine_process is not None:
+                engine_process.send("CAPTURE 0")
             update_main_status_ui("⚠️ Captura cancelada (timeout). Tente novamente.")
             logging.warning("Modo de captura de botão TIMEOUT.")
             if hasattr(self, 'define_button_btn') and self.define_button_btn.winfo_exists():
                 self.define_button_btn.config(state=tk.NORMAL, text="🎯 Definir Botão de Ação")
 
     def apply_delay_from_ui(self):
-        global current_delay_seconds
         try:
             new_delay = float(ui_delay_var.get())
             if new_delay > 0:
-                current_delay_seconds = new_delay
-                update_main_status_ui(f"✅ Delay configurado: {current_delay_seconds:.1f}s")
-                logging.info(f"Delay da UI atualizado para: {current_delay_seconds}")
+                engine_state.update(delay=new_delay)
+                update_main_status_ui(f"✅ Delay configurado: {new_delay:.1f}s")
+                logging.info("Delay da UI atualizado para: %s", new_delay)
             else:
                 messagebox.showerror("Erro de Validação", "O delay deve ser um número positivo.", parent=self.master_root)
-                ui_delay_var.set(f"{current_delay_seconds:.1f}")
+                ui_delay_var.set(f"{engine_state.snapshot().delay:.1f}")
         except ValueError:
             messagebox.showerror("Erro de Validação", "Por favor, insira um número válido para o delay.", parent=self.master_root)
-            ui_delay_var.set(f"{current_delay_seconds:.1f}")
+            ui_delay_var.set(f"{engine_state.snapshot().delay:.1f}")
         self.master_root.focus_set()
 
+    def set_paused(self, paused):
+        """Pausa/retoma vindo de fora da UI (API de controle); não faz nada se já estiver no estado pedido."""
+        if engine_state.snapshot().paused != paused:
+            self.toggle_pause_resume()
+
     # --- ALTERAÇÃO: Função para Pausar/Continuar ---
     def toggle_pause_resume(self):
-        global app_paused
-        app_paused = not app_paused
-        if app_paused:
+        if not engine_state.snapshot().paused:
             self.pause_resume_btn.configure(text="▶️ Continuar", style='Warning.TButton')
+            for name, frozen_remaining in pause_engine().items():
+                self.on_timer_event("paused", duration=timer_scheduler.duration(name), remaining=frozen_remaining, name=name)
+                logging.info("Pausado durante contagem. Timer '%s' congelado em %.2fs.", name, frozen_remaining)
             update_main_status_ui("⏸️ Aplicação Pausada. Pressione Continuar para retomar.")
             logging.info("Aplicação Pausada.")
             # Desabilitar outros botões que não devem funcionar enquanto pausado
             if hasattr(self, 'define_button_btn'): self.define_button_btn.config(state=tk.DISABLED)
         else:
             self.pause_resume_btn.configure(text="⏸️ Pausar", style='Success.TButton')
-            update_main_status_ui("▶️ Aplicação Retomada. Aguardando botão de ação.")
+            resumed = resume_engine()
+            for name, resumed_remaining in resumed.items():
+                self.on_timer_event("started", timer_scheduler.deadline(name), timer_scheduler.duration(name), name=name)
+                logging.info("Despausado. Timer '%s' retomado com %.2fs restantes.", name, resumed_remaining)
+            if MAIN_TIMER_NAME in resumed:
+                update_main_status_ui(f"▶️ Continuando timer de {timer_scheduler.duration():.1f}s...")
+            elif resumed:
+                update_main_status_ui(f"▶️ Continuando {len(resumed)} timer(s)...")
+            else:
+                update_main_status_ui("▶️ Aplicação Retomada. Aguardando botão de ação.")
             logging.info("Aplicação Retomada.")
+            refresh_runtime_stats_now()
+            stall_watchdog.resume_tk_beat()
             # Reabilitar botões
             if hasattr(self, 'define_button_btn'): self.define_button_btn.config(state=tk.NORMAL)
-            # Se um timer estava rodando e foi pausado, pode ser necessário
-            # 'acordar' a thread do timer se ela estiver esperando em timer_event.wait()
-            # No entanto, a lógica atual de timer_and_sound_task já lida com a retomada da contagem.
 
 
     # --- Funções removidas (simulate_action_press_ui, reset_visual_timer_ui) ---
 
     def ui_init_joystick_command(self):
-        global app_paused
-        if app_paused:
+        if engine_state.snapshot().paused:
             messagebox.showinfo("Pausado", "Despause a aplicação para verificar controles.", parent=self.master_root)
             return
         logging.info("Botão 'Verificar Controles' pressionado. A detecção é automática.")
         update_controller_status_ui("🔍 Verificando controles...")
-        if joystick is None or not (hasattr(joystick, 'get_init') and joystick.get_init()):
+        if engine_process is None:
+            controllers, status_text = len(device_registry), device_registry.status_text()
+        else:
+            controllers, status_text = engine_process.controllers()
+        if controllers == 0:
              update_controller_status_ui("⚠️ Nenhum controle detectado. Conecte um controle.")
         else:
-             update_controller_status_ui(f"🟢 {joystick.get_name()[:25]} (Verificado)")
+             update_controller_status_ui(f"{status_text} (Verificado)")
 
     def ui_on_app_closing(self, force_quit=False, restart=False): # `restart` não é mais usado aqui
-        global app_running, pygame_running, app_paused
+        global app_running, pygame_running
         confirmed_to_close = force_quit
         if not force_quit:
             confirmed_to_close = messagebox.askokcancel("Sair", "Você tem certeza que quer sair do FarmHelper Pro?", parent=self.master_root)
@@ -746,10 +3720,11 @@ class FarmHelperApp:
             logging.info("Usuário confirmou o fechamento pela GUI.")
             update_main_status_ui("🔄 Finalizando aplicação...")
             app_running = False    # Sinaliza para todas as threads principais pararem
-            app_paused = False     # Garante que não está mais pausado para permitir fechamento limpo
+            engine_state.update(paused=False) # Garante que não está mais pausado para permitir fechamento limpo
             pygame_running = False # Sinaliza para o loop do pygame parar
             
-            if timer_event: timer_event.set() # Acorda a thread do timer para que ela possa verificar app_running
+            timer_scheduler.stop() # Acorda a thread do timer para que ela possa encerrar
+            wake_pygame_loop() # Acorda o loop Pygame bloqueado em pygame.event.wait
 
             if pygame_thread_global and pygame_thread_global.is_alive():
                 logging.info("Aguardando thread Pygame...")
@@ -768,54 +3743,1063 @@ class FarmHelperApp:
             #     python = sys.executable
             #     os.execl(python, python, *sys.argv)
 
+# --- Métricas no formato do Prometheus ---
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+def render_prometheus_metrics():
+    """Estado atual do engine no formato de exposição de texto do Prometheus (0.0.4)."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_prometheus_labels(labels)} {float(value)!r}")
+
+    def per_timer(counts):
+        return [({"timer": name}, count) for name, count in sorted(counts.items())]
+
+    settings = engine_state.snapshot()
+    queue_stats = timer_scheduler.queue_stats()
+    alive = {thread.name for thread in threading.enumerate()}
+    metric("farmhelper_presses_total", "counter", "Presses do botão de ação sinalizados (controle e API de controle).",
+           per_timer(engine_counters.presses))
+    metric("farmhelper_presses_ignored_paused_total", "counter", "Presses ignorados por o engine estar pausado (input: feitos durante a pausa; timer: chegaram após pausar).",
+           [({"stage": "input"}, engine_counters.ignored_input), ({"stage": "timer"}, engine_counters.ignored_timer)])
+    metric("farmhelper_timer_starts_total", "counter", "Ciclos de timer iniciados.", per_timer(engine_counters.starts))
+    metric("farmhelper_timer_resets_total", "counter", "Ciclos rearmados antes de disparar.", per_timer(engine_counters.resets))
+    metric("farmhelper_timer_fires_total", "counter", "Disparos de timer.", per_timer(engine_counters.fires))
+    metric("farmhelper_prewarning_cues_total", "counter", "Avisos sonoros antes do fim.", [({}, engine_counters.cues)])
+    metric("farmhelper_active_timers", "gauge", "Timers em contagem.", [({}, len(timer_scheduler.active_timers()))])
+    metric("farmhelper_paused", "gauge", "1 se o engine está pausado.", [({}, settings.paused)])
+    metric("farmhelper_delay_seconds", "gauge", "Delay do timer principal.", [({}, settings.delay)])
+    metric("farmhelper_press_queue_depth", "gauge", "Presses na fila da thread do timer.", [({}, queue_stats["depth_now"])])
+    metric("farmhelper_press_queue_depth_max", "gauge", "Maior fila de presses vista.", [({}, queue_stats["depth_max"])])
+    metric("farmhelper_log_queue_depth", "gauge", "Registros de log aguardando a LogWriterThread.",
+           [({}, log_queue.qsize() if log_queue is not None else 0)])
+    metric("farmhelper_thread_up", "gauge", "1 se a thread está viva.",
+           [({"thread": name}, name in alive) for name in MONITORED_THREADS])
+    metric("farmhelper_thread_wakeups_total", "counter", "Despertares dos loops de espera de cada thread.",
+           [({"thread": name}, count) for name, count in sorted(wakeup_counter.snapshot().items())])
+    metric("farmhelper_thread_cpu_seconds_total", "counter", "CPU de cada thread (amostrada na leitura), com a instrumentação ligada.",
+           [({"thread": name}, cpu) for name, cpu in sorted((instrumentation.sample_thread_cpu() if instrumentation.enabled else {}).items())])
+    metric("farmhelper_ui_after_calls_total", "counter", "Callbacks agendados com ui_root.after, por thread que agenda.",
+           [({"thread": name}, count) for name, count in sorted(instrumentation.after_calls.snapshot().items())])
+    metric("farmhelper_loop_lag_seconds", "gauge", "Atraso de cada loop (tk, input, timer) na última verificação do watchdog.",
+           [({"loop": loop}, lag) for loop, lag in sorted(stall_watchdog.lags.items())])
+    metric("farmhelper_loop_stalls_total", "counter", "Travamentos (lag acima de --stall-threshold-ms) de cada loop.",
+           [({"loop": loop}, count) for loop, count in sorted(stall_watchdog.stall_counts.items())])
+    metric("farmhelper_uptime_seconds", "gauge", "Tempo desde o início do processo.", [({}, time.time() - program_start_time)])
+
+    name = "farmhelper_pipeline_latency_seconds"
+    lines.append(f"# HELP {name} Latência de cada estágio do pipeline (input, dispatch, firing = erro de disparo, playback, end_to_end).")
+    lines.append(f"# TYPE {name} histogram")
+    for stage, (cumulative, count, total) in pipeline_latency.buckets(METRICS_LATENCY_BUCKETS).items():
+        for bound, bucket_count in zip(METRICS_LATENCY_BUCKETS, cumulative):
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{bound!r}"}} {float(bucket_count)!r}')
+        lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {float(count)!r}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {float(total)!r}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {float(count)!r}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Endpoint HTTP local (GET /metrics) servido por uma thread própria, para um scraper do Prometheus.
+
+    A thread fica bloqueada no accept (handle_request sem timeout): zero despertares entre
+    scrapes. stop() a acorda com uma conexão para o próprio socket.
+    """
+    def __init__(self, port, host=METRICS_HOST):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        import http.server
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split("?", 1)[0] != "/metrics":
+                    handler.send_error(404)
+                    return
+                body = render_prometheus_metrics().encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, message_format, *args):
+                logging.debug("Métricas: " + message_format, *args)
+
+        self._server = http.server.HTTPServer((self.host, self.port), MetricsHandler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._loop, name="MetricsThread", daemon=True)
+        self._thread.start()
+        logging.info("Métricas do Prometheus em http://%s:%d/metrics", self.host, self.port)
+        return self
+
+    def _loop(self):
+        while not self._stopping:
+            self._server.handle_request()
+            wakeup_counter.tick("metrics")
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._stopping = True
+        try:
+            socket.create_connection((self.host, self.port), timeout=1.0).close()
+        except OSError:
+            pass
+        self._thread.join(timeout=1.0)
+        self._server.server_close()
+
+
+metrics_server = None # MetricsServer ativo com --metrics-port
+
+# --- API de controle local ---
+class ControlServer:
+    """API de controle local para scripts, stream decks etc.: asyncio numa thread própria (ControlThread).
+
+    Protocolo de linhas UTF-8: cada requisição é `COMANDO [argumentos]\\n` e cada resposta uma
+    linha `OK [dados]` ou `ERR mensagem`. Comandos (sem distinção de maiúsculas):
+      ARM [timer]     arma/reseta o timer (padrão: principal), como o botão de ação
+      PAUSE / RESUME  pausa ou retoma o engine
+      DELAY <s>       troca o delay do timer principal
+      BUTTON <n>      troca o botão de ação principal
+      SOUND <0|1>     liga/desliga o som do fim do timer
+      VOLUME <v>      volume do som, de 0 a 1
+      AUTO <0|1>      liga/desliga o ajuste automático do delay
+      PREWARNING [s]  antecedências dos avisos, ex: 3,2,1 (sem argumento = sem avisos)
+      PROFILE [s]     liga a instrumentação com uma janela de s segundos do profiler (0 = desliga)
+      STATE           estado atual em JSON compacto
+      PING            responde OK pong (medição de ida e volta)
+    Escuta num socket Unix (`path`); onde não há AF_UNIX (Windows) ou com `port`, usa TCP em
+    CONTROL_HOST. O loop asyncio só acorda quando chega uma requisição.
+    """
+    def __init__(self, path=None, port=None):
+        if path is not None and not hasattr(socket, "AF_UNIX"):
+            logging.warning("Sockets Unix indisponíveis nesta plataforma; API de controle em TCP %s:%s.",
+                            CONTROL_HOST, port or CONTROL_TCP_PORT_DEFAULT)
+            path, port = None, port or CONTROL_TCP_PORT_DEFAULT
+        self.path = path
+        self.port = port
+        self._loop = None
+        self._thread = None
+        self._error = None
+        self._commands = {"ARM": self._arm, "PAUSE": self._pause, "RESUME": self._resume, "DELAY": self._delay,
+                          "BUTTON": self._button, "SOUND": self._sound, "VOLUME": self._volume, "AUTO": self._auto,
+                          "PREWARNING": self._prewarning, "PROFILE": self._profile, "STATE": self._state, "PING": lambda args: "pong"}
+
+    @property
+    def address(self):
+        return self.path if self.path is not None else f"{CONTROL_HOST}:{self.port}"
+
+    def start(self):
+        """Sobe a thread e espera o socket estar escutando. Levanta OSError se não conseguir."""
+        import asyncio
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="ControlThread", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self._error is not None:
+            raise self._error
+        logging.info("API de controle escutando em %s", self.address)
+        return self
+
+    def _run(self, ready):
+        import asyncio
+        asyncio.set_event_loop(self._loop)
+        try:
+            if self.path is not None:
+                if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+                    os.unlink(self.path) # socket que sobrou de uma execução anterior
+                server = self._loop.run_until_complete(asyncio.start_unix_server(self._serve_client, path=self.path))
+            else:
+                server = self._loop.run_until_complete(asyncio.start_server(self._serve_client, CONTROL_HOST, self.port or 0))
+                self.port = server.sockets[0].getsockname()[1]
+        except OSError as e_bind:
+            self._error = e_bind
+            ready.set()
+            return
+        ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            server.close()
+            self._loop.run_until_complete(server.wait_closed())
+            self._loop.close()
+
+    async def _serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                wakeup_counter.tick("control")
+                writer.write(self.execute(line.decode("utf-8", "replace")).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def execute(self, line):
+        """Executa uma linha do protocolo e devolve a resposta (sem a quebra de linha)."""
+        parts = line.split(None, 1)
+        if not parts:
+            return "ERR comando vazio"
+        command = parts[0].upper()
+        handler = self._commands.get(command)
+        if handler is None:
+            return f"ERR comando desconhecido: {parts[0]}"
+        engine_counters.add(engine_counters.control_commands, command)
+        try:
+            result = handler(parts[1].strip() if len(parts) > 1 else "")
+        except ValueError as e_command:
+            return f"ERR {e_command}"
+        logging.debug("API de controle: %s -> %s", line.strip(), result)
+        return "OK" if result is None else f"OK {result}"
+
+    def _arm(self, args):
+        name = args or MAIN_TIMER_NAME
+        if name != MAIN_TIMER_NAME and name not in extra_timers:
+            raise ValueError(f"timer desconhecido: {name}")
+        if engine_state.snapshot().paused:
+            raise ValueError("engine pausado")
+        now = timer_scheduler.now()
+        timer_scheduler.signal_press(now, name, pressed_at=now)
+        register_press(name, "pela API de controle")
+
+    def _set_paused(self, paused):
+        app = FarmHelperApp.instance
+        if ui_root is not None and hasattr(app, "set_paused"):
+            schedule_ui(0, app.set_paused, paused) # A UI atualiza botão e contagem na thread do Tk
+        elif engine_state.snapshot().paused != paused:
+            pause_engine() if paused else resume_engine()
+            update_main_status_ui("⏸️ Pausado pela API de controle." if paused else "▶️ Retomado pela API de controle.")
+
+    def _pause(self, args):
+        self._set_paused(True)
+
+    def _resume(self, args):
+        self._set_paused(False)
+
+    def _delay(self, args):
+        delay = float(args)
+        if not delay > 0:
+            raise ValueError("o delay deve ser um número positivo")
+        engine_state.update(delay=delay)
+        set_ui_delay(delay)
+        logging.info("Delay alterado pela API de controle: %ss", delay)
+
+    def _button(self, args):
+        set_main_action_button(int(args))
+
+    @staticmethod
+    def _switch(args):
+        if args not in ("0", "1"):
+            raise ValueError("esperado 0 ou 1")
+        return args == "1"
+
+    def _sound(self, args):
+        engine_state.update(sound_enabled=self._switch(args))
+
+    def _volume(self, args):
+        volume = float(args)
+        if not 0.0 <= volume <= 1.0:
+            raise ValueError("o volume deve estar entre 0 e 1")
+        engine_state.update(volume=volume)
+        audio_worker.set_volume(volume)
+
+    def _auto(self, args):
+        engine_state.update(auto_delay=self._switch(args))
+
+    def _prewarning(self, args):
+        engine_state.update(prewarning=parse_prewarning_offsets(args))
+
+    def _profile(self, args):
+        seconds = float(args) if args else PROFILE_WINDOW_SECONDS_DEFAULT
+        if seconds < 0:
+            raise ValueError("a janela do perfil não pode ser negativa")
+        return instrumentation.set_enabled(seconds > 0, seconds)
+
+    def _state(self, args):
+        settings = engine_state.snapshot()
+        now = timer_scheduler.now()
+        return json.dumps({
+            "delay": settings.delay, "button": settings.action_button, "paused": settings.paused,
+            "sound": settings.sound_enabled, "volume": settings.volume, "auto_delay": settings.auto_delay,
+            "timers": {name: round(deadline - now, 3) for name, (deadline, _) in timer_scheduler.active_timers().items()},
+            "presses": action_press_count, "fires": timer_scheduler.fire_count, "cycle": timer_scheduler.cycle,
+            "lag_ms": {loop: round(lag * 1000, 1) for loop, lag in stall_watchdog.lags.items()}, "stalls": stall_watchdog.stall_total,
+        }, separators=(",", ":"))
+
+    def stop(self):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=2.0)
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def send_control_command(command, path=None, port=None, timeout=5.0):
+    """Cliente mínimo da API de controle: envia uma linha e devolve a resposta (usado por --control-send)."""
+    if path is not None and hasattr(socket, "AF_UNIX"):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = path
+    else:
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = (CONTROL_HOST, port or CONTROL_TCP_PORT_DEFAULT)
+    with client:
+        client.settimeout(timeout)
+        client.connect(address)
+        client.sendall(command.strip().encode("utf-8") + b"\n")
+        with client.makefile("rb") as responses:
+            return responses.readline().decode("utf-8").rstrip("\n")
+
+
+control_server = None # ControlServer ativo com --control
+
+# --- Engine em processo separado (--engine-process) ---
+EngineStatus = collections.namedtuple("EngineStatus", "published_at state remaining duration arms fires presses "
+                                                      "action_button delay controllers flags lag stalls status controller_status")
+
+
+class EngineStatusBlock:
+    """Estado ao vivo do engine num bloco de memória compartilhada (--engine-process), com seqlock.
+
+    Só o processo do engine escreve (as threads dele se revezam em `lock`) e a UI lê sem lock:
+    a sequência fica ímpar durante a escrita e par ao terminar, e o leitor descarta a leitura
+    se ela estava ímpar ou mudou no meio. Os instantes são time.time(), que vale nos dois
+    processos. Os textos de status são truncados em ENGINE_STATUS_TEXT_BYTES.
+    """
+    STATES = ("idle", "counting", "paused")
+    PAUSED, CONTROLLER_READY, SOUND_READY = 1, 2, 4 # Bits de EngineStatus.flags
+    READ_ATTEMPTS = 100
+    _SEQUENCE = struct.Struct("<I")
+    _LAYOUT = struct.Struct(f"<IdBddIIIhdBBdI{ENGINE_STATUS_TEXT_BYTES}s{ENGINE_STATUS_TEXT_BYTES}s")
+
+    def __init__(self, memory, owner):
+        self._memory = memory
+        self._owner = owner
+        self._sequence = 0
+        self.lock = threading.Lock()
+        self.status = ""            # Últimos textos publicados (quem publica só troca o que mudou)
+        self.controller_status = ""
+
+    @classmethod
+    def create(cls):
+        from multiprocessing import shared_memory
+        return cls(shared_memory.SharedMemory(create=True, size=cls._LAYOUT.size), owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        from multiprocessing import shared_memory
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    @staticmethod
+    def _encode(text):
+        # Corta na fronteira de um caractere UTF-8 (emojis têm 4 bytes)
+        return text.encode("utf-8")[:ENGINE_STATUS_TEXT_BYTES].decode("utf-8", "ignore").encode("utf-8")
+
+    def write(self, status):
+        """Publica um EngineStatus (chamar segurando `lock`)."""
+        self._LAYOUT.pack_into(self._memory.buf, 0, self._sequence + 1, status.published_at,
+                               self.STATES.index(status.state), status.remaining, status.duration, status.arms,
+                               status.fires, status.presses, -1 if status.action_button is None else status.action_button,
+                               status.delay, min(status.controllers, 255), status.flags, status.lag, status.stalls,
+                               self._encode(status.status), self._encode(status.controller_status))
+        self._sequence += 2
+        self._SEQUENCE.pack_into(self._memory.buf, 0, self._sequence)
+
+    def sequence(self):
+        return self._SEQUENCE.unpack_from(self._memory.buf)[0]
+
+    def read(self):
+        """Último EngineStatus publicado; None se nada foi publicado ou se a leitura não estabilizou."""
+        for _ in range(self.READ_ATTEMPTS):
+            fields = self._LAYOUT.unpack_from(self._memory.buf)
+            if fields[0] % 2 == 0 and self.sequence() == fields[0]:
+                break
+        else:
+            return None
+        (sequence, published_at, state, remaining, duration, arms, fires, presses,
+         action_button, delay, controllers, flags, lag, stalls, status, controller_status) = fields
+        if sequence == 0:
+            return None
+        return EngineStatus(published_at, self.STATES[state], remaining, duration, arms, fires, presses,
+                            None if action_button < 0 else action_button, delay, controllers, flags, lag, stalls,
+                            status.rstrip(b"\0").decode("utf-8", "replace"),
+                            controller_status.rstrip(b"\0").decode("utf-8", "replace"))
+
+    def close(self):
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+
+def publish_engine_status(status=None, controller_status=None):
+    """No processo do engine (--engine-process): publica o estado atual no bloco compartilhado com a UI.
+
+    `status`/`controller_status` trocam o texto correspondente; None mantém o último publicado.
+    """
+    block = engine_status_block
+    if block is None:
+        return
+    with block.lock: # O snapshot é montado e escrito sem intercalar com outra thread
+        if status is not None:
+            block.status = status
+        if controller_status is not None:
+            block.controller_status = controller_status
+        state, remaining = timer_scheduler.status()
+        settings = engine_state.snapshot()
+        flags = ((EngineStatusBlock.PAUSED if settings.paused else 0)
+                 | (EngineStatusBlock.CONTROLLER_READY if "controller_ready" in startup_timeline.marks else 0)
+                 | (EngineStatusBlock.SOUND_READY if "sound_ready" in startup_timeline.marks else 0))
+        block.write(EngineStatus(
+            time.time(), state, remaining, timer_scheduler.duration(),
+            engine_counters.starts.get(MAIN_TIMER_NAME, 0) + engine_counters.resets.get(MAIN_TIMER_NAME, 0),
+            engine_counters.fires.get(MAIN_TIMER_NAME, 0), action_press_count, settings.action_button, settings.delay,
+            len(device_registry), flags, max(stall_watchdog.recent_peaks().values(), default=0.0), stall_watchdog.stall_total,
+            block.status, block.controller_status))
+
+
+class EngineProcess:
+    """Lado da UI do --engine-process: o engine (pygame, scheduler, áudio) roda num processo filho.
+
+    O filho (engine_process_main) publica o estado do timer principal num EngineStatusBlock; a
+    UI lê o bloco a cada ENGINE_PROCESS_POLL_MS no loop do Tk e transforma as mudanças nos
+    mesmos eventos que as threads do engine entregariam (on_timer_event, status, presses).
+    O que muda no engine_state da UI vira comando da API de controle num multiprocessing.Pipe.
+    Assim o Tk não disputa o GIL com o input e o timer; a tela pode atrasar até um intervalo
+    de leitura, o som não (não passa pela UI).
+    """
+    def __init__(self, options):
+        self.options = options
+        self.block = None
+        self.process = None
+        self.last_status = None
+        self._commands = None
+        self._commands_lock = threading.Lock()
+        self._settings = None # engine_state que o filho já conhece (enviado pela UI ou publicado por ele)
+        self._sequence = 0
+
+    def start(self):
+        import multiprocessing
+        context = multiprocessing.get_context("spawn") # Mesmo comportamento no Linux, macOS e Windows
+        self.block = EngineStatusBlock.create()
+        receiver, self._commands = context.Pipe(duplex=False)
+        self._settings = engine_state.snapshot()
+        self.process = context.Process(target=engine_process_main, name="EngineProcess", daemon=True,
+                                       args=(receiver, self.block.name, self._settings._asdict(), vars(self.options)))
+        self.process.start()
+        receiver.close()
+        engine_state.add_listener(self.on_settings_change)
+        logging.info("Processo do engine iniciado (pid %s, bloco %s).", self.process.pid, self.block.name)
+        self.poll()
+        return self
+
+    def send(self, command):
+        with self._commands_lock:
+            try:
+                self._commands.send(command)
+            except (OSError, ValueError) as e_send:
+                logging.error("Comando '%s' não entregue ao processo do engine: %s", command, e_send)
+
+    def controllers(self):
+        """(quantidade, texto de status) dos controles, pelo último estado publicado."""
+        status = self.last_status
+        return (status.controllers, status.controller_status) if status else (0, "")
+
+    def on_settings_change(self, settings):
+        """Listener do engine_state da UI: repassa ao filho só o que ele ainda não tem."""
+        if not app_running: # Fechando: o STOP encerra o filho no estado em que ele estiver
+            return
+        known, self._settings = self._settings, settings
+        if settings.paused != known.paused:
+            self.send("PAUSE" if settings.paused else "RESUME")
+        if settings.delay != known.delay:
+            self.send(f"DELAY {settings.delay!r}")
+        if settings.action_button != known.action_button and settings.action_button is not None:
+            self.send(f"BUTTON {settings.action_button}")
+        if settings.sound_enabled != known.sound_enabled:
+            self.send(f"SOUND {int(settings.sound_enabled)}")
+        if settings.volume != known.volume:
+            self.send(f"VOLUME {settings.volume!r}")
+        if settings.auto_delay != known.auto_delay:
+            self.send(f"AUTO {int(settings.auto_delay)}")
+        if settings.prewarning != known.prewarning:
+            self.send("PREWARNING " + ",".join(f"{offset!r}" for offset in settings.prewarning))
+
+    def poll(self):
+        """Tick do Tk: aplica o estado novo publicado pelo filho e percebe se ele morreu."""
+        if self.process is None or not (ui_root and ui_root.winfo_exists()):
+            return
+        wakeup_counter.tick("engine_poll")
+        sequence = self.block.sequence()
+        if sequence != self._sequence:
+            status = self.block.read()
+            if status is not None:
+                self._sequence = sequence
+                self.apply(status)
+        if not self.process.is_alive():
+            if app_running: # Como quando a PygameThread termina sozinha
+                logging.error("Processo do engine encerrou inesperadamente (código %s).", self.process.exitcode)
+                ui_controller_status_var.set("🔴 Processo do engine encerrado.")
+                ui_root.event_generate("<<AppClosing>>")
+            return
+        schedule_ui(ENGINE_PROCESS_POLL_MS, self.poll)
+
+    def apply(self, status):
+        """Transforma a diferença para o último estado publicado em atualizações da UI (thread do Tk)."""
+        global action_press_count, capturing_button_mode
+        last = self.last_status or EngineStatus(0.0, "idle", 0.0, 0.0, 0, 0, 0, status.action_button, status.delay,
+                                                0, 0, 0.0, 0, "", "")
+        self.last_status = status
+        app = FarmHelperApp.instance
+        if status.status != last.status and status.status:
+            ui_status_var.set(status.status)
+        if status.controller_status != last.controller_status and status.controller_status:
+            ui_controller_status_var.set(status.controller_status)
+        if status.presses != last.presses:
+            action_press_count = status.presses
+            update_action_press_count_ui()
+        if status.flags & EngineStatusBlock.CONTROLLER_READY:
+            startup_timeline.mark("controller_ready")
+        if status.flags & EngineStatusBlock.SOUND_READY:
+            startup_timeline.mark("sound_ready")
+
+        # Mudanças que nasceram no filho (ajuste automático, captura, API de controle): anotadas
+        # em _settings antes de chegar ao engine_state, para o listener não as mandar de volta
+        paused = bool(status.flags & EngineStatusBlock.PAUSED)
+        reported = {}
+        if status.delay != last.delay:
+            reported["delay"] = status.delay
+        if status.action_button != last.action_button:
+            reported["action_button"] = status.action_button
+        if paused != bool(last.flags & EngineStatusBlock.PAUSED):
+            reported["paused"] = paused
+        if reported:
+            self._settings = self._settings._replace(**reported)
+            engine_state.update(**{field: value for field, value in reported.items() if field != "paused"})
+        if "delay" in reported:
+            ui_delay_var.set(f"{status.delay:.1f}")
+        if "action_button" in reported:
+            update_action_button_display_ui()
+            if capturing_button_mode:
+                capturing_button_mode = False
+                if app and hasattr(app, 'define_button_btn') and app.define_button_btn.winfo_exists():
+                    app.define_button_btn.config(state=tk.NORMAL, text="🎯 Definir Botão de Ação")
+        if app is None:
+            return
+        if "paused" in reported:
+            app.set_paused(paused) # Não faz nada se a pausa veio da própria UI
+
+        if status.fires != last.fires:
+            app.on_timer_event("fired", duration=status.duration)
+        if status.state == "counting" and (status.arms != last.arms or last.state != "counting"):
+            deadline = timer_scheduler.now() + status.remaining - (time.time() - status.published_at)
+            app.on_timer_event("started", deadline, status.duration)
+        elif status.state == "paused" and last.state != "paused":
+            app.on_timer_event("paused", duration=status.duration, remaining=status.remaining)
+
+    def stop(self, timeout=ENGINE_PROCESS_STOP_TIMEOUT):
+        if self.process is None:
+            return
+        self.send("STOP")
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logging.warning("Processo do engine não encerrou em %.1fs; terminando.", timeout)
+            self.process.terminate()
+            self.process.join(1.0)
+        logging.info("Processo do engine encerrado (código %s).", self.process.exitcode)
+        self._commands.close()
+        self.block.close()
+        self.process = None
+
+
+def engine_command_loop(commands):
+    """EngineCommandThread: executa as linhas que a UI manda pelo pipe até STOP (ou o pipe fechar).
+
+    Usa o despachante da API de controle, mais dois comandos que só existem aqui: STOP e
+    CAPTURE <0|1> (liga/desliga a captura do botão de ação na PygameThread). PAUSE/RESUME
+    vêm da própria UI, então não mudam o texto de status.
+    """
+    global app_running, pygame_running, capturing_button_mode
+    dispatcher = ControlServer() # Só o despachante do protocolo; nenhum socket é aberto
+    while True:
+        try:
+            line = commands.recv()
+        except (EOFError, OSError):
+            logging.warning("Pipe de comandos da UI fechado; encerrando o engine.")
+            break
+        wakeup_counter.tick("engine_commands")
+        command, _, argument = line.partition(" ")
+        if command == "STOP":
+            logging.info("STOP recebido da UI.")
+            break
+        if command == "CAPTURE":
+            capturing_button_mode = argument == "1"
+        elif command in ("PAUSE", "RESUME"):
+            if engine_state.snapshot().paused != (command == "PAUSE"):
+                pause_engine() if command == "PAUSE" else resume_engine()
+        else:
+            response = dispatcher.execute(line)
+            if not response.startswith("OK"):
+                logging.error("Comando da UI '%s' falhou: %s", line, response)
+        publish_engine_status()
+    app_running = False
+    pygame_running = False
+    engine_state.wake_waiters()
+    wake_pygame_loop()
+
+
+def engine_process_main(commands, block_name, settings, options):
+    """Processo filho do --engine-process: pygame_loop, timer_and_sound_task e áudio, sem Tk.
+
+    Recebe o engine_state da UI (`settings`, como dict) e os argumentos da linha de comando
+    (`options`), sobe os mesmos serviços do processo único (histórico, métricas, API de
+    controle, gravação) e publica o estado no EngineStatusBlock `block_name` até a UI mandar
+    STOP, fechar o pipe ou o pygame parar.
+    """
+    global log_file_path, engine_state, engine_status_block, pygame_thread_global, timer_sound_thread_global
+    options = argparse.Namespace(**options)
+    log_file_path = user_data_path(ENGINE_LOG_FILENAME)
+    configure_logging(options.log_level, options.log_max_bytes, options.log_backups)
+    logging.info(LOG_MSG_ENGINE_STARTED, os.getpid())
+    engine_state = EngineState(**settings)
+    load_extra_timers() # Depois do engine_state: valida os botões contra o botão de ação da UI
+    engine_status_block = EngineStatusBlock.attach(block_name)
+    startup_timeline.milestones = tuple(name for name in StartupTimeline.MILESTONES if name != "window_shown")
+    startup_timeline.on_complete = lambda marks: publish_engine_status()
+    try:
+        if options.precision_timer:
+            enable_precision_timer(options.spin_threshold_ms)
+        if options.profile:
+            instrumentation.set_enabled(True, options.profile)
+        if options.stall_threshold_ms > 0:
+            stall_watchdog.start(options.stall_threshold_ms)
+        start_engine_services(options)
+        timer_sound_thread_global = threading.Thread(target=timer_and_sound_task, name="TimerSoundThread", daemon=True)
+        timer_sound_thread_global.start()
+        pygame_thread_global = threading.Thread(target=pygame_loop, name="PygameThread", daemon=True)
+        pygame_thread_global.start()
+        threading.Thread(target=engine_command_loop, args=(commands,), name="EngineCommandThread", daemon=True).start()
+        pygame_thread_global.join()
+    except Exception as e_engine:
+        logging.critical("Erro fatal no processo do engine: %s", e_engine, exc_info=True)
+    finally:
+        shutdown_engine()
+        engine_status_block.close()
+        shutdown_logging()
+
+
 pygame_thread_global = None
 timer_sound_thread_global = None
 
+def parse_command_line(argv=None):
+    parser = argparse.ArgumentParser(description="FarmHelper Pro - Gaming Timer Assistant")
+    parser.add_argument("--log-level", default=LOG_LEVEL_DEFAULT, type=str.upper,
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+                        help=f"Nível mínimo do log (padrão: {LOG_LEVEL_DEFAULT})")
+    parser.add_argument("--log-max-bytes", default=LOG_MAX_BYTES_DEFAULT, type=int,
+                        help="Tamanho máximo do arquivo de log antes de rotacionar (0 = sem limite)")
+    parser.add_argument("--low-latency-audio", action="store_true",
+                        help=f"Usa buffer de áudio de {AUDIO_LOW_LATENCY_BUFFER_SIZE} amostras (menor latência)")
+    parser.add_argument("--audio-buffer", type=int, default=None,
+                        help=f"Tamanho do buffer do mixer em amostras (padrão: {AUDIO_BUFFER_SIZE})")
+    parser.add_argument("--audio-frequency", type=int, default=AUDIO_FREQUENCY,
+                        help=f"Taxa de amostragem do mixer em Hz (padrão: {AUDIO_FREQUENCY})")
+    parser.add_argument("--no-history", action="store_true",
+                        help=f"Não grava o histórico de sessões ({HISTORY_FILENAME})")
+    parser.add_argument("--persist-sounds", action="store_true",
+                        help=f"Salva os sons sintetizados em {TONE_CACHE_DIRNAME}/ para as próximas execuções não sintetizarem de novo")
+    parser.add_argument("--log-backups", default=LOG_BACKUP_COUNT_DEFAULT, type=int,
+                        help="Quantos arquivos de log antigos manter (0 = sobrescreve o log a cada execução)")
+    parser.add_argument("--exit-after-startup", action="store_true",
+                        help="Imprime a linha do tempo de inicialização (JSON) e fecha (benchmarks/bench_startup.py)")
+    parser.add_argument("--prewarning", metavar="SEGUNDOS", default=None,
+                        help="Antecedências dos ticks de aviso, ex: 3,2,1 (vazio = sem avisos; padrão: "
+                             f"{','.join(f'{offset:g}' for offset in PREWARNING_OFFSETS_DEFAULT)})")
+    parser.add_argument("--input-mode", choices=INPUT_MODES, default=INPUT_MODE,
+                        help=f"Loop de entrada: \"poll\" (sleep de {INPUT_POLL_INTERVAL_SECONDS * 1000:g} ms, menos CPU ociosa) ou "
+                             f"\"event\" (~1 ms de latência, ~2x a CPU ociosa) (padrão: {INPUT_MODE})")
+    parser.add_argument("--precision-timer", action="store_true",
+                        help="Modo de precisão do timer: dorme até perto do deadline e termina em espera ativa. Custo global "
+                             "enquanto ligado: o GIL troca de thread com mais frequência em todo o processo e, no Windows, "
+                             "a resolução do timer do sistema vai a 1 ms (mais despertares e consumo de energia)")
+    parser.add_argument("--spin-threshold-ms", type=float, default=TIMER_SPIN_THRESHOLD_MS_DEFAULT,
+                        help=f"Com --precision-timer: ms finais em espera ativa (padrão: {TIMER_SPIN_THRESHOLD_MS_DEFAULT})")
+    parser.add_argument("--profile", type=float, nargs="?", const=PROFILE_WINDOW_SECONDS_DEFAULT, default=None, metavar="SEGUNDOS",
+                        help=f"Liga a instrumentação (CPU por thread, after() por segundo) e grava um perfil por amostragem "
+                             f"de SEGUNDOS (padrão: {PROFILE_WINDOW_SECONDS_DEFAULT:g}) em {PROFILE_FILENAME_PREFIX}_*.folded")
+    parser.add_argument("--stall-threshold-ms", type=float, default=STALL_THRESHOLD_MS_DEFAULT, metavar="MS",
+                        help=f"Atraso de um loop (Tk, input, timer) que conta como travamento e grava as pilhas no log "
+                             f"(padrão: {STALL_THRESHOLD_MS_DEFAULT}; 0 desliga o watchdog)")
+    parser.add_argument("--engine-process", action="store_true",
+                        help=f"Roda o engine (pygame, timer, áudio) num processo separado da janela (log em {ENGINE_LOG_FILENAME})")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORTA",
+                        help=f"Expõe métricas no formato do Prometheus em http://{METRICS_HOST}:PORTA/metrics")
+    control_group = parser.add_argument_group("API de controle local")
+    control_group.add_argument("--control", action="store_true",
+                               help=f"Abre a API de controle no socket Unix {CONTROL_SOCKET_FILENAME} ao lado do log "
+                                    f"(sem sockets Unix: TCP {CONTROL_HOST}:{CONTROL_TCP_PORT_DEFAULT})")
+    control_group.add_argument("--control-socket", metavar="CAMINHO", default=None, help="Caminho do socket Unix da API de controle")
+    control_group.add_argument("--control-port", type=int, default=None, metavar="PORTA",
+                               help=f"Usa TCP em {CONTROL_HOST}:PORTA em vez do socket Unix")
+    control_group.add_argument("--control-send", metavar="COMANDO", default=None,
+                               help="Envia um comando (ex: ARM, PAUSE, \"DELAY 5.5\", STATE) para a instância em execução e fecha")
+    parser.add_argument("--record-input", metavar="ARQUIVO", default=None,
+                        help="Grava presses, pausas e disparos num arquivo binário para --replay-input")
+    parser.add_argument("--replay-input", metavar="ARQUIVO", default=None,
+                        help="Reproduz uma gravação no engine (sem janela nem som), confere os disparos e fecha")
+    parser.add_argument("--replay-realtime", action="store_true",
+                        help="Com --replay-input: reproduz em tempo real em vez de acelerado")
+    parser.add_argument("--analyze-log", metavar="ARQUIVO", nargs="*", default=None,
+                        help=f"Analisa logs de sessões (padrão: {LOG_FILENAME} e os backups da rotação): ritmo dos ciclos, "
+                             f"resets, tempo pausado e precisão do timer; imprime o relatório e fecha (precisa do NumPy)")
+    parser.add_argument("--analyze-csv", metavar="ARQUIVO", default=None,
+                        help="Com --analyze-log: grava também um CSV com um registro (press, início, reset, disparo, pausa) por linha")
+    headless_group = parser.add_argument_group("modo headless (sem janela, sem Tk)")
+    headless_group.add_argument("--headless", action="store_true",
+                                help="Roda só o engine de input/timer/som, com status no terminal")
+    headless_group.add_argument("--config", default=None,
+                                help="JSON com delay, button, volume, sound_enabled, auto_delay e timers (argumentos abaixo têm prioridade)")
+    headless_group.add_argument("--delay", type=float, default=None, help=f"Delay do timer principal em segundos (padrão: {INITIAL_DELAY_SECONDS})")
+    headless_group.add_argument("--button", type=int, default=None, help=f"Índice do botão de ação (padrão: {ACTION_BUTTON_INDEX_DEFAULT})")
+    headless_group.add_argument("--volume", type=float, default=None, help="Volume do som, de 0 a 1")
+    headless_group.add_argument("--no-sound", action="store_true", help="Não toca som ao finalizar o timer")
+    headless_group.add_argument("--auto-delay", action="store_true",
+                                help="Ajusta o delay automaticamente ao ritmo observado dos presses")
+    return parser.parse_args(argv)
+
+startup_timeline.mark("import")
+
+def on_window_shown():
+    """Primeiro idle do mainloop: a janela já está desenhada, então agora sobe o pygame (import + init) ou o processo do engine."""
+    global pygame_thread_global
+    startup_timeline.mark("window_shown")
+    stall_watchdog.tk_beat() # O Tk passa a ser vigiado a partir do primeiro idle do mainloop
+    if engine_process is not None:
+        engine_process.start() # Pygame, timer e áudio no processo filho
+        return
+    pygame_thread_global = threading.Thread(target=pygame_loop, name="PygameThread", daemon=True)
+    pygame_thread_global.start()
+    logging.info("PygameThread iniciada.")
+
+def exit_after_startup(marks):
+    global app_running, pygame_running
+    print(json.dumps({"startup_ms": {name: elapsed * 1000 for name, elapsed in marks.items()},
+                      "module_started_epoch": time.time() - (time.perf_counter() - MODULE_IMPORT_STARTED_AT)}),
+          flush=True)
+    if ui_root:
+        schedule_ui(0, FarmHelperApp.instance.ui_on_app_closing, True)
+    else: # headless: run_headless vê app_running e encerra
+        app_running = False
+        pygame_running = False
+        wake_pygame_loop()
+
+def apply_headless_config(config_path=None, delay=None, button=None, volume=None, no_sound=False, auto_delay=False):
+    """Configura o engine para o modo headless: arquivo JSON primeiro, argumentos da linha de comando por cima.
+
+    Arquivo: {"delay": 5.2, "button": 5, "volume": 0.7, "sound_enabled": true, "auto_delay": false,
+              "prewarning": [3, 2, 1], "timers": [...]}
+    ("timers" no mesmo formato de TIMERS_CONFIG_FILENAME). Levanta ValueError se algo for inválido.
+    """
+    settings = engine_state.snapshot()
+    config = {}
+    if config_path:
+        try:
+            with open(config_path, encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e_config:
+            raise ValueError(f"arquivo de configuração inválido ({config_path}): {e_config}") from e_config
+    button = int(button if button is not None else config.get("button", settings.action_button))
+    if "timers" in config:
+        load_extra_timers(config_path, main_button=button)
+    owner = extra_timer_for_button(button)
+    if owner is not None:
+        raise ValueError(f"o botão {button} já é do timer extra '{owner}'")
+    delay = float(delay if delay is not None else config.get("delay", settings.delay))
+    volume = float(volume if volume is not None else config.get("volume", settings.volume))
+    if delay <= 0:
+        raise ValueError("o delay deve ser um número positivo")
+    if not 0.0 <= volume <= 1.0:
+        raise ValueError("o volume deve estar entre 0 e 1")
+    prewarning = settings.prewarning
+    if "prewarning" in config:
+        prewarning = parse_prewarning_offsets(",".join(str(offset) for offset in config["prewarning"] or ()))
+    settings = engine_state.update(
+        delay=delay, volume=volume, prewarning=prewarning,
+        action_button=button,
+        sound_enabled=bool(config.get("sound_enabled", settings.sound_enabled)) and not no_sound,
+        auto_delay=bool(config.get("auto_delay", settings.auto_delay)) or auto_delay)
+    logging.info("Configuração headless: delay %.2fs%s, botão %s, volume %.2f, som %s, timers extras: %s",
+                 settings.delay, " (ajuste automático)" if settings.auto_delay else "", settings.action_button, settings.volume,
+                 "habilitado" if settings.sound_enabled else "desabilitado", ", ".join(extra_timers) or "nenhum")
+
+def start_engine_services(options):
+    """Áudio, cache de sons, histórico, métricas, API de controle e gravação de input conforme a linha de comando.
+
+    Roda no processo que tem o engine: o único, ou o filho com --engine-process.
+    """
+    global AUDIO_FREQUENCY, AUDIO_BUFFER_SIZE, INPUT_MODE, history_store, metrics_server, control_server, input_recorder
+    INPUT_MODE = options.input_mode
+    if options.persist_sounds:
+        tone_cache.persist_dir = user_data_path(TONE_CACHE_DIRNAME)
+    AUDIO_FREQUENCY = options.audio_frequency
+    if options.audio_buffer:
+        AUDIO_BUFFER_SIZE = options.audio_buffer
+    elif options.low_latency_audio:
+        AUDIO_BUFFER_SIZE = AUDIO_LOW_LATENCY_BUFFER_SIZE
+    if not options.no_history:
+        history_store = HistoryStore(user_data_path(HISTORY_FILENAME)).start()
+    if options.metrics_port is not None:
+        try:
+            metrics_server = MetricsServer(options.metrics_port).start()
+        except OSError as e_metrics:
+            logging.error("Não foi possível abrir o endpoint de métricas na porta %s: %s", options.metrics_port, e_metrics)
+    if options.control or options.control_socket or options.control_port is not None:
+        try:
+            control_server = ControlServer(
+                None if options.control_port is not None else (options.control_socket or user_data_path(CONTROL_SOCKET_FILENAME)),
+                options.control_port).start()
+        except OSError as e_control:
+            logging.error("Não foi possível abrir a API de controle: %s", e_control)
+    if options.record_input:
+        try:
+            input_recorder = InputRecorder.open(options.record_input, timer_scheduler.now())
+            logging.info("Gravando input em %s", options.record_input)
+        except OSError as e_record:
+            logging.error("Não foi possível gravar o input em %s: %s", options.record_input, e_record)
+
+def shutdown_engine():
+    """Para as threads do engine e fecha os serviços (com --engine-process, para o processo filho)."""
+    global app_running, pygame_running
+    app_running = False
+    pygame_running = False
+    stall_watchdog.stop() # Antes de parar as threads: a espera pelo join não é travamento
+    engine_state.update(paused=False) # Garante que está despausado para finalização
+    timer_scheduler.stop()
+    wake_pygame_loop()
+
+    if pygame_thread_global and pygame_thread_global.is_alive():
+        pygame_thread_global.join(timeout=0.5)
+    if timer_sound_thread_global and timer_sound_thread_global.is_alive():
+        timer_sound_thread_global.join(timeout=0.5)
+
+    disable_precision_timer() # Threads do engine já paradas: nada mais depende da troca curta do GIL
+    if engine_process is not None:
+        engine_process.stop() # O filho exporta as latências e registra as métricas no log dele
+    else:
+        try:
+            latency_report_path = os.path.join(os.path.dirname(log_file_path), LATENCY_REPORT_FILENAME)
+            pipeline_latency.export(latency_report_path)
+            logging.info("Histogramas de latência exportados para %s", latency_report_path)
+        except OSError as e_export:
+            logging.error("Falha ao exportar histogramas de latência: %s", e_export)
+    if history_store is not None:
+        history_store.close()
+    if metrics_server is not None:
+        metrics_server.stop()
+    if control_server is not None:
+        control_server.stop()
+    if input_recorder is not None:
+        input_recorder.close()
+        logging.info("Gravação de input encerrada: %d eventos.", input_recorder.events)
+    if engine_process is None:
+        logging.info("Métricas do engine: %s", format_engine_metrics())
+        logging.info("Ritmo da sessão: %s", cycle_analytics.snapshot())
+    logging.info("Despertares por thread (média da sessão): %s", wakeup_counter.format_rates())
+    logging.info("ui_root.after agendados por thread (média da sessão): %s", instrumentation.after_calls.format_rates())
+    logging.info("Lag dos loops na sessão: %s", stall_watchdog.format_summary())
+    if instrumentation.enabled:
+        instrumentation.set_enabled(False) # Grava o perfil em andamento
+        logging.info("CPU por thread (total): %s", instrumentation.format_cpu_totals())
+    logging.info("Tempo gasto em chamadas de logging por thread: %s", logging_overhead_report())
+    logging.info("------------------ FIM DA EXECUÇÃO ------------------")
+
+def run_headless():
+    """Roda o engine (pygame_loop + timer_and_sound_task) sem Tk até o pygame parar ou Ctrl+C.
+
+    A thread principal só dorme no join da PygameThread e imprime um resumo a cada
+    HEADLESS_STATS_INTERVAL_SECONDS.
+    """
+    global headless_console, pygame_thread_global, timer_sound_thread_global
+    headless_console = HeadlessConsole()
+    startup_timeline.milestones = tuple(name for name in StartupTimeline.MILESTONES if name != "window_shown")
+    settings = engine_state.snapshot()
+    headless_console.line(f"FarmHelper Pro (headless): delay {settings.delay:.1f}s, botão de ação {settings.action_button}, "
+                          f"som {'habilitado' if settings.sound_enabled else 'desabilitado'} (volume {settings.volume:.0%}). Ctrl+C para sair.")
+    for definition in extra_timers.values():
+        headless_console.line(f"Timer extra '{definition.name}': botão {definition.button}, delay {definition.delay:.1f}s")
+
+    timer_sound_thread_global = threading.Thread(target=timer_and_sound_task, name="TimerSoundThread", daemon=True)
+    timer_sound_thread_global.start()
+    pygame_thread_global = threading.Thread(target=pygame_loop, name="PygameThread", daemon=True)
+    pygame_thread_global.start()
+    logging.info("Threads do engine iniciadas (headless).")
+    instrumentation_mark = None # Base das taxas da linha de instrumentação do console
+    try:
+        while app_running and pygame_thread_global.is_alive():
+            pygame_thread_global.join(timeout=HEADLESS_STATS_INTERVAL_SECONDS)
+            if app_running and pygame_thread_global.is_alive():
+                headless_console.line(f"Em execução há {format_runtime()} | ações: {action_press_count} | "
+                                      f"timers ativos: {', '.join(timer_scheduler.active_timers()) or 'nenhum'} | "
+                                      f"delay {engine_state.snapshot().delay:.1f}s")
+                headless_console.line(cycle_analytics.format_summary().replace("\n", " | "))
+                if stall_watchdog.is_running():
+                    headless_console.line(stall_watchdog.format_indicator())
+                if instrumentation.enabled:
+                    report = instrumentation.report(instrumentation_mark)
+                    instrumentation_mark = report["mark"]
+                    headless_console.line(instrumentation.format_report(report).replace("\n", " | "))
+    except KeyboardInterrupt:
+        headless_console.line("Ctrl+C recebido. Encerrando...")
+        logging.info("Modo headless interrompido pelo usuário (Ctrl+C).")
+
 if __name__ == "__main__":
+    if getattr(sys, "frozen", False): # Executável empacotado: o filho do --engine-process entra por aqui
+        import multiprocessing
+        multiprocessing.freeze_support()
+    cli_args = parse_command_line()
+    if cli_args.control_send:
+        control_path = None if cli_args.control_port is not None else (cli_args.control_socket or user_data_path(CONTROL_SOCKET_FILENAME))
+        try:
+            print(send_control_command(cli_args.control_send, control_path, cli_args.control_port))
+        except OSError as e_send:
+            sys.exit(f"API de controle indisponível: {e_send}")
+        sys.exit(0)
+    if cli_args.analyze_log is not None: # Antes de configure_logging: não rotaciona nem escreve no log analisado
+        log_paths = cli_args.analyze_log or log_files_in_order(log_file_path)
+        if not log_paths:
+            sys.exit(f"Nenhum log encontrado em {log_file_path}")
+        try:
+            print(format_log_analysis(analyze_log(log_paths, cli_args.analyze_csv)))
+        except ImportError:
+            sys.exit("A análise do log precisa do NumPy (pip install numpy)")
+        except OSError as e_analyze:
+            sys.exit(f"Falha ao ler o log: {e_analyze}")
+        sys.exit(0)
+    configure_logging(cli_args.log_level, cli_args.log_max_bytes, cli_args.log_backups)
+    logging.info(LOG_SESSION_SEPARATOR)
+    logging.info(LOG_MSG_SESSION_START)
+    logging.info("SOUND_FILE_PATH definido como: %s", SOUND_FILE_PATH)
+    load_extra_timers()
+    if cli_args.replay_input:
+        try:
+            replay_report = replay_recording(cli_args.replay_input, realtime=cli_args.replay_realtime)
+        except (OSError, ValueError) as e_replay:
+            logging.error("Falha no replay de %s: %s", cli_args.replay_input, e_replay)
+            shutdown_logging()
+            sys.exit(f"Falha no replay: {e_replay}")
+        print(format_replay_report(replay_report))
+        logging.info("Replay de %s: %s", cli_args.replay_input, replay_report)
+        shutdown_logging()
+        sys.exit(0 if replay_report["ok"] else 1)
+    if cli_args.headless:
+        try:
+            apply_headless_config(cli_args.config, cli_args.delay, cli_args.button, cli_args.volume, cli_args.no_sound,
+                                  cli_args.auto_delay)
+        except ValueError as e_config:
+            logging.error("Configuração headless inválida: %s", e_config)
+            shutdown_logging()
+            sys.exit(f"Configuração inválida: {e_config}")
+    else:
+        load_tkinter()
+    if cli_args.prewarning is not None:
+        try:
+            engine_state.update(prewarning=parse_prewarning_offsets(cli_args.prewarning))
+        except ValueError as e_prewarning:
+            logging.error("--prewarning inválido: %s", e_prewarning)
+            shutdown_logging()
+            sys.exit(f"--prewarning inválido: {e_prewarning}")
+    if cli_args.precision_timer:
+        try:
+            enable_precision_timer(cli_args.spin_threshold_ms)
+        except ValueError as e_precision:
+            logging.error("--spin-threshold-ms inválido: %s", e_precision)
+            shutdown_logging()
+            sys.exit(f"--spin-threshold-ms inválido: {e_precision}")
+    if cli_args.profile is not None:
+        if not cli_args.profile > 0:
+            logging.error("--profile inválido: %s", cli_args.profile)
+            shutdown_logging()
+            sys.exit("--profile inválido: a janela deve ser positiva")
+        instrumentation.set_enabled(True, cli_args.profile)
+    if cli_args.stall_threshold_ms < 0:
+        logging.error("--stall-threshold-ms inválido: %s", cli_args.stall_threshold_ms)
+        shutdown_logging()
+        sys.exit("--stall-threshold-ms inválido: use 0 para desligar ou um limiar positivo")
+    if cli_args.stall_threshold_ms > 0: # Com --engine-process, o da UI só vigia o Tk; o filho vigia input e timer
+        stall_watchdog.start(cli_args.stall_threshold_ms)
+    if cli_args.engine_process and not cli_args.headless:
+        engine_process = EngineProcess(cli_args) # Iniciado quando a janela aparece (on_window_shown)
+    else:
+        start_engine_services(cli_args)
+    if cli_args.exit_after_startup:
+        startup_timeline.on_complete = exit_after_startup
+
+
     print("🚀 Iniciando FarmHelper Pro...")
     logging.info("Bloco __main__ iniciado.")
 
-    main_tk_root = tk.Tk()
-    print("✅ Interface Tkinter criada.")
-    logging.info("Root Tkinter criado.")
+    main_tk_root = None
+    try:
+        if cli_args.headless:
+            run_headless()
+        else:
+            main_tk_root = tk.Tk()
+            print("✅ Interface Tkinter criada.")
+            logging.info("Root Tkinter criado.")
 
-    app_ui = FarmHelperApp(main_tk_root)
-    print("✅ FarmHelper Pro carregado.")
-    logging.info("Instância de FarmHelperApp criada.")
+            app_ui = FarmHelperApp(main_tk_root)
+            print("✅ FarmHelper Pro carregado.")
+            logging.info("Instância de FarmHelperApp criada.")
 
-    try:
-        print("🔧 Iniciando threads de background...")
-        pygame_thread_global = threading.Thread(target=pygame_loop, name="PygameThread", daemon=True)
-        pygame_thread_global.start()
-        print("✅ Thread Pygame iniciada.")
-        logging.info("PygameThread iniciada.")
+            print("🔧 Iniciando threads de background...")
+            main_tk_root.after_idle(on_window_shown) # Pygame só depois da janela aparecer
 
-        timer_sound_thread_global = threading.Thread(target=timer_and_sound_task, name="TimerSoundThread", daemon=True)
-        timer_sound_thread_global.start()
-        print("✅ Thread Timer iniciada.")
-        logging.info("TimerSoundThread iniciada.")
+            if engine_process is None:
+                timer_sound_thread_global = threading.Thread(target=timer_and_sound_task, name="TimerSoundThread", daemon=True)
+                timer_sound_thread_global.start()
+                print("✅ Thread Timer iniciada.")
+                logging.info("TimerSoundThread iniciada.")
 
-        print("🎮 FarmHelper Pro está pronto! Iniciando interface...")
-        main_tk_root.mainloop()
-        print("👋 Interface finalizada.")
-        logging.info("mainloop do Tkinter finalizado.")
+            print("🎮 FarmHelper Pro está pronto! Iniciando interface...")
+            main_tk_root.mainloop()
+            print("👋 Interface finalizada.")
+            logging.info("mainloop do Tkinter finalizado.")
+        if not startup_timeline.is_complete():
+            logging.info("Inicialização incompleta ao fechar: %s", startup_timeline.format())
 
     except Exception as e_global:
         print(f"❌ Erro crítico: {e_global}")
-        logging.critical(f"Erro global não capturado na inicialização: {e_global}", exc_info=True)
+        logging.critical("Erro global não capturado na inicialização: %s", e_global, exc_info=True)
         if main_tk_root and main_tk_root.winfo_exists():
             messagebox.showerror("Erro Crítico", f"Ocorreu um erro fatal:\n{e_global}\nVerifique o arquivo de log.")
     finally:
         print("🔄 Finalizando aplicação...")
         logging.info("Aplicação finalizada a partir do bloco __main__.")
-        app_running = False
-        pygame_running = False
-        app_paused = False # Garante que está despausado para finalização
-        if timer_event: timer_event.set()
-
-        if pygame_thread_global and pygame_thread_global.is_alive():
-            pygame_thread_global.join(timeout=0.5)
-        if timer_sound_thread_global and timer_sound_thread_global.is_alive():
-            timer_sound_thread_global.join(timeout=0.5)
-
-        logging.info("------------------ FIM DA EXECUÇÃO ------------------")
\ No newline at end of file
+        shutdown_engine()
+        shutdown_logging()
\ No newline at end of file